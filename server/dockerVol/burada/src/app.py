@@ -1,6 +1,8 @@
+from time import perf_counter
+_IMPORT_STARTED = perf_counter()
+
 from flask import Flask
 from flask import request, g
-from sqlalchemy import inspect
 
 from flask_cors import CORS
 
@@ -77,18 +79,68 @@ debug(f"DB_URL: {DB_URL}")
 # endregion
 
 def create_app():
-    """Create and configure the Flask application."""
+    """Create and configure the Flask application.
+
+    Building the app does not touch the database: tables and development data are created with
+    `flask --app app burada init-db` and `flask --app app burada seed --bulk`.
+    """
+    global _IMPORT_STARTED
+    from utils.StartupUtils import StartupTimer
+
+    # The first app of the process also reports the module imports
+    timer = StartupTimer(_IMPORT_STARTED)
+    if _IMPORT_STARTED is not None:
+        timer.add('imports', perf_counter() - _IMPORT_STARTED)
+        _IMPORT_STARTED = None
+
     app = Flask(__name__)
     
     app.config['SECRET_KEY'] = str(getenv('APP_SECRET_KEY', 'You were the Chosen One! It was said that you would destroy the Sith, not join them! Bring balance to the Force, not leave it in darkness! You were my brother, Anakin! I loved you!'))
     app.config['TEMPLATES_AUTO_RELOAD'] = True
 
 
+    from utils.DatabaseUtils import engine_options
     app.config['SQLALCHEMY_DATABASE_URI'] = DB_URL
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = True
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(DB_URL)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False  # models_committed sinyali kullanılmıyor
 
     app.url_map.strict_slashes = False
 
+    from utils.ProxyUtils import TrustedProxySchemeMiddleware
+    app.wsgi_app = TrustedProxySchemeMiddleware(app.wsgi_app)  # https behind Traefik
+
+    # Calibrate the password hash cost once, before workers are forked
+    with timer.phase('password_calibration'):
+        from utils.PasswordUtils import password_hashers
+        password_hashers.calibrate()
+
+    with timer.phase('blueprints'):
+        _register_blueprints(app)
+
+    with timer.phase('extensions'):
+        CORS(app, supports_credentials=True)
+        # CORS(app, resources={r"/*": {"origins": "*"}})
+
+        from modal import db
+        from modal.ReplicaRouting import replica_router
+        replica_router.init_app(app)  # DB_REPLICA_URLS -> SQLALCHEMY_BINDS
+        db.init_app(app)
+        if replica_router.enabled:
+            with app.app_context():
+                replica_router.watch(db.engines)
+
+        # Sorgu sayısı / süresi, X-DB-Queries ve X-DB-Time başlıkları, yavaş sorgu logu
+        from utils.DatabaseUtils import query_stats
+        query_stats.init_app(app)
+
+        from utils.CliUtils import burada_cli
+        app.cli.add_command(burada_cli)
+
+    app.extensions['burada_startup'] = timer
+    timer.finish()
+    return app
+
+def _register_blueprints(app):
     from middleware.app_middleware import middleware_bp
 
 
@@ -119,251 +171,11 @@ def create_app():
     app.register_blueprint(lessons_api)
     app.register_blueprint(profile_bp, url_prefix='/profile')
 
-
-    return app
-
-app = create_app()
-
-CORS(app, supports_credentials=True)
-# CORS(app, resources={r"/*": {"origins": "*"}})
-
-
-# region DB Config
-from modal import db
-
-db.init_app(app)
-with app.app_context():
-    inspector = inspect(db.engine)
-    # print(inspector)
-    # print(inspector.get_table_names())
-    
-    # Tüm modelleri import et
-    from modal import User
-    from modal.Lesson import Lesson
-    from modal.LessonTeacher import LessonTeacher
-    from modal.Student import Student
-    from modal.Attenation import Attenation
-    from modal.AttenationDetail import AttenationDetail
-    
-    db.drop_all()  # Sadece geliştirme aşamasında kullanın
-    if not inspector.get_table_names():
-        db.create_all()
-        # Önce tabloları temizle ve yeniden oluştur
-        
-        from datetime import datetime
-        from sqlalchemy.exc import IntegrityError
-        
-        # Default user oluştur
-        default_user = User(
-            id=1,
-            username='yagcimustafa',
-            email='yagci@tahakara.dev',
-            phone=None,
-            passwordHash='002097684c6b1b20817abbb72a341294731adfbcd00d61d0afa232b9147ae2f6',
-            passwordSalt='21f10f95514bea7a543ee41f9b01842e',
-            isActive=True,
-            isDeleted=False,
-            isEmailVerified=False,
-            isPhoneVerified=False,
-            lastLogin=datetime.strptime('2025-05-17 19:28:34', '%Y-%m-%d %H:%M:%S'),
-            uniqueID='36db24d9-3347-11f0-8318-1aebcda1d33f',
-            updatedAt=datetime.strptime('2025-05-17 19:28:34', '%Y-%m-%d %H:%M:%S'),
-            createdAt=datetime.strptime('2025-05-17 17:49:00', '%Y-%m-%d %H:%M:%S')
-        )
-        
-        # Diğer öğretmenler
-        other_teachers = [
-            User(
-                username='alikaya',
-                email='ali.kaya@tahakara.dev',
-                phone='5551234567',
-                passwordHash='002097684c6b1b20817abbb72a341294731adfbcd00d61d0afa232b9147ae2f6',
-                passwordSalt='21f10f95514bea7a543ee41f9b01842e',
-                isActive=True,
-                isDeleted=False,
-                isEmailVerified=True,
-                isPhoneVerified=True,
-                lastLogin=datetime.strptime('2025-05-18 10:15:22', '%Y-%m-%d %H:%M:%S'),
-                uniqueID='44db24d9-3347-11f0-8318-1aebcda1d34f',
-                updatedAt=datetime.strptime('2025-05-18 10:15:22', '%Y-%m-%d %H:%M:%S'),
-                createdAt=datetime.strptime('2025-05-17 18:30:00', '%Y-%m-%d %H:%M:%S')
-            ),
-            User(
-                username='aycademir',
-                email='ayca.demir@tahakara.dev',
-                phone='5551234568',
-                passwordHash='002097684c6b1b20817abbb72a341294731adfbcd00d61d0afa232b9147ae2f6',
-                passwordSalt='21f10f95514bea7a543ee41f9b01842e',
-                isActive=True,
-                isDeleted=False,
-                isEmailVerified=True,
-                isPhoneVerified=True,
-                lastLogin=datetime.strptime('2025-05-18 11:20:45', '%Y-%m-%d %H:%M:%S'),
-                uniqueID='45db24d9-3347-11f0-8318-1aebcda1d35f',
-                updatedAt=datetime.strptime('2025-05-18 11:20:45', '%Y-%m-%d %H:%M:%S'),
-                createdAt=datetime.strptime('2025-05-17 19:00:00', '%Y-%m-%d %H:%M:%S')
-            ),
-            User(
-                username='mehmetyilmaz',
-                email='mehmet.yilmaz@tahakara.dev',
-                phone='5551234569',
-                passwordHash='002097684c6b1b20817abbb72a341294731adfbcd00d61d0afa232b9147ae2f6',
-                passwordSalt='21f10f95514bea7a543ee41f9b01842e',
-                isActive=True,
-                isDeleted=False,
-                isEmailVerified=True,
-                isPhoneVerified=False,
-                lastLogin=datetime.strptime('2025-05-18 09:45:30', '%Y-%m-%d %H:%M:%S'),
-                uniqueID='46db24d9-3347-11f0-8318-1aebcda1d36f',
-                updatedAt=datetime.strptime('2025-05-18 09:45:30', '%Y-%m-%d %H:%M:%S'),
-                createdAt=datetime.strptime('2025-05-17 20:15:00', '%Y-%m-%d %H:%M:%S')
-            )
-        ]
-        
-        # Öğrenci verileri
-        students = [
-            Student(name='Ahmet', surname='Yılmaz', student_uuid='a1db24d9-3347-11f0-8318-1aebcda10001'),
-            Student(name='Ayşe', surname='Demir', student_uuid='a2db24d9-3347-11f0-8318-1aebcda10002'),
-            Student(name='Mehmet', surname='Kara', student_uuid='a3db24d9-3347-11f0-8318-1aebcda10003'),
-            Student(name='Zeynep', surname='Çelik', student_uuid='a4db24d9-3347-11f0-8318-1aebcda10004'),
-            Student(name='Ali', surname='Öztürk', student_uuid='a5db24d9-3347-11f0-8318-1aebcda10005'),
-            Student(name='Fatma', surname='Şahin', student_uuid='a6db24d9-3347-11f0-8318-1aebcda10006'),
-            Student(name='Can', surname='Aydın', student_uuid='a7db24d9-3347-11f0-8318-1aebcda10007'),
-            Student(name='Ece', surname='Yıldız', student_uuid='a8db24d9-3347-11f0-8318-1aebcda10008'),
-            Student(name='Burak', surname='Aksoy', student_uuid='a9db24d9-3347-11f0-8318-1aebcda10009'),
-            Student(name='Deniz', surname='Koç', student_uuid='a0db24d9-3347-11f0-8318-1aebcda10010')
-        ]
-        
-        # Veritabanına kaydet ve hata kontrolü yap
-        try:
-            # Kullanıcıları ekle
-            db.session.add(default_user)
-            for teacher in other_teachers:
-                db.session.add(teacher)
-            db.session.commit()
-            print(f"Kullanıcılar oluşturuldu: yagcimustafa, alikaya, aycademir, mehmetyilmaz")
-            
-            # Öğrencileri ekle
-            for student in students:
-                db.session.add(student)
-            db.session.commit()
-            print(f"10 öğrenci başarıyla eklendi")
-            
-            # Dersleri oluştur
-            lessons = [
-                Lesson(name="Yazılım Mühendisliği", lesson_uuid="48db24d9-3347-11f0-8318-1aebcda1d44f"),
-                Lesson(name="Veritabanı Sistemleri", lesson_uuid="49db24d9-3347-11f0-8318-1aebcda1d45f"),
-                Lesson(name="Yapay Zeka", lesson_uuid="50db24d9-3347-11f0-8318-1aebcda1d46f"),
-                Lesson(name="Web Programlama", lesson_uuid="51db24d9-3347-11f0-8318-1aebcda1d47f"),
-                Lesson(name="Mobil Uygulama Geliştirme", lesson_uuid="52db24d9-3347-11f0-8318-1aebcda1d48f"),
-                Lesson(name="Siber Güvenlik", lesson_uuid="53db24d9-3347-11f0-8318-1aebcda1d49f")
-            ]
-            
-            for lesson in lessons:
-                db.session.add(lesson)
-            db.session.commit()
-            print(f"6 ders başarıyla oluşturuldu")
-            
-            # Öğretmen-ders ilişkilerini oluştur
-            lesson_teachers = [
-                LessonTeacher(lesson_uuid="48db24d9-3347-11f0-8318-1aebcda1d44f", teacher_uuid="36db24d9-3347-11f0-8318-1aebcda1d33f"),  # Yazılım Müh - yagcimustafa
-                LessonTeacher(lesson_uuid="49db24d9-3347-11f0-8318-1aebcda1d45f", teacher_uuid="44db24d9-3347-11f0-8318-1aebcda1d34f"),  # Veritabanı - alikaya
-                LessonTeacher(lesson_uuid="50db24d9-3347-11f0-8318-1aebcda1d46f", teacher_uuid="45db24d9-3347-11f0-8318-1aebcda1d35f"),  # Yapay Zeka - aycademir
-                LessonTeacher(lesson_uuid="51db24d9-3347-11f0-8318-1aebcda1d47f", teacher_uuid="46db24d9-3347-11f0-8318-1aebcda1d36f"),  # Web Prog - mehmetyilmaz
-                LessonTeacher(lesson_uuid="52db24d9-3347-11f0-8318-1aebcda1d48f", teacher_uuid="36db24d9-3347-11f0-8318-1aebcda1d33f"),  # Mobil - yagcimustafa
-                LessonTeacher(lesson_uuid="53db24d9-3347-11f0-8318-1aebcda1d49f", teacher_uuid="44db24d9-3347-11f0-8318-1aebcda1d34f")   # Siber - alikaya
-            ]
-            
-            for lesson_teacher in lesson_teachers:
-                db.session.add(lesson_teacher)
-            db.session.commit()
-            print(f"Öğretmen-ders ilişkileri başarıyla kuruldu")
-            
-            # Yoklama oturumları ekle
-            attendance_sessions = [
-                Attenation(
-                    id=1,
-                    lesson_uuid='48db24d9-3347-11f0-8318-1aebcda1d44f', 
-                    teacher_uuid='36db24d9-3347-11f0-8318-1aebcda1d33f', 
-                    is_active=False,  # 0 değerine karşılık gelecek string value
-                    session_name='Yazılım Mühendisliği - 15 Mayıs Oturumu', 
-                    created_at=datetime.strptime('2025-05-15 09:00:00', '%Y-%m-%d %H:%M:%S'),
-                    closed_at=datetime.strptime('2025-05-15 11:30:00', '%Y-%m-%d %H:%M:%S')
-                ),
-                Attenation(
-                    id=2,
-                    lesson_uuid='49db24d9-3347-11f0-8318-1aebcda1d45f', 
-                    teacher_uuid='44db24d9-3347-11f0-8318-1aebcda1d34f', 
-                    is_active=False,
-                    session_name='Veritabanı Sistemleri - 16 Mayıs Oturumu', 
-                    created_at=datetime.strptime('2025-05-16 13:00:00', '%Y-%m-%d %H:%M:%S'),
-                    closed_at=datetime.strptime('2025-05-16 15:30:00', '%Y-%m-%d %H:%M:%S')
-                ),
-                Attenation(
-                    id=3,
-                    lesson_uuid='50db24d9-3347-11f0-8318-1aebcda1d46f', 
-                    teacher_uuid='45db24d9-3347-11f0-8318-1aebcda1d35f', 
-                    is_active=True,
-                    session_name='Yapay Zeka - 17 Mayıs Oturumu', 
-                    created_at=datetime.strptime('2025-05-17 10:00:00', '%Y-%m-%d %H:%M:%S'),
-                    closed_at=datetime.strptime('2025-05-17 12:30:00', '%Y-%m-%d %H:%M:%S')
-                ),
-                Attenation(
-                    id=4,
-                    lesson_uuid='51db24d9-3347-11f0-8318-1aebcda1d47f', 
-                    teacher_uuid='46db24d9-3347-11f0-8318-1aebcda1d36f', 
-                    is_active=True,  # 1 değerine karşılık gelecek string value
-                    session_name='Web Programlama - 18 Mayıs Oturumu', 
-                    created_at=datetime.strptime('2025-05-18 14:00:00', '%Y-%m-%d %H:%M:%S'),
-                    closed_at=None
-                ),
-                Attenation(
-                    id=5,
-                    lesson_uuid='52db24d9-3347-11f0-8318-1aebcda1d48f', 
-                    teacher_uuid='36db24d9-3347-11f0-8318-1aebcda1d33f', 
-                    is_active=True,
-                    session_name='Mobil Uygulama Geliştirme - 18 Mayıs Oturumu', 
-                    created_at=datetime.strptime('2025-05-18 16:00:00', '%Y-%m-%d %H:%M:%S'),
-                    closed_at=None
-                )
-            ]
-            
-            for attendance in attendance_sessions:
-                db.session.add(attendance)
-            db.session.commit()
-            print(f"5 yoklama oturumu başarıyla eklendi")
-
-            # Add attendance details for sessions
-            attendance_details = [
-                AttenationDetail(attenation_id=1, student_uuid='a1db24d9-3347-11f0-8318-1aebcda10001', card_id='CARD001', timestamp=datetime.strptime('2025-05-15 09:05:23', '%Y-%m-%d %H:%M:%S')),
-                AttenationDetail(attenation_id=1, student_uuid='a2db24d9-3347-11f0-8318-1aebcda10002', card_id='CARD002', timestamp=datetime.strptime('2025-05-15 09:06:45', '%Y-%m-%d %H:%M:%S')),
-                AttenationDetail(attenation_id=1, student_uuid='a3db24d9-3347-11f0-8318-1aebcda10003', card_id='CARD003', timestamp=datetime.strptime('2025-05-15 09:08:12', '%Y-%m-%d %H:%M:%S')),
-                AttenationDetail(attenation_id=1, student_uuid='a4db24d9-3347-11f0-8318-1aebcda10004', card_id='CARD004', timestamp=datetime.strptime('2025-05-15 09:10:05', '%Y-%m-%d %H:%M:%S')),
-                AttenationDetail(attenation_id=1, student_uuid='a5db24d9-3347-11f0-8318-1aebcda10005', card_id='CARD005', timestamp=datetime.strptime('2025-05-15 09:12:33', '%Y-%m-%d %H:%M:%S')),
-                
-                AttenationDetail(attenation_id=2, student_uuid='a2db24d9-3347-11f0-8318-1aebcda10002', card_id='CARD002', timestamp=datetime.strptime('2025-05-16 13:04:18', '%Y-%m-%d %H:%M:%S')),
-                AttenationDetail(attenation_id=2, student_uuid='a3db24d9-3347-11f0-8318-1aebcda10003', card_id='CARD003', timestamp=datetime.strptime('2025-05-16 13:05:37', '%Y-%m-%d %H:%M:%S')),
-                AttenationDetail(attenation_id=2, student_uuid='a6db24d9-3347-11f0-8318-1aebcda10006', card_id='CARD006', timestamp=datetime.strptime('2025-05-16 13:07:22', '%Y-%m-%d %H:%M:%S')),
-                AttenationDetail(attenation_id=2, student_uuid='a7db24d9-3347-11f0-8318-1aebcda10007', card_id='CARD007', timestamp=datetime.strptime('2025-05-16 13:10:45', '%Y-%m-%d %H:%M:%S')),
-                AttenationDetail(attenation_id=2, student_uuid='a8db24d9-3347-11f0-8318-1aebcda10008', card_id='CARD008', timestamp=datetime.strptime('2025-05-16 13:12:19', '%Y-%m-%d %H:%M:%S')),
-            ]
-
-            for detail in attendance_details:
-                db.session.add(detail)
-            db.session.commit()
-            print(f"{len(attendance_details)} yoklama detayı başarıyla eklendi")
-            
-        except IntegrityError as e:
-            db.session.rollback()
-            print(f"Veri oluşturulurken hata: {str(e)}")
-        except Exception as e:
-            db.session.rollback()
-            print(f"Beklenmeyen hata: {str(e)}")
-# endregion
-
 if __name__ == '__main__':
+    # Sadece geliştirme için; production: gunicorn -c gunicorn.conf.py wsgi:app
+    # Tablolar ve örnek veri: flask --app app burada init-db && flask --app app burada seed --bulk
     from functools import partial
-    if not APP_DEBUG:
-        app.config['ENV'] = 'development'
-        app.config['DEBUG'] = True
-    app.run(debug=APP_DEBUG, host=APP_HOST, port=APP_PORT, request_handler=partial(RequestLogHandler))
\ No newline at end of file
+    from utils.StartupUtils import warm_up_pool
+    app = create_app()
+    warm_up_pool(app)
+    app.run(debug=APP_DEBUG, host=APP_HOST, port=APP_PORT, threaded=True, request_handler=partial(RequestLogHandler))
@@ -3,6 +3,7 @@ from flask import request, g, Response, redirect, url_for, jsonify, make_respons
 
 from utils.JwtUtils import JwtUtils
 from utils.redis.RedisUtils import AuthRedisClientUtils
+from auth.tokencache import token_cache
 
 # from routes.auth import auth_bp
 # from routes.dashboard import dash_bp
@@ -42,20 +43,26 @@ class AuthMiddleware:
                 return response
 
             try:
-                payload = self.jwt_utils.validate_token(jwt_token)
-                if not payload:
-                    response = make_response(jsonify({'error': 'Token is invalid or expired!'}), 302)
-                    response.headers['Location'] = f"{url_for('auth.login_get')}?redirectedFrom={request.path}"
-                    response.headers['Authorization'] = ''
-                    return response
-
-                # Check if the token is blacklisted in Redis
-                if not self.check_token_in_redis(jwt_token, payload):
-                    response = make_response(jsonify({'error': 'Token is invalid or expired!'}), 302)
-                    response.headers['Location'] = f"{url_for('auth.login_get')}?redirectedFrom={request.path}"
-                    response.headers['Authorization'] = ''
-                    return response
-                
+                # Recently verified tokens skip the JWT and Redis checks
+                payload = token_cache.get(jwt_token)
+                if payload is None:
+                    generation = token_cache.generation
+                    payload = self.jwt_utils.validate_token(jwt_token)
+                    if not payload:
+                        response = make_response(jsonify({'error': 'Token is invalid or expired!'}), 302)
+                        response.headers['Location'] = f"{url_for('auth.login_get')}?redirectedFrom={request.path}"
+                        response.headers['Authorization'] = ''
+                        return response
+
+                    # Check if the token is blacklisted in Redis
+                    if not self.check_token_in_redis(jwt_token, payload):
+                        response = make_response(jsonify({'error': 'Token is invalid or expired!'}), 302)
+                        response.headers['Location'] = f"{url_for('auth.login_get')}?redirectedFrom={request.path}"
+                        response.headers['Authorization'] = ''
+                        return response
+
+                    token_cache.set(jwt_token, payload, generation)
+
                 g.user = {}
                 g.user['user_uuid'] = payload['user_uuid']
             except Exception as e:
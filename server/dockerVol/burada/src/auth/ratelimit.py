@@ -0,0 +1,196 @@
+from functools import wraps
+from flask import request, g
+from typing import Any, Dict, List, Optional, Tuple
+from threading import Lock
+import hashlib
+import logging
+import time
+
+import os
+from dotenv import load_dotenv
+
+from utils.CacheUtils import TTLCache
+
+load_dotenv()
+
+# Sliding window counter: the previous fixed window counts with the share of it that still
+# overlaps the sliding window. Every key is checked first and only counted if all allow it.
+_SLIDING_WINDOW_SCRIPT = """
+    local weight = tonumber(ARGV[1])
+    local ttl = tonumber(ARGV[2])
+    for i = 1, #KEYS, 2 do
+        local current = tonumber(redis.call('GET', KEYS[i]) or '0')
+        local previous = tonumber(redis.call('GET', KEYS[i + 1]) or '0')
+        if previous * weight + current + 1 > tonumber(ARGV[2 + (i + 1) / 2]) then
+            return (i + 1) / 2
+        end
+    end
+    for i = 1, #KEYS, 2 do
+        redis.call('INCR', KEYS[i])
+        redis.call('EXPIRE', KEYS[i], ttl)
+    end
+    return 0
+"""
+
+
+class RateLimiter:
+    """Sliding-window rate limits shared by every app process through Redis.
+
+    Each process also keeps a token bucket per key with the same rate. A request whose bucket is
+    empty is rejected without a Redis round-trip: this process alone has already seen more
+    attempts than the global limit allows. When Redis is unreachable the buckets are the only
+    limit, so a Redis outage does not turn the limits off.
+    """
+
+    def __init__(self, max_buckets: int = 100000):
+        self.enabled = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+        self._buckets = TTLCache(ttl_seconds=3600, max_size=int(os.getenv('RATE_LIMIT_LOCAL_BUCKETS', max_buckets)))
+        self._lock = Lock()
+        self._redis = None
+        self._script = None
+
+        self.allowed = 0
+        self.rejected_local = 0
+        self.rejected_redis = 0
+        self.redis_errors = 0
+
+    def _take_local(self, keys: List[Tuple[str, int]], window: int, now: float) -> bool:
+        """Take a token from the bucket of every key, or from none of them if one is empty.
+        Buckets refill at limit/window tokens per second."""
+        with self._lock:
+            buckets = []
+            for key, limit in keys:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = [float(limit), now]
+                    self._buckets.set(key, bucket, ttl_seconds=window * 2)
+                bucket[0] = min(float(limit), bucket[0] + (now - bucket[1]) * limit / window)
+                bucket[1] = now
+                buckets.append(bucket)
+            if any(bucket[0] < 1 for bucket in buckets):
+                return False
+            for bucket in buckets:
+                bucket[0] -= 1
+            return True
+
+    def _check_redis(self, keys: List[Tuple[str, int]], window: int, now: float) -> Optional[int]:
+        """
+        Returns:
+            Optional[int]: 0 if allowed, the 1-based index of the exceeded key otherwise, None if Redis failed.
+        """
+        try:
+            if self._script is None:
+                from utils.redis.RedisUtils import AuthRedisClientUtils
+                self._redis = AuthRedisClientUtils()
+                self._script = self._redis.client.register_script(_SLIDING_WINDOW_SCRIPT)
+
+            index = int(now // window)
+            weight = 1 - (now % window) / window
+            redis_keys = []
+            for key, _ in keys:
+                redis_keys += [f"ratelimit:{key}:{index}", f"ratelimit:{key}:{index - 1}"]
+            return int(self._script(keys=redis_keys, args=[weight, window * 2] + [limit for _, limit in keys]))
+        except Exception as e:
+            self.redis_errors += 1
+            logging.error(f"Rate limiter Redis error, using local limits only: {str(e)}")
+            return None
+
+    def hit(self, scope: str, identities: Dict[str, Tuple[str, int]], window: int) -> Tuple[bool, int]:
+        """
+        Count an attempt against every identity of a scope.
+
+        Args:
+            scope (str): Limit name, e.g. `login`.
+            identities (Dict[str, Tuple[str, int]]): kind (ip, device, username) -> (value, limit).
+            window (int): Window length in seconds.
+
+        Returns:
+            Tuple[bool, int]: (allowed, seconds to wait before retrying)
+        """
+        now = time.time()
+        keys = [(f"{scope}:{kind}:{value}", limit) for kind, (value, limit) in identities.items()]
+        retry_after = max(1, int(window - now % window))
+
+        if not self._take_local(keys, window, now):
+            self.rejected_local += 1
+            return False, retry_after
+
+        if self._check_redis(keys, window, now):
+            self.rejected_redis += 1
+            return False, retry_after
+
+        self.allowed += 1
+        return True, 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the limiter counters."""
+        return {
+            "enabled": self.enabled,
+            "allowed": self.allowed,
+            "rejected_local": self.rejected_local,
+            "rejected_redis": self.rejected_redis,
+            "redis_errors": self.redis_errors,
+            "local_buckets": len(self._buckets),
+        }
+
+
+rate_limiter = RateLimiter()
+
+
+def _request_identities(limits: Dict[str, int]) -> Dict[str, Tuple[str, int]]:
+    """Resolve the identities of the current request for the requested kinds."""
+    from modal.RequestInfo import RequestInfo
+
+    identities = {}
+    if 'ip' in limits:
+        identities['ip'] = (RequestInfo.get_client_ip(request), limits['ip'])
+
+    # A missing or invalid cookie gets a fresh uuid on every request, only count real ones
+    device = getattr(g, 'dust_device', None)
+    if 'device' in limits and device and device == request.cookies.get('dust-device'):
+        identities['device'] = (device, limits['device'])
+
+    if 'username' in limits:
+        data = request.get_json(silent=True) or {}
+        username = data.get('username') or data.get('email') or data.get('phone')
+        if isinstance(username, str) and username.strip():
+            # Keys do not carry the plain identifier
+            digest = hashlib.sha256(username.strip().lower().encode('utf-8')).hexdigest()[:32]
+            identities['username'] = (digest, limits['username'])
+    return identities
+
+
+def rate_limit(scope: str, window: int = 60, **limits: int):
+    """Limit a route per client IP, dust-device cookie and/or submitted username.
+
+    Example:
+        @rate_limit("login", window=60, ip=20, device=10, username=5)
+
+    `RATE_LIMIT_<SCOPE>_WINDOW` and `RATE_LIMIT_<SCOPE>_<KIND>` override the values. Rejected
+    requests get the app's 429 page (`routes.errors`) with a Retry-After header.
+
+    Args:
+        scope (str): Limit name, also the Redis key prefix.
+        window (int, optional): Window length in seconds. Defaults to 60.
+        **limits (int): Attempts per window for `ip`, `device` and `username`.
+    """
+    window = int(os.getenv(f'RATE_LIMIT_{scope.upper()}_WINDOW', window))
+    limits = {kind: int(os.getenv(f'RATE_LIMIT_{scope.upper()}_{kind.upper()}', limit)) for kind, limit in limits.items()}
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not rate_limiter.enabled:
+                return f(*args, **kwargs)
+
+            identities = _request_identities(limits)
+            if identities:
+                allowed, retry_after = rate_limiter.hit(scope, identities, window)
+                if not allowed:
+                    from routes.errors import too_many_requests
+                    response = too_many_requests(None)
+                    response.headers['Retry-After'] = str(retry_after)
+                    return response
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
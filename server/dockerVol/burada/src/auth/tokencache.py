@@ -0,0 +1,178 @@
+from typing import Optional, Dict, Any
+from threading import Thread, Event, Lock
+import logging
+import time
+
+import os
+from dotenv import load_dotenv
+
+from utils.CacheUtils import TTLCache
+from utils.redis.RedisUtils import AuthRedisClientUtils
+
+load_dotenv()
+
+# Keyspace events that mean a whitelisted token is gone
+_REVOKE_EVENTS = ("del", "unlink", "expired", "evicted", "rename_from")
+
+
+class VerifiedTokenCache:
+    """Process-local cache of tokens that passed JWT validation and the whitelist check.
+
+    A cached token costs no HMAC verification and no Redis round-trip. Entries live at most
+    `ttl_seconds` and never longer than half of the token's remaining lifetime. A background
+    thread listens to Redis keyspace notifications on the whitelist keys and evicts a token as
+    soon as its whitelist entry is deleted (logout) or expires, in every worker process.
+
+    The cache is only used while that listener is subscribed; if keyspace notifications cannot
+    be enabled on the server every request falls back to the full check.
+    """
+
+    def __init__(self, ttl_seconds: int = 30, max_size: int = 10000):
+        self._cache = TTLCache(
+            ttl_seconds=int(os.getenv('AUTH_TOKEN_CACHE_TTL', ttl_seconds)),
+            max_size=int(os.getenv('AUTH_TOKEN_CACHE_SIZE', max_size))
+        )
+        self.configure_notifications = os.getenv('AUTH_TOKEN_CACHE_CONFIGURE_REDIS', 'true').lower() == 'true'
+
+        self._lock = Lock()
+        self._stop = Event()
+        self._subscribed = Event()
+        self._listener: Optional[Thread] = None
+        self._listener_pid: Optional[int] = None
+        self._redis: Optional[AuthRedisClientUtils] = None
+        self.invalidations = 0
+        self.generation = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._cache.enabled and self._subscribed.is_set() and self._listener_pid == os.getpid()
+
+    def _ensure_listener(self) -> None:
+        if self._listener_pid == os.getpid() and self._listener is not None and self._listener.is_alive():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid() and self._listener is not None and self._listener.is_alive():
+                return
+            # Forked child: entries verified by the parent may have been revoked since
+            self._clear(locked=True)
+            self._subscribed.clear()
+            self._stop.clear()
+            self._listener = Thread(target=self._listen, name="token-cache-invalidator", daemon=True)
+            self._listener_pid = os.getpid()
+            self._listener.start()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the payload of a recently verified token.
+
+        Args:
+            token (str): JWT token.
+
+        Returns:
+            Optional[Dict[str, Any]]: Token payload, None if the token must be verified.
+        """
+        self._ensure_listener()
+        if not self.enabled:
+            return None
+        return self._cache.get(token)
+
+    def set(self, token: str, payload: Dict[str, Any], generation: int) -> None:
+        """
+        Remember a verified token.
+
+        Args:
+            token (str): JWT token.
+            payload (Dict[str, Any]): Validated payload; its `exp` caps the entry lifetime.
+            generation (int): `generation` read before the token was verified. If a token was
+                revoked in between, the entry is not stored since it may be this one.
+        """
+        if not self.enabled or generation != self.generation:
+            return
+        ttl = self._cache.ttl_seconds
+        expires_at = payload.get('exp')
+        if expires_at:
+            ttl = min(ttl, (expires_at - time.time()) / 2)
+        self._cache.set(token, payload, ttl_seconds=ttl)
+
+    def invalidate(self, token: str) -> None:
+        """Forget a token (logout in this process)."""
+        with self._lock:
+            self.generation += 1
+        if self._cache.delete(token):
+            with self._lock:
+                self.invalidations += 1
+
+    def _clear(self, locked: bool = False) -> None:
+        if locked:
+            self.generation += 1
+        else:
+            with self._lock:
+                self.generation += 1
+        self._cache.clear()
+
+    def _enable_keyspace_notifications(self, client) -> bool:
+        """Make sure the server publishes generic and expired keyspace events."""
+        try:
+            flags = client.config_get('notify-keyspace-events').get('notify-keyspace-events', '')
+        except Exception as e:
+            logging.warning(f"Token cache could not read notify-keyspace-events: {str(e)}")
+            return False
+
+        if 'K' in flags and ('A' in flags or ('g' in flags and 'x' in flags)):
+            return True
+        if not self.configure_notifications:
+            logging.warning("Token cache disabled: Redis keyspace notifications (Kgx) are not enabled")
+            return False
+
+        try:
+            client.config_set('notify-keyspace-events', ''.join(sorted(set(flags) | set('Kgx'))))
+            return True
+        except Exception as e:
+            logging.warning(f"Token cache disabled: could not enable Redis keyspace notifications: {str(e)}")
+            return False
+
+    def _listen(self) -> None:
+        backoff = 1
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                if self._redis is None:
+                    self._redis = AuthRedisClientUtils()
+                client = self._redis.client
+                if not self._enable_keyspace_notifications(client):
+                    self._stop.wait(60)
+                    continue
+
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f"__keyspace@{self._redis.db}__:whitelist:*")
+                # Events published while we were not subscribed are lost
+                self._clear()
+                self._subscribed.set()
+                backoff = 1
+
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get('data') in _REVOKE_EVENTS:
+                        # __keyspace@<db>__:whitelist:<user_uuid>:<token>
+                        self.invalidate(message['channel'].split(':', 3)[3])
+            except Exception as e:
+                logging.error(f"Token cache invalidation listener error: {str(e)}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                self._subscribed.clear()
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the cache counters."""
+        return dict(self._cache.stats(), enabled=self.enabled, invalidations=self.invalidations)
+
+
+token_cache = VerifiedTokenCache()
@@ -0,0 +1,64 @@
+# Gunicorn ayarları: gunicorn -c gunicorn.conf.py wsgi:app
+# Tüm değerler ortam değişkenlerinden okunur, varsayılanlar çekirdek sayısına göre ölçeklenir.
+import multiprocessing
+
+import os
+from dotenv import load_dotenv
+
+from utils.ProxyUtils import trusted_proxy_addresses
+
+load_dotenv()
+
+bind = f"{os.getenv('APP_HOST', '127.0.0.1')}:{os.getenv('APP_PORT', '5261')}"
+
+# Worker processes x threads: CPU-bound work (password hashing, PDF reports) spreads over the
+# processes, threads cover requests waiting on MySQL, Redis and SMTP.
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+backlog = int(os.getenv('GUNICORN_BACKLOG', 2048))
+
+# The app (routes, templates, password hash calibration, database setup) is built once in the
+# master and shared copy-on-write by the workers; see post_fork for the per-process resources.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Worker recycling: a worker exits after max_requests (+ random jitter so they do not all
+# restart at once) and the master starts a fresh one, bounding slow memory growth.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 500))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+# SIGHUP / SIGTERM give workers this long to finish in-flight requests (graceful reload)
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Traefik sits in front; only forwarded headers of TRUSTED_PROXIES are trusted. Gunicorn takes
+# single addresses only, the app applies X-Forwarded-Proto for the networks itself
+# (utils.ProxyUtils.TrustedProxySchemeMiddleware).
+forwarded_allow_ips = os.getenv('GUNICORN_FORWARDED_ALLOW_IPS', ','.join(trusted_proxy_addresses()) or '127.0.0.1')
+
+# Access log: structured JSON lines, buffered by utils.AccessLogUtils.access_log_writer
+logger_class = 'utils.AccessLogUtils.GunicornAccessLogger'
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = os.getenv('GUNICORN_ERROR_LOG', '-')
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+proc_name = os.getenv('APP_NAME', 'burada')
+
+
+def post_fork(server, worker):
+    """Drop the database connections inherited from the master and open fresh ones.
+
+    Pooled connections must not be shared between processes. Redis pools and the background
+    threads (request log, mail queue, token cache listener, hashing pool) already restart per pid.
+    """
+    if not preload_app:
+        return
+    from wsgi import app
+    from modal import db
+    from utils.StartupUtils import warm_up_pool
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    seconds = warm_up_pool(app)
+    server.log.info(f"Worker {worker.pid} ready, database pool warmed up in {seconds * 1000:.1f}ms")
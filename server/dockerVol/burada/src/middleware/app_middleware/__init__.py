@@ -4,7 +4,7 @@ from flask import request, g
 import re
 
 from modal import db
-from modal import save_request_info, select_uuid
+from modal import save_request_info, generate_uuid
 
 middleware_bp = Blueprint("middleware", __name__)
 
@@ -17,13 +17,13 @@ def check_or_generate_cookies():
         # If 'dust' cookie exists and matches UUID regex, set its value to 'X-Dust-UUID' header
         g.dust = request.cookies.get('dust')
     else:
-        g.dust = select_uuid()
+        g.dust = generate_uuid()
 
     if ('dust-device' in request.cookies) and uuid_regex.match(request.cookies.get('dust-device')):
         # If 'dust-device' cookie exists and matches UUID regex, set its value to 'X-Dust-Device' header
         g.dust_device = request.cookies.get('dust-device')
     else:
-        g.dust_device = select_uuid()
+        g.dust_device = generate_uuid()
 
 @middleware_bp.after_app_request
 def after_request(response):
@@ -32,8 +32,10 @@ def after_request(response):
     response.set_cookie('dust-device', g.dust_device, max_age=31536000, httponly=True, secure=True, samesite='None') # 1 year 60*60*24*365
     save_request_info(db, request, g.dust, g.dust_device)
 
-    response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
+    # Kendi önbellek politikasını belirleyen yanıtlara (ör. ETag'li rapor PDF'leri) dokunma
+    if 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
+        response.headers['Pragma'] = 'no-cache'
+        response.headers['Expires'] = '0'
     return response
 # endregion
\ No newline at end of file
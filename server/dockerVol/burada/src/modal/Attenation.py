@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 from sqlalchemy import func
 
 from modal.messages.Messages import AttenationModelMessages as AMM
+from modal.AttendanceMatrix import AttendanceMatrix
 
 class Attenation(db.Model):
     __tablename__ = 'attenations'
@@ -73,6 +74,9 @@ class Attenation(db.Model):
             
             db.session.add(attenation)
             db.session.commit()
+
+            from modal import invalidate_teacher_lessons_cache
+            invalidate_teacher_lessons_cache(teacher_uuid, lesson_uuid)
             
             return (True, AMM.SESSION_CREATED_SUCCESSFULLY, attenation)
             
@@ -95,6 +99,9 @@ class Attenation(db.Model):
         
         try:
             db.session.commit()
+
+            from modal import invalidate_teacher_lessons_cache
+            invalidate_teacher_lessons_cache(self.teacher_uuid, self.lesson_uuid)
             return (True, AMM.SESSION_CLOSED_SUCCESSFULLY, self)
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -114,11 +121,12 @@ class Attenation(db.Model):
         return cls.query.filter_by(lesson_uuid=lesson_uuid, is_active=True).first()
     
     @classmethod
-    def get_lesson_attendance_report(cls, lesson_uuid: str) -> Dict[str, Any]:
+    def get_lesson_attendance_report(cls, lesson_uuid: str, academic_term: Optional[str] = None) -> Dict[str, Any]:
         """Bir ders için tüm yoklama oturumlarının raporunu oluşturur.
         
         Args:
             lesson_uuid (str): Dersin UUID'si
+            academic_term (str, optional): Akademik dönem (örn. "2024-2025-bahar")
             
         Returns:
             Dict[str, Any]: Yoklama raporu
@@ -134,7 +142,11 @@ class Attenation(db.Model):
                 return {"error": "Ders bulunamadı"}
             
             # Bu ders için tüm yoklama oturumlarını al
-            sessions = cls.query.filter_by(lesson_uuid=lesson_uuid).order_by(cls.created_at.desc()).all()
+            sessions_query = cls.query.filter_by(lesson_uuid=lesson_uuid)
+            bounds = cls.term_bounds(academic_term)
+            if bounds:
+                sessions_query = sessions_query.filter(cls.created_at >= bounds[0], cls.created_at < bounds[1])
+            sessions = sessions_query.order_by(cls.created_at.desc()).all()
             
             # Hiç yoklama yoksa boş rapor döndür
             if not sessions:
@@ -151,30 +163,27 @@ class Attenation(db.Model):
                     "students": []
                 }
             
-            # İlgili oturum ID'lerini topla
-            session_ids = [session.id for session in sessions]
-            
-            # Tüm oturumlar için katılan öğrencileri bul
-            student_uuids_query = db.session.query(AttenationDetail.student_uuid).filter(
-                AttenationDetail.attenation_id.in_(session_ids)
-            ).distinct().all()
-            
-            student_uuids = [uuid[0] for uuid in student_uuids_query]
+            # Katılım matrisini tek bir akış sorgusu ile oluştur (oturumlar eskiden yeniye)
+            chronological_ids = [session.id for session in reversed(sessions)]
+            pairs = (
+                db.session.query(AttenationDetail.attenation_id, AttenationDetail.student_uuid)
+                .join(cls, cls.id == AttenationDetail.attenation_id)
+                .filter(cls.lesson_uuid == lesson_uuid)
+                .filter(*((cls.created_at >= bounds[0], cls.created_at < bounds[1]) if bounds else ()))
+                .order_by(AttenationDetail.id)
+                .yield_per(2000)
+            )
+            matrix = AttendanceMatrix.from_pairs(chronological_ids, pairs)
+            student_uuids = matrix.student_uuids
             
             # Tüm öğrencileri getir
-            students = Student.query.filter(Student.student_uuid.in_(student_uuids)).all()
-            students_dict = {student.student_uuid: {"name": student.name, "surname": student.surname} for student in students}
+            students = db.session.query(Student.student_uuid, Student.name, Student.surname).filter(Student.student_uuid.in_(student_uuids)).all() if student_uuids else []
+            students_dict = {student_uuid: {"name": name, "surname": surname} for student_uuid, name, surname in students}
             
             # Her oturum için detaylı bilgileri topla
             sessions_data = []
             for session in sessions:
-                # Bu oturum için katılan öğrencileri bul
-                attendance_records = AttenationDetail.query.filter_by(attenation_id=session.id).all()
-                
-                # Katılan öğrenci UUID'lerini topla
-                attended_students = [record.student_uuid for record in attendance_records]
-                
-                # Oturum bilgilerini ekle
+                attended_students = matrix.students_of(session.id)
                 sessions_data.append({
                     "id": session.id,
                     "created_at": session.created_at.strftime("%Y-%m-%d %H:%M:%S"),
@@ -185,29 +194,20 @@ class Attenation(db.Model):
                     "students": attended_students
                 })
             
-            # Her öğrenci için katıldığı oturumları bul
+            # Her öğrenci için katılım oranı ve seriler
             students_attendance = []
             for student_uuid in student_uuids:
-                # Bu öğrenci için tüm yoklama kayıtlarını al
-                attendance_records = AttenationDetail.query.filter(
-                    AttenationDetail.student_uuid == student_uuid,
-                    AttenationDetail.attenation_id.in_(session_ids)
-                ).all()
-                
-                # Öğrencinin katıldığı oturum ID'lerini bul
-                attended_session_ids = [record.attenation_id for record in attendance_records]
-                
-                # Katılım oranını hesapla
-                attendance_rate = round((len(attended_session_ids) / len(sessions)) * 100, 1)
-                
+                attended_session_ids = matrix.attended_sessions(student_uuid)
                 students_attendance.append({
                     "student_uuid": student_uuid,
                     "name": students_dict.get(student_uuid, {}).get("name", "Bilinmeyen"),
                     "surname": students_dict.get(student_uuid, {}).get("surname", "Öğrenci"),
                     "attended_sessions": attended_session_ids,
-                    "attendance_rate": attendance_rate,
+                    "attendance_rate": matrix.attendance_rate(student_uuid),
                     "total_attended": len(attended_session_ids),
-                    "total_sessions": len(sessions)
+                    "total_sessions": len(sessions),
+                    "current_streak": matrix.current_streak(student_uuid),
+                    "longest_streak": matrix.longest_streak(student_uuid)
                 })
             
             return {
@@ -218,22 +218,69 @@ class Attenation(db.Model):
                 "attendance_summary": {
                     "total_sessions": len(sessions),
                     "active_sessions": len([s for s in sessions if s.is_active]),
-                    "students_count": len(student_uuids)
+                    "students_count": len(student_uuids),
+                    "average_attendance_rate": matrix.average_rate()
                 },
                 "sessions": sessions_data,
                 "students": students_attendance
             }
             
+        except ValueError:
+            raise
         except Exception as e:
             logging.error(f"Yoklama raporu oluşturulurken hata: {str(e)}")
             return {"error": f"Yoklama raporu oluşturulurken hata: {str(e)}"}
     
+    # Akademik dönem adları -> (başlangıç ayı, başlangıç yılı ofseti, bitiş ayı, bitiş yılı ofseti)
+    ACADEMIC_TERMS = {
+        "fall": (9, 0, 2, 1), "guz": (9, 0, 2, 1), "güz": (9, 0, 2, 1),
+        "spring": (2, 1, 7, 1), "bahar": (2, 1, 7, 1),
+        "summer": (7, 1, 9, 1), "yaz": (7, 1, 9, 1),
+    }
+
+    @classmethod
+    def term_bounds(cls, academic_term: Optional[str]) -> Optional[Tuple[datetime, datetime]]:
+        """Akademik dönemi [başlangıç, bitiş) tarih aralığına çevirir.
+
+        Kabul edilen biçimler: "2024-2025" (tüm yıl, 1 Eylül - 1 Eylül) ve
+        "2024-2025-fall|spring|summer" (ya da guz|bahar|yaz).
+
+        Args:
+            academic_term (str, optional): Akademik dönem
+
+        Returns:
+            Optional[Tuple[datetime, datetime]]: Tarih aralığı, dönem verilmemişse None
+
+        Raises:
+            ValueError: Dönem biçimi geçersizse
+        """
+        if not academic_term:
+            return None
+
+        parts = academic_term.strip().lower().split('-')
+        try:
+            start_year, end_year = int(parts[0]), int(parts[1])
+        except (IndexError, ValueError):
+            raise ValueError(AMM.INVALID_ACADEMIC_TERM)
+        if end_year != start_year + 1 or len(parts) > 3:
+            raise ValueError(AMM.INVALID_ACADEMIC_TERM)
+
+        if len(parts) == 2:
+            return (datetime(start_year, 9, 1), datetime(end_year, 9, 1))
+
+        term = cls.ACADEMIC_TERMS.get(parts[2])
+        if term is None:
+            raise ValueError(AMM.INVALID_ACADEMIC_TERM)
+        start_month, start_offset, end_month, end_offset = term
+        return (datetime(start_year + start_offset, start_month, 1), datetime(start_year + end_offset, end_month, 1))
+
     @classmethod
-    def get_teacher_lessons_report(cls, teacher_uuid: str) -> List[Dict[str, Any]]:
-        """Bir öğretmenin tüm derslerinin yoklama özetini getirir.
+    def get_teacher_lessons_report(cls, teacher_uuid: str, academic_term: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Bir öğretmenin tüm derslerinin yoklama özetini tek bir gruplanmış sorgu ile getirir.
         
         Args:
             teacher_uuid (str): Öğretmenin UUID'si
+            academic_term (str, optional): Akademik dönem (örn. "2024-2025-bahar")
             
         Returns:
             List[Dict[str, Any]]: Her ders için özet yoklama raporu
@@ -243,47 +290,48 @@ class Attenation(db.Model):
             from modal.LessonTeacher import LessonTeacher
             from modal.AttenationDetail import AttenationDetail
             
-            # Öğretmenin derslerini bul
-            teacher_lessons = LessonTeacher.query.filter_by(teacher_uuid=teacher_uuid).all()
-            lesson_uuids = [record.lesson_uuid for record in teacher_lessons]
-            
-            # Ders bilgilerini al
-            lessons = Lesson.query.filter(Lesson.lesson_uuid.in_(lesson_uuids)).all()
-            lessons_dict = {lesson.lesson_uuid: lesson.name for lesson in lessons}
+            session_filter = db.and_(
+                cls.lesson_uuid == LessonTeacher.lesson_uuid,
+                cls.teacher_uuid == LessonTeacher.teacher_uuid
+            )
+            bounds = cls.term_bounds(academic_term)
+            if bounds:
+                session_filter = db.and_(session_filter, cls.created_at >= bounds[0], cls.created_at < bounds[1])
+            
+            rows = (
+                db.session.query(
+                    LessonTeacher.lesson_uuid,
+                    Lesson.name,
+                    func.count(db.distinct(cls.id)).label("total_sessions"),
+                    func.count(db.distinct(db.case((cls.is_active == True, cls.id), else_=None))).label("active_sessions"),
+                    func.max(cls.created_at).label("last_session"),
+                    func.count(db.distinct(AttenationDetail.student_uuid)).label("total_students")
+                )
+                .outerjoin(Lesson, Lesson.lesson_uuid == LessonTeacher.lesson_uuid)
+                .outerjoin(cls, session_filter)
+                .outerjoin(AttenationDetail, AttenationDetail.attenation_id == cls.id)
+                .filter(LessonTeacher.teacher_uuid == teacher_uuid)
+                .group_by(LessonTeacher.id, LessonTeacher.lesson_uuid, Lesson.name)
+                .order_by(LessonTeacher.id)
+                .all()
+            )
             
             reports = []
-            
-            for lesson_uuid in lesson_uuids:
-                # Bu ders için tüm yoklama oturumlarını al
-                sessions = cls.query.filter_by(
-                    lesson_uuid=lesson_uuid,
-                    teacher_uuid=teacher_uuid
-                ).all()
-                
-                # Tamamlanan ve aktif oturumları say
-                active_sessions = [s for s in sessions if s.is_active]
-                completed_sessions = [s for s in sessions if not s.is_active]
-                
-                # Yoklama yapılan tek oturum varsa bu oturuma katılan öğrenci sayısını bul
-                total_student_count = 0
-                if sessions:
-                    session_ids = [s.id for s in sessions]
-                    total_student_count = db.session.query(func.count(db.distinct(AttenationDetail.student_uuid))).filter(
-                        AttenationDetail.attenation_id.in_(session_ids)
-                    ).scalar() or 0
-                
+            for row in rows:
                 reports.append({
-                    "lesson_uuid": lesson_uuid,
-                    "lesson_name": lessons_dict.get(lesson_uuid, "Bilinmeyen Ders"),
-                    "active_sessions": len(active_sessions),
-                    "completed_sessions": len(completed_sessions),
-                    "total_sessions": len(sessions),
-                    "last_session": sessions[-1].created_at.strftime("%Y-%m-%d %H:%M:%S") if sessions else None,
-                    "total_students": total_student_count
+                    "lesson_uuid": row.lesson_uuid,
+                    "lesson_name": row.name or "Bilinmeyen Ders",
+                    "active_sessions": row.active_sessions,
+                    "completed_sessions": row.total_sessions - row.active_sessions,
+                    "total_sessions": row.total_sessions,
+                    "last_session": row.last_session.strftime("%Y-%m-%d %H:%M:%S") if row.last_session else None,
+                    "total_students": row.total_students
                 })
             
             return reports
             
+        except ValueError:
+            raise
         except Exception as e:
             logging.error(f"Öğretmen dersleri raporu oluşturulurken hata: {str(e)}")
             return [{"error": f"Öğretmen dersleri raporu oluşturulurken hata: {str(e)}"}]
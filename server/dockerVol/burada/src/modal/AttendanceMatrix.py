@@ -0,0 +1,106 @@
+from typing import Dict, Iterable, List, Tuple
+
+
+class AttendanceMatrix:
+    """Compact student x session presence matrix.
+
+    Every student row is a Python int used as a bitset: bit `i` is set when the student
+    attended the i-th session in chronological order. Rates, per-session counts and streaks
+    are computed with popcounts and shifts instead of per-student queries or list scans, so a
+    semester of sessions for 500+ students stays a few kilobytes.
+    """
+
+    def __init__(self, session_ids: List[int]):
+        """
+        Args:
+            session_ids (List[int]): Session ids in chronological order (oldest first).
+        """
+        self.session_ids = list(session_ids)
+        self.session_count = len(self.session_ids)
+        self.full_mask = (1 << self.session_count) - 1
+        self._index = {session_id: i for i, session_id in enumerate(self.session_ids)}
+        self.rows: Dict[str, int] = {}
+        self.session_students: List[List[str]] = [[] for _ in self.session_ids]
+
+    @classmethod
+    def from_pairs(cls, session_ids: List[int], pairs: Iterable[Tuple[int, str]]) -> "AttendanceMatrix":
+        """Build a matrix from (session_id, student_uuid) pairs, e.g. a streaming query result.
+
+        Args:
+            session_ids (List[int]): Session ids in chronological order.
+            pairs (Iterable[Tuple[int, str]]): Attendance records.
+
+        Returns:
+            AttendanceMatrix: The populated matrix.
+        """
+        matrix = cls(session_ids)
+        for session_id, student_uuid in pairs:
+            matrix.add(session_id, student_uuid)
+        return matrix
+
+    def add(self, session_id: int, student_uuid: str) -> None:
+        """Mark a student present; duplicates and unknown sessions are ignored."""
+        i = self._index.get(session_id)
+        if i is None:
+            return
+        bit = 1 << i
+        row = self.rows.get(student_uuid, 0)
+        if row & bit:
+            return
+        self.rows[student_uuid] = row | bit
+        self.session_students[i].append(student_uuid)
+
+    @property
+    def student_uuids(self) -> List[str]:
+        """Students in the order they first appear in the data."""
+        return list(self.rows.keys())
+
+    def session_counts(self) -> List[int]:
+        """Number of students present in every session (chronological order)."""
+        return [len(students) for students in self.session_students]
+
+    def students_of(self, session_id: int) -> List[str]:
+        i = self._index.get(session_id)
+        return list(self.session_students[i]) if i is not None else []
+
+    def attended_count(self, student_uuid: str) -> int:
+        return self.rows.get(student_uuid, 0).bit_count()
+
+    def attended_sessions(self, student_uuid: str) -> List[int]:
+        """Ids of the sessions a student attended (chronological order)."""
+        row = self.rows.get(student_uuid, 0)
+        attended = []
+        while row:
+            low = row & -row
+            attended.append(self.session_ids[low.bit_length() - 1])
+            row ^= low
+        return attended
+
+    def attendance_rate(self, student_uuid: str) -> float:
+        """Attendance percentage rounded to one decimal."""
+        if not self.session_count:
+            return 0.0
+        return round(self.attended_count(student_uuid) / self.session_count * 100, 1)
+
+    def longest_streak(self, student_uuid: str) -> int:
+        """Longest run of consecutive attended sessions."""
+        row = self.rows.get(student_uuid, 0)
+        streak = 0
+        while row:
+            row &= row << 1
+            streak += 1
+        return streak
+
+    def current_streak(self, student_uuid: str) -> int:
+        """Consecutive attended sessions ending with the most recent one."""
+        missed = ~self.rows.get(student_uuid, 0) & self.full_mask
+        if not missed:
+            return self.session_count
+        return self.session_count - missed.bit_length()
+
+    def average_rate(self) -> float:
+        """Average attendance percentage over the students present at least once."""
+        if not self.rows or not self.session_count:
+            return 0.0
+        present = sum(row.bit_count() for row in self.rows.values())
+        return round(present / (len(self.rows) * self.session_count) * 100, 1)
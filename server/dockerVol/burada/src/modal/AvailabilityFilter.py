@@ -0,0 +1,255 @@
+from modal import db
+from typing import Optional, Dict, Any, Iterable, List, Tuple
+import unicodedata
+import hashlib
+import logging
+import math
+import time
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+USERNAME = "username"
+EMAIL = "email"
+PHONE = "phone"
+
+# Bits are only set on an existing filter; SETBIT on a missing key would create an empty one
+# that reports every value as free
+_ADD_SCRIPT = """
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return 0
+    end
+    for i = 1, #ARGV do
+        redis.call('SETBIT', KEYS[1], ARGV[i], 1)
+    end
+    return 1
+"""
+
+
+class AvailabilityFilter:
+    """Bloom filter over the usernames, emails and phone numbers in `users`, kept in Redis.
+
+    The registration form asks whether a value is taken on every keystroke. A value the filter
+    has never seen is definitely free and is answered without a database query; a possible hit is
+    confirmed with the indexed lookup. The filter lives in a Redis bitmap so values added by one
+    worker process are visible to all of them.
+
+    Values can not be removed from a Bloom filter: an old username stays a (false) possible hit
+    until the next rebuild, which only costs the database lookup it would have cost anyway.
+
+    The filter expires after `ttl_seconds` and the next lookup rebuilds it, so a value whose add
+    was lost is reported as free for at most that long. A failed add drops the filter right away.
+    """
+
+    def __init__(self, capacity: int = 1000000, error_rate: float = 0.01, build_lock_seconds: int = 300, ttl_seconds: int = 6 * 3600):
+        """
+        Args:
+            capacity (int): Expected number of values of all three kinds (AVAILABILITY_FILTER_CAPACITY).
+            error_rate (float): False positive rate at capacity (AVAILABILITY_FILTER_ERROR_RATE).
+            build_lock_seconds (int): Longest time a build may hold the build lock.
+            ttl_seconds (int): Lifetime of a built filter (AVAILABILITY_FILTER_TTL).
+        """
+        capacity = int(os.getenv('AVAILABILITY_FILTER_CAPACITY', capacity))
+        error_rate = float(os.getenv('AVAILABILITY_FILTER_ERROR_RATE', error_rate))
+        self.size = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.build_lock_seconds = build_lock_seconds
+        self.ttl_seconds = int(os.getenv('AVAILABILITY_FILTER_TTL', ttl_seconds))
+        # Size and hash count are part of the key, a new configuration starts a new filter
+        self.key = f"bloom:availability:{self.size}:{self.hash_count}"
+        self._redis = None
+        self._add_script = None
+        # Set when an add failed and the filter could not be dropped either
+        self._dirty = False
+
+        self.definite_misses = 0
+        self.possible_hits = 0
+        self.unavailable = 0
+
+    @property
+    def client(self):
+        if self._redis is None:
+            from utils.redis.RedisUtils import AuthRedisClientUtils
+            self._redis = AuthRedisClientUtils()
+        return self._redis.client
+
+    @staticmethod
+    def normalize(value: str) -> str:
+        """Fold a value so that every spelling the utf8mb4_turkish_ci collation treats as equal
+        maps to the same string. Folding more than the collation only adds false positives."""
+        value = str(value).strip().replace('İ', 'i').replace('I', 'i').replace('ı', 'i').casefold()
+        value = unicodedata.normalize('NFKD', value)
+        return ''.join(char for char in value if not unicodedata.combining(char))
+
+    def _positions(self, kind: str, value: str) -> List[int]:
+        digest = hashlib.sha256(f"{kind}:{self.normalize(value)}".encode('utf-8')).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:16], 'big') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def _set_bits(self, pipe, key: str, items: Iterable[Tuple[str, Optional[str]]]) -> None:
+        for kind, value in items:
+            if value:
+                for position in self._positions(kind, value):
+                    pipe.setbit(key, position, 1)
+
+    def might_contain(self, kind: str, value: str) -> Optional[bool]:
+        """
+        Check whether a value may be taken.
+
+        Args:
+            kind (str): `username`, `email` or `phone`.
+            value (str): Value to check.
+
+        Returns:
+            Optional[bool]: False if the value is definitely free, True if it may be taken,
+                None if the filter is not available (the caller must query the database).
+        """
+        if self._dirty and not self._drop():
+            self.unavailable += 1
+            return None
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.exists(self.key)
+            for position in self._positions(kind, value):
+                pipe.getbit(self.key, position)
+            exists, *bits = pipe.execute()
+        except Exception as e:
+            logging.error(f"Availability filter error: {str(e)}")
+            self.unavailable += 1
+            return None
+
+        if not exists:
+            self.unavailable += 1
+            self.build_async()
+            return None
+        if all(bits):
+            self.possible_hits += 1
+            return True
+        self.definite_misses += 1
+        return False
+
+    def add(self, username: str = None, email: str = None, phone: str = None) -> None:
+        """Add the values of a created or changed user (see `User.create` and `User.change_*`).
+
+        If the bits can not be set the filter is dropped, lookups then use the database until it
+        is rebuilt instead of reporting the new values as free.
+        """
+        positions = []
+        for kind, value in ((USERNAME, username), (EMAIL, email), (PHONE, phone)):
+            if value:
+                positions += self._positions(kind, value)
+        if not positions:
+            return
+        try:
+            if self._add_script is None:
+                self._add_script = self.client.register_script(_ADD_SCRIPT)
+            self._add_script(keys=[self.key], args=positions)  # A missing filter is built from the database later
+        except Exception as e:
+            logging.error(f"Availability filter error, dropping the filter: {str(e)}")
+            self._dirty = True
+            self._drop()
+
+    def _drop(self) -> bool:
+        """Delete the filter so it is rebuilt; returns False while Redis can not be reached."""
+        try:
+            self.client.delete(self.key)
+        except Exception as e:
+            logging.error(f"Availability filter drop failed: {str(e)}")
+            return False
+        self._dirty = False
+        return True
+
+    def build(self, batch_size: int = 5000) -> bool:
+        """
+        Build the filter from `users` into a temporary key and swap it in. Only one process
+        builds at a time; users changed while building are added again after the swap.
+
+        Returns:
+            bool: True if this process built the filter.
+        """
+        from modal.User import User
+
+        lock_key = f"{self.key}:building"
+        try:
+            if not self.client.set(lock_key, os.getpid(), nx=True, ex=self.build_lock_seconds):
+                return False
+        except Exception as e:
+            logging.error(f"Availability filter build skipped: {str(e)}")
+            return False
+
+        started = time.time()
+        temp_key = f"{self.key}:{os.getpid()}"
+        try:
+            # Database time before the read; users changed from then on are replayed below
+            since = db.session.query(db.func.current_timestamp()).scalar()
+            self.client.delete(temp_key)
+            self.client.setbit(temp_key, self.size - 1, 0)  # Allocate the bitmap once
+            count = 0
+            pipe = self.client.pipeline(transaction=False)
+            query = db.session.query(User.username, User.email, User.phone).yield_per(batch_size)
+            for username, email, phone in query:
+                self._set_bits(pipe, temp_key, ((USERNAME, username), (EMAIL, email), (PHONE, phone)))
+                count += 1
+                if count % batch_size == 0:
+                    pipe.execute()
+            pipe.execute()
+            self.client.expire(temp_key, self.ttl_seconds)  # RENAME keeps the expiry
+            self.client.rename(temp_key, self.key)
+
+            # End the read snapshot, otherwise users committed while building are not seen here
+            db.session.commit()
+            for username, email, phone in db.session.query(User.username, User.email, User.phone).filter(User.updatedAt >= since):
+                self.add(username, email, phone)
+
+            logging.info(f"Availability filter built from {count} users in {time.time() - started:.2f}s ({self.size} bits, {self.hash_count} hashes)")
+            return True
+        except Exception as e:
+            logging.error(f"Availability filter build failed: {str(e)}")
+            try:
+                self.client.delete(temp_key)
+            except Exception:
+                pass
+            return False
+        finally:
+            try:
+                self.client.delete(lock_key)
+            except Exception:
+                pass
+
+    def build_async(self) -> None:
+        """Build the filter in a background thread, lookups use the database meanwhile."""
+        from flask import current_app
+        from threading import Thread
+
+        try:
+            if self.client.exists(f"{self.key}:building"):
+                return
+            app = current_app._get_current_object()
+        except Exception:
+            return
+
+        def run():
+            with app.app_context():
+                self.build()
+
+        Thread(target=run, name="availability-filter-build", daemon=True).start()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the filter settings and counters."""
+        checks = self.definite_misses + self.possible_hits
+        return {
+            "size_bits": self.size,
+            "hash_count": self.hash_count,
+            "ttl_seconds": self.ttl_seconds,
+            "dirty": self._dirty,
+            "definite_misses": self.definite_misses,
+            "possible_hits": self.possible_hits,
+            "unavailable": self.unavailable,
+            "db_queries_saved": round(self.definite_misses / checks, 4) if checks else 0.0,
+        }
+
+
+availability_filter = AvailabilityFilter()
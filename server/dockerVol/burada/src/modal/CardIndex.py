@@ -0,0 +1,328 @@
+from modal import db
+from typing import Optional, Dict, Any, List, Tuple
+from threading import Lock
+import logging
+import time
+
+import os
+from dotenv import load_dotenv
+
+from utils.CacheUtils import TTLCache
+
+load_dotenv()
+
+TEACHER = "teacher"
+STUDENT = "student"
+
+_NO_CARD_IDS = ("", "NOCARD")
+
+
+class CardIdentity:
+    """Lightweight, session independent snapshot of a teacher or a student resolved from a card."""
+
+    __slots__ = ("kind", "uuid", "name", "surname")
+
+    def __init__(self, kind: str, uuid: str, name: str, surname: str = ""):
+        self.kind = kind
+        self.uuid = uuid
+        self.name = name
+        self.surname = surname
+
+    @property
+    def is_teacher(self) -> bool:
+        return self.kind == TEACHER
+
+    @property
+    def is_student(self) -> bool:
+        return self.kind == STUDENT
+
+    def __repr__(self) -> str:
+        return f"<CardIdentity {self.kind}-{self.uuid}-{self.name} {self.surname}>"
+
+
+class CardIndex:
+    """Process-local index that maps card payloads (sector 24/25/26) to teachers and students.
+
+    Teachers are keyed by their normalized username (sector25 + sector24), students by their
+    normalized full name (sector24 + ' ' + sector25) and both by the card id (sector26) once a
+    card has been resolved. The index is rebuilt lazily when it is invalidated or when its TTL
+    expires, so other worker processes eventually see changes made elsewhere.
+
+    One thread rebuilds at a time while the others keep using the previous index. Teachers and
+    students are reloaded in full; card ids are read incrementally, only the attendance rows added
+    since the last rebuild. Payloads resolved by the database fallback are kept as aliases across
+    rebuilds, as long as the name they resolved to is unchanged. Payloads the database did not
+    know either are cached for a short time.
+    """
+
+    def __init__(self, ttl_seconds: int = 300, negative_ttl_seconds: int = 30):
+        self.ttl_seconds = int(os.getenv('CARD_INDEX_TTL', ttl_seconds))
+        self._lock = Lock()
+        self._refresh_lock = Lock()
+        self._teachers: Dict[str, CardIdentity] = {}
+        self._students: Dict[str, CardIdentity] = {}
+        self._cards: Dict[str, CardIdentity] = {}
+        self._card_students: Dict[str, str] = {}  # card id -> student uuid
+        self._aliases: Dict[Tuple[str, str], Tuple[str, str]] = {}  # (kind, payload key) -> (uuid, name key)
+        self._unknown = TTLCache(ttl_seconds=int(os.getenv('CARD_INDEX_NEGATIVE_TTL', negative_ttl_seconds)), max_size=1024)
+        self._last_detail_id = 0
+        self._built = False
+        self._loaded_at: Optional[float] = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize(value: Optional[str]) -> str:
+        """Normalize a card sector or a database value for exact matching.
+
+        Dots used as padding on the cards are removed, whitespace is collapsed and the text is
+        lowered with every dotted and dotless i folded to `i`. The cards only carry ASCII, so an
+        upper-case `I` on a card may stand for either letter; the database fallback uses the same key.
+
+        Args:
+            value (str): Raw value.
+
+        Returns:
+            str: Normalized value.
+        """
+        if not value:
+            return ""
+        value = str(value).replace('.', '').replace('İ', 'i').replace('I', 'i').replace('ı', 'i')
+        return ' '.join(value.split()).lower()
+
+    @classmethod
+    def teacher_key(cls, sector24: str, sector25: str) -> str:
+        return cls.normalize(f"{sector25}{sector24}").replace(' ', '')
+
+    @classmethod
+    def student_key(cls, sector24: str, sector25: str) -> str:
+        return cls.normalize(f"{sector24} {sector25}")
+
+    @classmethod
+    def _name_key(cls, identity: CardIdentity) -> str:
+        """Key an identity is indexed under by its own name."""
+        if identity.is_teacher:
+            return cls.normalize(identity.name).replace(' ', '')
+        return cls.student_key(identity.name, identity.surname)
+
+    def _is_stale(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        return (time.monotonic() - self._loaded_at) > self.ttl_seconds
+
+    def refresh(self, wait: bool = True) -> None:
+        """Rebuild the index from the users, students and attendance detail tables.
+
+        Args:
+            wait (bool): Wait for a rebuild running in another thread instead of returning at once.
+        """
+        if not self._refresh_lock.acquire(blocking=wait):
+            return
+        try:
+            if self._built and not self._is_stale():
+                return  # Rebuilt by another thread while this one waited
+            self._rebuild()
+        finally:
+            self._refresh_lock.release()
+
+    def _rebuild(self) -> None:
+        from modal.User import User
+        from modal.Student import Student
+        from modal.AttenationDetail import AttenationDetail
+
+        teachers = {}
+        for unique_id, username in db.session.query(User.uniqueID, User.username).all():
+            teachers[self.normalize(username).replace(' ', '')] = CardIdentity(TEACHER, unique_id, username)
+
+        students = {}
+        students_by_uuid = {}
+        for student_uuid, name, surname in db.session.query(Student.student_uuid, Student.name, Student.surname).all():
+            identity = CardIdentity(STUDENT, student_uuid, name, surname)
+            students[self.student_key(name, surname)] = identity
+            students_by_uuid[student_uuid] = identity
+
+        # Attendance history only grows: read the rows added since the last rebuild
+        with self._lock:
+            card_students = dict(self._card_students)
+            last_id = self._last_detail_id
+        max_id = db.session.query(db.func.max(AttenationDetail.id)).scalar() or 0
+        if max_id < last_id:
+            card_students, last_id = {}, 0  # Table was emptied or recreated
+        for card_id, student_uuid in (
+            db.session.query(AttenationDetail.card_id, AttenationDetail.student_uuid)
+            .filter(AttenationDetail.id > last_id, AttenationDetail.id <= max_id, AttenationDetail.card_id.notin_(_NO_CARD_IDS))
+            .order_by(AttenationDetail.id)
+        ):
+            card_students[card_id] = student_uuid
+
+        cards = {
+            card_id: students_by_uuid[student_uuid]
+            for card_id, student_uuid in card_students.items()
+            if student_uuid in students_by_uuid
+        }
+
+        with self._lock:
+            # Aliases follow their identity while its name is unchanged, a renamed or deleted
+            # one goes back to the database fallback
+            for (kind, key), (uuid, name_key) in list(self._aliases.items()):
+                identities = teachers if kind == TEACHER else students
+                identity = identities.get(name_key)
+                if identity is None or identity.uuid != uuid:
+                    del self._aliases[(kind, key)]
+                else:
+                    identities.setdefault(key, identity)
+            self._teachers = teachers
+            self._students = students
+            self._cards = cards
+            # Cards remembered by scans during the rebuild are kept
+            self._card_students = dict(self._card_students, **card_students)
+            self._last_detail_id = max_id
+            self._built = True
+            self._loaded_at = time.monotonic()
+            self.refreshes += 1
+        self._unknown.clear()  # New users and students may match them now
+
+    def invalidate(self) -> None:
+        """Drop the index; it is rebuilt on the next lookup."""
+        with self._lock:
+            self._loaded_at = None
+            self.invalidations += 1
+        self._unknown.clear()
+
+    def remember(self, identity: CardIdentity, sector24: str, sector25: str, card_id: str = None) -> None:
+        """Store an identity resolved outside the index (e.g. by the database fallback).
+
+        Args:
+            identity (CardIdentity): Resolved identity.
+            sector24 (str): Sector 24 payload.
+            sector25 (str): Sector 25 payload.
+            card_id (str, optional): Sector 26 payload (card id).
+        """
+        kind = TEACHER if identity.is_teacher else STUDENT
+        key = self.teacher_key(sector24, sector25) if identity.is_teacher else self.student_key(sector24, sector25)
+        name_key = self._name_key(identity)
+        with self._lock:
+            (self._teachers if identity.is_teacher else self._students)[key] = identity
+            if key != name_key:
+                self._aliases[(kind, key)] = (identity.uuid, name_key)
+            if identity.is_student:
+                if card_id and card_id not in _NO_CARD_IDS:
+                    self._cards[card_id] = identity
+                    self._card_students[card_id] = identity.uuid
+
+    def lookup(self, sector24: str, sector25: str, card_id: str = None) -> Optional[CardIdentity]:
+        """Resolve a card payload to a teacher or a student.
+
+        Teachers win over students, the same order the scan endpoint always used.
+
+        Args:
+            sector24 (str): Sector 24 payload (name).
+            sector25 (str): Sector 25 payload (surname).
+            card_id (str, optional): Sector 26 payload (card id).
+
+        Returns:
+            Optional[CardIdentity]: The identity if it is indexed, None otherwise.
+        """
+        if self._is_stale():
+            # Only the very first build makes scans wait; later ones run in a single thread
+            # while the others use the previous index
+            self.refresh(wait=not self._built)
+
+        with self._lock:
+            identity = self._teachers.get(self.teacher_key(sector24, sector25))
+            if identity is None:
+                identity = self._students.get(self.student_key(sector24, sector25))
+            if identity is None and card_id and card_id not in _NO_CARD_IDS:
+                identity = self._cards.get(card_id)
+
+            if identity is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return identity
+
+    def resolve(self, sector24: str, sector25: str, card_id: str = None) -> Optional[CardIdentity]:
+        """Resolve a card payload, falling back to the database on an index miss.
+
+        The fallback keeps the historical LIKE semantics (e.g. truncated surnames on the card)
+        and remembers the result so the next scan of the same card is an index hit.
+
+        Args:
+            sector24 (str): Sector 24 payload (name).
+            sector25 (str): Sector 25 payload (surname).
+            card_id (str, optional): Sector 26 payload (card id).
+
+        Returns:
+            Optional[CardIdentity]: The identity if found, None otherwise.
+        """
+        identity = self.lookup(sector24, sector25, card_id)
+        if identity is not None:
+            return identity
+
+        unknown_key = (self.teacher_key(sector24, sector25), self.student_key(sector24, sector25), card_id or "")
+        if self._unknown.get(unknown_key):
+            return None
+
+        from modal.User import User
+        from modal.Student import Student
+
+        teacher = User.query.filter(
+            db.func.concat(User.username).like(self.teacher_key(sector24, sector25))
+        ).first()
+        if teacher:
+            identity = CardIdentity(TEACHER, teacher.uniqueID, teacher.username)
+        else:
+            student = Student.query.filter(
+                db.func.concat(Student.name, ' ', Student.surname).like(f"{sector24} {sector25}%".strip())
+            ).first()
+            if student:
+                identity = CardIdentity(STUDENT, student.student_uuid, student.name, student.surname)
+
+        if identity is not None:
+            self.remember(identity, sector24, sector25, card_id)
+        else:
+            self._unknown.set(unknown_key, True)
+        return identity
+
+    def resolve_many(self, payloads: List[Tuple[str, str, Optional[str]]]) -> List[Optional[CardIdentity]]:
+        """Resolve the card payloads of a scan batch.
+
+        Every payload is looked up in the index; the database fallback runs once per distinct
+        missing payload, however often the card was scanned in the batch.
+
+        Args:
+            payloads (List[Tuple[str, str, Optional[str]]]): (sector24, sector25, card_id) per scan.
+
+        Returns:
+            List[Optional[CardIdentity]]: Identities in the order of `payloads`.
+        """
+        resolved: Dict[Tuple[str, str, Optional[str]], Optional[CardIdentity]] = {}
+        identities = []
+        for payload in payloads:
+            if payload not in resolved:
+                resolved[payload] = self.resolve(*payload)
+            identities.append(resolved[payload])
+        return identities
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the index counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "refreshes": self.refreshes,
+                "invalidations": self.invalidations,
+                "teachers": len(self._teachers),
+                "students": len(self._students),
+                "cards": len(self._cards),
+                "aliases": len(self._aliases),
+                "unknown": len(self._unknown),
+                "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at is not None else None,
+            }
+
+
+card_index = CardIndex()
@@ -0,0 +1,87 @@
+from typing import Callable, Dict, Union
+from threading import Lock
+import secrets
+import time
+import uuid
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_uuid7_lock = Lock()
+_uuid7_last_ms = 0
+_uuid7_counter = 0
+
+
+def uuid7() -> str:
+    """Generate a time-ordered UUID version 7 (RFC 9562).
+
+    48 bits of unix milliseconds are followed by a 12 bit counter that keeps ids generated
+    in the same millisecond monotonic within the process, and 62 random bits.
+
+    Returns:
+        str: Lowercase, hyphenated UUID string.
+    """
+    global _uuid7_last_ms, _uuid7_counter
+
+    with _uuid7_lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _uuid7_last_ms:
+            _uuid7_last_ms = now_ms
+            _uuid7_counter = secrets.randbits(11)  # Leave headroom for increments
+        else:
+            _uuid7_counter += 1
+            if _uuid7_counter > 0xFFF:
+                # Counter exhausted within this millisecond, borrow the next one
+                _uuid7_last_ms += 1
+                _uuid7_counter = 0
+        ms = _uuid7_last_ms
+        counter = _uuid7_counter
+
+    value = (ms & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76
+    value |= counter << 64
+    value |= 0b10 << 62
+    value |= secrets.randbits(62)
+    return str(uuid.UUID(int=value))
+
+
+def uuid1() -> str:
+    """Generate a time-based UUID version 1, the same layout MySQL's UUID() returns."""
+    return str(uuid.uuid1())
+
+
+def uuid4() -> str:
+    """Generate a random UUID version 4."""
+    return str(uuid.uuid4())
+
+
+ID_GENERATORS: Dict[str, Callable[[], str]] = {
+    "uuid7": uuid7,
+    "uuid1": uuid1,
+    "uuid4": uuid4,
+}
+
+_generator: Callable[[], str] = ID_GENERATORS.get(os.getenv('ID_GENERATOR', 'uuid7').lower(), uuid7)
+
+
+def set_id_generator(generator: Union[str, Callable[[], str]]) -> None:
+    """Replace the process-wide id generator.
+
+    Args:
+        generator (str | Callable): Name of a registered generator (uuid7, uuid1, uuid4) or a
+            callable returning a UUID string.
+    """
+    global _generator
+
+    if isinstance(generator, str):
+        if generator.lower() not in ID_GENERATORS:
+            raise ValueError(f"Unknown id generator: {generator}")
+        generator = ID_GENERATORS[generator.lower()]
+    _generator = generator
+
+
+def generate_uuid() -> str:
+    """Generate a new id with the configured generator, without touching the database."""
+    return _generator()
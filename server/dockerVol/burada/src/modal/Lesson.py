@@ -4,6 +4,7 @@ from sqlalchemy.exc import SQLAlchemyError
 import logging
 
 from modal.messages.Messages import LessonModelMessages as LMM
+from modal.IdGenerator import generate_uuid
 
 class Lesson(db.Model):
     __tablename__ = 'lessons'
@@ -17,7 +18,7 @@ class Lesson(db.Model):
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(255), nullable=False)
-    lesson_uuid = db.Column(db.String(36), unique=True, default=db.func.uuid())
+    lesson_uuid = db.Column(db.String(36), unique=True, default=generate_uuid)
     created_at = db.Column(db.DateTime, server_default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, server_default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
     
@@ -42,7 +43,7 @@ class Lesson(db.Model):
             
             lesson = Lesson(
                 name=name,
-                lesson_uuid=db.func.uuid()
+                lesson_uuid=generate_uuid()
             )
             
             db.session.add(lesson)
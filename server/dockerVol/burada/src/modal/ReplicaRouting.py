@@ -0,0 +1,256 @@
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session
+from functools import wraps
+from itertools import count
+from threading import Lock
+from typing import Any, Dict, List, Optional
+import logging
+import time
+
+import sqlalchemy as sa
+from sqlalchemy.engine.url import make_url
+
+import os
+from dotenv import load_dotenv
+
+from utils.CacheUtils import TTLCache
+
+load_dotenv()
+
+REPLICA_BIND_PREFIX = "replica_"
+
+
+class ReplicaRouter:
+    """Sends the reads of read-only endpoints (see `use_replica`) to MySQL replicas.
+
+    Replicas are configured with DB_REPLICA_URLS (comma separated) and become the binds
+    `replica_0`, `replica_1`, ... Their lag is measured at most every `check_interval` seconds;
+    a replica that lags more than `max_lag` seconds, or fails, is skipped until the next check,
+    and with no healthy replica reads go to the primary.
+
+    Read-your-writes: after a teacher opens or closes an attendance session the teacher is pinned
+    to the primary for `pin_seconds` (longer than a replica may lag), in Redis so every worker
+    sees it. Inside one request, everything after the first write goes to the primary as well.
+    """
+
+    def __init__(self, max_lag: float = 5, check_interval: float = 5, pin_seconds: Optional[float] = None):
+        """
+        Args:
+            max_lag (float): Largest replica lag in seconds that is still used (DB_REPLICA_MAX_LAG).
+            check_interval (float): Seconds between lag checks of a replica (DB_REPLICA_CHECK_INTERVAL).
+            pin_seconds (float, optional): Primary-only period after a write (DB_REPLICA_PIN_SECONDS),
+                defaults to max_lag + check_interval + 1.
+        """
+        self.urls = [url.strip() for url in os.getenv('DB_REPLICA_URLS', '').split(',') if url.strip()]
+        self.max_lag = float(os.getenv('DB_REPLICA_MAX_LAG', max_lag))
+        self.check_interval = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', check_interval))
+        self.pin_seconds = float(os.getenv('DB_REPLICA_PIN_SECONDS', pin_seconds or self.max_lag + self.check_interval + 1))
+        # Statement returning the lag in seconds; by default the replication status of MySQL
+        self.lag_query = os.getenv('DB_REPLICA_LAG_QUERY')
+
+        self._lock = Lock()
+        self._check_lock = Lock()
+        self._lag: Dict[str, Optional[float]] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._next = count()
+        self._pins = TTLCache(ttl_seconds=self.pin_seconds, max_size=10000)
+        self._redis = None
+
+        self.replica_reads = 0
+        self.primary_fallbacks = 0
+        self.pins = 0
+        self.failed_checks = 0
+
+    @property
+    def keys(self) -> List[str]:
+        return [f"{REPLICA_BIND_PREFIX}{index}" for index in range(len(self.urls))]
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.urls)
+
+    def binds(self) -> Dict[str, Dict[str, Any]]:
+        """SQLALCHEMY_BINDS entries of the replicas, with the same pool options as the primary."""
+        from utils.DatabaseUtils import engine_options
+        return {key: dict(engine_options(url), url=url) for key, url in zip(self.keys, self.urls)}
+
+    def init_app(self, app) -> None:
+        """Add the replica binds to the app config; call before `db.init_app` (see `create_app`)."""
+        if not self.enabled:
+            return
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds.update(self.binds())
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+    def watch(self, engines) -> None:
+        """Skip a replica as soon as one of its connections breaks (call after `db.init_app`)."""
+        for key in self.keys:
+            sa.event.listen(engines[key], 'handle_error', lambda context, key=key: self._on_error(key, context))
+
+    def _on_error(self, key: str, context) -> None:
+        if context.is_disconnect:
+            logging.warning(f"Replica {key} disconnected, reading from the other replicas or the primary")
+            self.mark_failed(key)
+
+    # region Lag
+    def _measure_lag(self, engine: sa.engine.Engine) -> Optional[float]:
+        """Lag of a replica in seconds, None if replication is broken."""
+        with engine.connect() as connection:
+            if self.lag_query:
+                value = connection.execute(sa.text(self.lag_query)).scalar()
+                return None if value is None else float(value)
+            if make_url(str(engine.url)).get_backend_name() != 'mysql':
+                return 0.0  # Local stand-ins (SQLite) have no replication
+
+            for statement, column in (("SHOW REPLICA STATUS", "Seconds_Behind_Source"), ("SHOW SLAVE STATUS", "Seconds_Behind_Master")):
+                try:
+                    row = connection.execute(sa.text(statement)).mappings().first()
+                except sa.exc.DBAPIError:
+                    continue  # MySQL < 8.0.22 only knows SHOW SLAVE STATUS
+                if row is None:
+                    return 0.0  # Not a replica: a read-only copy of the primary
+                value = row.get(column)
+                return None if value is None else float(value)
+        return None
+
+    def _refresh(self, engines) -> None:
+        """Measure the replicas whose last check is older than `check_interval`; one thread at a time."""
+        now = time.monotonic()
+        stale = [key for key in self.keys if now - self._checked_at.get(key, 0) >= self.check_interval]
+        if not stale or not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            for key in stale:
+                try:
+                    lag = self._measure_lag(engines[key])
+                except Exception as e:
+                    lag = None
+                    with self._lock:
+                        self.failed_checks += 1
+                    logging.warning(f"Replica {key} lag check failed: {str(e)}")
+                with self._lock:
+                    self._lag[key] = lag
+                    self._checked_at[key] = time.monotonic()
+        finally:
+            self._check_lock.release()
+
+    def mark_failed(self, key: str) -> None:
+        """Skip a replica until its next lag check, e.g. after a dropped connection."""
+        with self._lock:
+            self._lag[key] = None
+            self._checked_at[key] = time.monotonic()
+
+    def healthy(self) -> List[str]:
+        with self._lock:
+            return [key for key in self.keys if self._lag.get(key) is not None and self._lag[key] <= self.max_lag]
+    # endregion
+
+    def engine_for_read(self, engines) -> Optional[sa.engine.Engine]:
+        """
+        Pick a replica engine for a read (round robin over the healthy replicas).
+
+        Args:
+            engines (Mapping): `db.engines` of the current app.
+
+        Returns:
+            Optional[Engine]: None if no replica may be used; the caller reads from the primary.
+        """
+        self._refresh(engines)
+        healthy = self.healthy()
+        if not healthy:
+            with self._lock:
+                self.primary_fallbacks += 1
+            return None
+        with self._lock:
+            self.replica_reads += 1
+        return engines[healthy[next(self._next) % len(healthy)]]
+
+    # region Read-your-writes
+    @property
+    def client(self):
+        if self._redis is None:
+            from utils.redis.RedisUtils import AuthRedisClientUtils
+            self._redis = AuthRedisClientUtils()
+        return self._redis.client
+
+    def pin_primary(self, user_uuid: str) -> None:
+        """Read from the primary for this user until the replicas have caught up with their write."""
+        if not self.enabled or not user_uuid:
+            return
+        with self._lock:
+            self.pins += 1
+        self._pins.set(user_uuid, True)
+        try:
+            self.client.set(f"db:primary:{user_uuid}", 1, px=int(self.pin_seconds * 1000))
+        except Exception as e:
+            logging.error(f"Replica pin could not be stored in Redis: {str(e)}")
+
+    def is_pinned(self, user_uuid: str) -> bool:
+        if not user_uuid:
+            return False
+        if self._pins.get(user_uuid):
+            return True
+        try:
+            return bool(self.client.exists(f"db:primary:{user_uuid}"))
+        except Exception:
+            return False  # Local pins still cover the writes made by this process
+    # endregion
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the replica lags and routing counters."""
+        with self._lock:
+            return {
+                "replicas": len(self.urls),
+                "healthy": [key for key in self.keys if self._lag.get(key) is not None and self._lag[key] <= self.max_lag],
+                "lag_seconds": {key: self._lag.get(key) for key in self.keys},
+                "max_lag": self.max_lag,
+                "replica_reads": self.replica_reads,
+                "primary_fallbacks": self.primary_fallbacks,
+                "pins": self.pins,
+                "failed_checks": self.failed_checks,
+            }
+
+
+replica_router = ReplicaRouter()
+
+
+def _is_write(clause) -> bool:
+    """DML, SELECT ... FOR UPDATE and plain text statements (unknown) stay on the primary."""
+    if clause is None:
+        return False
+    if getattr(clause, 'is_dml', False) or isinstance(clause, sa.sql.elements.TextClause):
+        return True
+    return getattr(clause, '_for_update_arg', None) is not None
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that reads from a replica while the request asked for it
+    (`g.db_use_replica`, see `use_replica`) and has not written anything yet."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wrote = False
+        self._replica = None  # Picked once, so one request does not mix replicas with different lag
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and replica_router.enabled:
+            if self._flushing or _is_write(clause):
+                self._wrote = True
+            elif not self._wrote and has_request_context() and g.get('db_use_replica'):
+                if self._replica is None:
+                    self._replica = replica_router.engine_for_read(self._db.engines) or False
+                if self._replica:
+                    return self._replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def use_replica(f):
+    """Route the reads of a read-only endpoint to a replica. Place it under `login_required`
+    so a teacher who has just written keeps reading from the primary."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if replica_router.enabled:
+            user = g.get('user') or {}
+            g.db_use_replica = not replica_router.is_pinned(user.get('user_uuid'))
+        return f(*args, **kwargs)
+    return decorated_function
@@ -0,0 +1,448 @@
+from flask import current_app
+from typing import Optional, Dict, Any, Callable, Tuple
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock, Timer
+from datetime import datetime
+import multiprocessing
+import hashlib
+import logging
+import json
+import time
+import re
+import io
+
+import os
+from dotenv import load_dotenv
+
+from utils.ReportUtils import REPORT_RENDER_VERSION, get_report_theme, render_report, warm_up
+
+load_dotenv()
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+_KEY_RE = re.compile(r'^[0-9a-f]{40}$')
+
+
+class ReportJobQueue:
+    """Content-addressed PDF report cache with a process pool for rendering.
+
+    A report is identified by a key derived from its kind, subject (lesson or session), the
+    requesting teacher and a fingerprint of the attendance data it is built from. A report whose
+    data did not change is served from the cache directory; otherwise it is rendered in a worker
+    process from plain dicts (see `utils.ReportUtils`). Every job has a JSON sidecar with its
+    status (pending, failed or done) and metadata, so any app process can answer status and
+    download requests for a job id. Old artifacts are evicted by age and then, oldest first,
+    by total size.
+    """
+
+    def __init__(self, max_workers: int = 2, max_cache_mb: int = 200, max_age_seconds: int = 7 * 24 * 3600, job_timeout: int = 120, failed_ttl: int = 3600):
+        self.max_workers = int(os.getenv('REPORT_WORKERS', max_workers))
+        self.max_cache_bytes = int(os.getenv('REPORT_CACHE_MAX_MB', max_cache_mb)) * 1024 * 1024
+        self.max_age_seconds = int(os.getenv('REPORT_CACHE_MAX_AGE', max_age_seconds))
+        # A pending job older than this is reported as failed and may be submitted again
+        self.job_timeout = int(os.getenv('REPORT_JOB_TIMEOUT', job_timeout))
+        # Sidecars of failed or abandoned jobs (no PDF) are evicted after this many seconds
+        self.failed_ttl = failed_ttl
+        self._cache_dir: Optional[str] = os.getenv('REPORT_CACHE_DIR')
+        # Workers come from a forkserver by default: forking a threaded gunicorn worker can copy a
+        # lock held by another thread (logging, the pool, the write-behind queues) and deadlock.
+        # The forkserver preloads the renderer once; each worker then loads the theme (warm_up).
+        self.start_method = os.getenv('REPORT_START_METHOD', 'forkserver')
+
+        self._lock = Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._inflight: Dict[str, float] = {}  # Jobs submitted by this process
+
+        self.hits = 0
+        self.misses = 0
+        self.rendered = 0
+        self.failed = 0
+        self.evicted = 0
+        self._phases: Dict[str, Dict[str, float]] = {}
+
+    @property
+    def cache_dir(self) -> str:
+        """Directory of the cached reports (REPORT_CACHE_DIR, defaults to static/reports)."""
+        if self._cache_dir is None:
+            self._cache_dir = os.path.join(current_app.root_path, 'static', 'reports')
+        os.makedirs(self._cache_dir, exist_ok=True)
+        return self._cache_dir
+
+    @staticmethod
+    def cache_key(kind: str, subject: Any, teacher_uuid: str, fingerprint: Any) -> str:
+        """
+        Build the content address of a report.
+
+        The renderer version and the theme font are part of the key, so a layout change or a
+        font fallback never serves a PDF rendered the other way.
+
+        Args:
+            kind (str): Report kind, `lesson` or `session`.
+            subject (Any): Lesson UUID or attendance session id.
+            teacher_uuid (str): Requesting teacher.
+            fingerprint (Any): Values that change whenever the report data changes.
+
+        Returns:
+            str: Hex digest used as job id and file name.
+        """
+        theme = get_report_theme()
+        raw = json.dumps([REPORT_RENDER_VERSION, theme.font, theme.bold_font, kind, subject, teacher_uuid, fingerprint], default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:40]
+
+    def pdf_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        if not _KEY_RE.match(key or ''):
+            return None
+        try:
+            with open(self._meta_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, key: str, meta: Dict[str, Any]) -> None:
+        meta_tmp = f"{self._meta_path(key)}.{os.getpid()}.{time.monotonic_ns()}.tmp"
+        with open(meta_tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_tmp, self._meta_path(key))
+
+    def _is_expired(self, meta: Dict[str, Any]) -> bool:
+        """A pending job whose process died or hung (e.g. a recycled gunicorn worker)."""
+        return meta.get("status") == PENDING and time.time() - meta.get("submitted_ts", 0) > self.job_timeout
+
+    def get_cached(self, key: str, teacher_uuid: str = None) -> Optional[Dict[str, Any]]:
+        """
+        Get the metadata of a cached report.
+
+        Args:
+            key (str): Report key.
+            teacher_uuid (str, optional): If given, the report must belong to this teacher.
+
+        Returns:
+            Optional[Dict[str, Any]]: Metadata if the report is cached, None otherwise.
+        """
+        meta = self._read_meta(key)
+        if meta is None or meta.get("status", DONE) != DONE:
+            return None
+
+        pdf_path = self.pdf_path(key)
+        if not os.path.exists(pdf_path):
+            return None
+
+        if teacher_uuid is not None and meta.get("teacher_uuid") != teacher_uuid:
+            return None
+
+        # Eviction is oldest-access first
+        try:
+            os.utime(pdf_path)
+        except OSError:
+            pass
+        return meta
+
+    def _store(self, key: str, tmp_path: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+        meta = dict(meta, job_id=key, status=DONE, created_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        os.replace(tmp_path, self.pdf_path(key))
+        self._write_meta(key, meta)
+        return meta
+
+    def _tmp_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.{os.getpid()}.{time.monotonic_ns()}.tmp")
+
+    def render(self, kind: str, key: str, meta: Dict[str, Any], loader: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Return a cached report or render it synchronously in the calling thread.
+
+        Args:
+            kind (str): Report kind.
+            key (str): Report key.
+            meta (Dict[str, Any]): Report metadata (teacher_uuid, filename, title, ...).
+            loader (Callable): Returns the report data; only called on a cache miss.
+
+        Returns:
+            Dict[str, Any]: Metadata of the cached report.
+        """
+        cached = self.get_cached(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return cached
+
+        with self._lock:
+            self.misses += 1
+        tmp_path = self._tmp_path(key)
+        try:
+            data, query_ms = self._load(loader)
+            timings = dict(query_ms=query_ms, **render_report(kind, data, tmp_path))
+            stored = self._store(key, tmp_path, dict(meta, timings=timings))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._record(timings)
+        self.evict()
+        return stored
+
+    @staticmethod
+    def _load(loader: Callable[[], Dict[str, Any]]):
+        started = time.perf_counter()
+        data = loader()
+        return data, round((time.perf_counter() - started) * 1000, 2)
+
+    def _record(self, timings: Dict[str, float]) -> None:
+        """Add the phase timings of a rendered report to the counters."""
+        with self._lock:
+            self.rendered += 1
+            for phase, ms in timings.items():
+                total = self._phases.setdefault(phase, {"total_ms": 0.0, "max_ms": 0.0})
+                total["total_ms"] += ms
+                total["max_ms"] = max(total["max_ms"], ms)
+        logging.info(f"Report rendered in {sum(timings.values()):.1f} ms ({', '.join(f'{phase}={ms}' for phase, ms in timings.items())})")
+
+    def render_bytes(self, kind: str, loader: Callable[[], Dict[str, Any]]) -> Tuple[bytes, Dict[str, float]]:
+        """
+        Render a report into memory without touching the cache directory.
+
+        Args:
+            kind (str): Report kind.
+            loader (Callable): Returns the report data.
+
+        Returns:
+            Tuple[bytes, Dict[str, float]]: The PDF document and its phase timings in milliseconds.
+        """
+        buffer = io.BytesIO()
+        data, query_ms = self._load(loader)
+        timings = dict(query_ms=query_ms, **render_report(kind, data, buffer))
+        self._record(timings)
+        return buffer.getvalue(), timings
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            # A worker that died (OOM kill, segfault) leaves the pool broken for good
+            if self._executor is None or self._executor_pid != os.getpid() or getattr(self._executor, '_broken', False):
+                start_method = self.start_method if self.start_method in multiprocessing.get_all_start_methods() else None
+                context = multiprocessing.get_context(start_method)
+                if context.get_start_method() == 'forkserver':
+                    context.set_forkserver_preload(['utils.ReportUtils'])
+                else:
+                    warm_up()  # Forked workers inherit the loaded fonts and styles
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=warm_up
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def submit(self, kind: str, key: str, meta: Dict[str, Any], loader: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Queue a report build unless it is cached or already being built.
+
+        The data is loaded in the calling thread (it needs the app context and is cheap compared
+        to the layout); the layout and the PDF write run in a worker process.
+
+        Args:
+            kind (str): Report kind.
+            key (str): Report key.
+            meta (Dict[str, Any]): Report metadata (teacher_uuid, filename, title, ...).
+            loader (Callable): Returns the report data; only called when a build is queued.
+
+        Returns:
+            Dict[str, Any]: Job status.
+        """
+        cached = self.get_cached(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return cached
+
+        # Another process may already be building it (the sidecar is shared)
+        current = self._read_meta(key)
+        if current is not None and current.get("status") == PENDING and not self._is_expired(current):
+            return current
+
+        with self._lock:
+            if key in self._inflight:
+                return self._read_meta(key) or dict(meta, job_id=key, status=PENDING)
+            self.misses += 1
+            self._inflight[key] = time.time()
+
+        job = dict(meta, job_id=key, status=PENDING, submitted_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'), submitted_ts=time.time())
+        try:
+            self._write_meta(key, job)
+            tmp_path = self._tmp_path(key)
+            data, query_ms = self._load(loader)
+            executor, future = self._submit_render(kind, data, tmp_path)
+        except Exception as e:
+            return self._fail(key, e, job)
+
+        deadline = Timer(self.job_timeout, self._expire, args=(key, future, executor, job))
+        deadline.daemon = True
+        deadline.start()
+        future.add_done_callback(lambda f: (deadline.cancel(), self._finish(key, tmp_path, meta, query_ms, f)))
+        return job
+
+    def _submit_render(self, kind: str, data: Dict[str, Any], tmp_path: str) -> Tuple[ProcessPoolExecutor, Future]:
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(render_report, kind, data, tmp_path)
+        except BrokenProcessPool:
+            # The pool broke after it was handed out; drop it and retry once on a fresh one
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor = self._get_executor()
+            return executor, executor.submit(render_report, kind, data, tmp_path)
+
+    def _expire(self, key: str, future: Future, executor: ProcessPoolExecutor, job: Dict[str, Any]) -> None:
+        """Fail a job that missed its deadline; a hung render takes its worker pool down with it."""
+        if future.done():
+            return
+        running = not future.cancel()  # A job still waiting in the queue is just dropped
+        # Fail it before breaking the pool, so the pool's callback does not fail it again
+        self._fail(key, TimeoutError(f"Report not rendered in {self.job_timeout}s"), job)
+        if not running:
+            return
+        # The worker is stuck, replace the pool so later jobs are not queued behind it
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        for process in list((getattr(executor, '_processes', None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _fail(self, key: str, e: BaseException, job: Dict[str, Any]) -> Dict[str, Any]:
+        logging.error(f"Error rendering report {key}: {str(e)}")
+        with self._lock:
+            self.failed += 1
+            self._inflight.pop(key, None)
+        failed = dict(job, status=FAILED, error=str(e))
+        if self.get_cached(key) is None:  # Another process may have finished it meanwhile
+            try:
+                self._write_meta(key, failed)
+            except OSError as write_error:
+                logging.error(f"Error storing report job status {key}: {str(write_error)}")
+        return failed
+
+    def _finish(self, key: str, tmp_path: str, meta: Dict[str, Any], query_ms: float, future: Future) -> None:
+        """Move a rendered report into the cache (runs on the executor's callback thread)."""
+        try:
+            timings = dict(query_ms=query_ms, **future.result())
+            self._store(key, tmp_path, dict(meta, timings=timings))
+        except BaseException as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with self._lock:
+                expired = key not in self._inflight  # Already failed by its deadline
+            if not expired:
+                self._fail(key, e, dict(meta, job_id=key))
+            return
+
+        self._record(timings)
+        with self._lock:
+            self._inflight.pop(key, None)
+        self.evict()
+
+    def status(self, key: str, teacher_uuid: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the status of a job.
+
+        Args:
+            key (str): Job id (report key).
+            teacher_uuid (str): Requesting teacher; jobs of other teachers are not visible.
+
+        Returns:
+            Optional[Dict[str, Any]]: Job status, None if the job is unknown.
+        """
+        meta = self._read_meta(key)
+        if meta is None or meta.get("teacher_uuid") != teacher_uuid:
+            return None
+        if meta.get("status", DONE) == DONE:
+            return self.get_cached(key, teacher_uuid)
+        if self._is_expired(meta):
+            return dict(meta, status=FAILED, error="Rapor zamanında oluşturulamadı")
+        return meta
+
+    def evict(self) -> int:
+        """
+        Remove cached reports older than the max age, then the least recently used ones until
+        the cache fits in its size limit.
+
+        Returns:
+            int: Number of removed reports.
+        """
+        try:
+            entries = []
+            names = os.listdir(self.cache_dir)
+            pdfs = {name[:-4] for name in names if name.endswith('.pdf')}
+            for name in names:
+                if name.endswith('.json') and name[:-5] not in pdfs:
+                    # Sidecar of a failed or abandoned job
+                    path = os.path.join(self.cache_dir, name)
+                    try:
+                        if time.time() - os.stat(path).st_mtime > max(self.failed_ttl, self.job_timeout):
+                            os.remove(path)
+                    except OSError:
+                        pass
+                if not name.endswith('.pdf'):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        except OSError as e:
+            logging.error(f"Error scanning report cache: {str(e)}")
+            return 0
+
+        entries.sort()
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            if now - mtime <= self.max_age_seconds and total <= self.max_cache_bytes:
+                break
+            for file_path in (path, f"{path[:-4]}.json"):
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+
+        if removed:
+            with self._lock:
+                self.evicted += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the cache and job counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "pending": len(self._inflight),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "rendered": self.rendered,
+                "failed": self.failed,
+                "evicted": self.evicted,
+                "max_workers": self.max_workers,
+                "phases": {
+                    phase: {
+                        "avg_ms": round(total["total_ms"] / self.rendered, 2) if self.rendered else 0.0,
+                        "max_ms": total["max_ms"],
+                    }
+                    for phase, total in self._phases.items()
+                },
+            }
+
+
+report_jobs = ReportJobQueue()
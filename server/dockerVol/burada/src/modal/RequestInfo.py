@@ -1,8 +1,10 @@
 from flask import Request, g
 from sqlalchemy.sql import func, text
 from modal import db  # models/__init__.py' db obj 
+from datetime import datetime
+from modal.IdGenerator import generate_uuid
 
-from utils.UserAgentParserUtilities import parse 
+from utils.UserAgentParserUtilities import parse_columns
 
 class RequestInfo(db.Model):
     __tablename__ = 'ip_info'
@@ -35,7 +37,7 @@ class RequestInfo(db.Model):
     ua_device_model     = db.Column(db.String(255), nullable=True)      # Device model bilgisi
     ua_is_mobile        = db.Column(db.Boolean, default=False)          # Mobil cihaz mı?
     ua_is_bot           = db.Column(db.Boolean, default=False)          # Bot mu?
-    request_uuid        = db.Column(db.String(36), server_default=db.text("UUID()"), nullable=False)     # İsteğe özel bir UUID
+    request_uuid        = db.Column(db.String(36), default=generate_uuid, nullable=False)     # İsteğe özel bir UUID
     dust_uuid           = db.Column(db.String(36), nullable=True)             # İsteğe özel bir UUID
     dust_device_uuid    = db.Column(db.String(36), nullable=True)             # İsteğe özel bir UUID
     created_at          = db.Column(db.TIMESTAMP, server_default=db.func.current_timestamp())
@@ -95,14 +97,28 @@ class RequestInfo(db.Model):
             # 'host':              self.host
         }
 
+    @staticmethod
+    def get_client_ip(request: Request) -> str:
+        """Client IP behind our proxies; forwarded headers count only from TRUSTED_PROXIES and Cloudflare (see `utils.ProxyUtils.client_ip`)."""
+        from utils.ProxyUtils import client_ip
+        return client_ip(request.headers, request.remote_addr)
+
     @staticmethod
     def create_request_info(request: Request, dust: str, dust_device: str) -> 'RequestInfo':
         """Create a new RequestInfo object with the request data."""
+        return RequestInfo(**RequestInfo.create_request_info_row(request, dust, dust_device))
+
+    @staticmethod
+    def create_request_info_row(request: Request, dust: str, dust_device: str, parse_ua: bool = True) -> dict:
+        """Collect the request data as a plain column dict (used by the write-behind request log).
+
+        With `parse_ua=False` the `ua_*` columns are left out; the request log writer fills them
+        in (see `RequestLogBuffer`), keeping the parse off the request thread.
+        """
         user_agent = request.headers.get('User-Agent')
-        parsed_ua = parse(user_agent)
 
-        return RequestInfo(
-            remote_addr             =request.remote_addr,
+        row = dict(
+            remote_addr             =request.remote_addr or '',
             path                    =request.path,
             query_string            =request.args.to_dict(),
             referrer                =request.referrer,
@@ -117,18 +133,14 @@ class RequestInfo(db.Model):
             x_forwarded             =request.headers.get("X-Forwarded"),
             x_forwarded_host        =request.headers.get("X-Forwarded-Host"),
             x_forwarded_proto       =request.headers.get("X-Forwarded-Proto"),
-            host                    =request.headers.get("Host"),
-            user_agent              =user_agent,
-            ua_family               =parsed_ua.user_agent.family if parsed_ua.user_agent else None,
-            ua_version              =('.'.join(str(part) for part in [parsed_ua.user_agent.major, parsed_ua.user_agent.minor, parsed_ua.user_agent.patch, parsed_ua.user_agent.patch_minor] if part is not None) if parsed_ua.user_agent else None),
-            ua_os                   =parsed_ua.os.family if parsed_ua.os else None,
-            ua_os_version           =('.'.join(str(part) for part in [ parsed_ua.os.major, parsed_ua.os.minor, parsed_ua.os.patch, parsed_ua.os.patch_minor ] if part is not None) if parsed_ua.os else None ),
-            ua_device               =parsed_ua.device.family if parsed_ua.device else None,
-            ua_device_brand         =parsed_ua.device.brand if parsed_ua.device else None,
-            ua_device_model         =parsed_ua.device.model if parsed_ua.device else None,
-            ua_is_mobile            =parsed_ua.is_mobile ,
-            ua_is_bot               =parsed_ua.is_bot,
+            host                    =request.headers.get("Host") or '',
+            user_agent              =user_agent or '',  # NOT NULL sütunlar boş kalmasın
             dust_uuid               =dust,
-            dust_device_uuid        =dust_device 
+            dust_device_uuid        =dust_device,
+            request_uuid            =generate_uuid(),
+            created_at              =datetime.now()
         )
+        if parse_ua:
+            row.update(parse_columns(user_agent))
+        return row
 
@@ -0,0 +1,211 @@
+from flask import Flask
+from typing import Optional, Dict, Any, List
+from queue import Queue, Full, Empty
+from threading import Thread, Event, Lock
+import atexit
+import logging
+import time
+
+import os
+from dotenv import load_dotenv
+
+from modal import db
+from utils.UserAgentParserUtilities import parse_columns, stats as ua_stats
+
+load_dotenv()
+
+
+class RequestLogBuffer:
+    """Write-behind buffer for `ip_info` rows.
+
+    Request threads only put a plain dict on a bounded queue; a daemon worker drains it and
+    bulk-inserts the rows with a single executemany every `batch_size` rows or every
+    `flush_interval_ms` milliseconds, whichever comes first. When the queue is full the
+    request waits at most `put_timeout_ms` and then the row is dropped and counted, so a slow
+    database never adds latency to responses. With REQUEST_LOG_LAZY_UA (default) the user agent
+    is parsed by the worker as well.
+    """
+
+    def __init__(self, max_size: int = 10000, batch_size: int = 200, flush_interval_ms: int = 500, put_timeout_ms: int = 0):
+        self.max_size = int(os.getenv('REQUEST_LOG_QUEUE_SIZE', max_size))
+        self.batch_size = int(os.getenv('REQUEST_LOG_BATCH_SIZE', batch_size))
+        self.flush_interval = int(os.getenv('REQUEST_LOG_FLUSH_MS', flush_interval_ms)) / 1000
+        self.put_timeout = int(os.getenv('REQUEST_LOG_PUT_TIMEOUT_MS', put_timeout_ms)) / 1000
+        self.lazy_ua = os.getenv('REQUEST_LOG_LAZY_UA', 'true').lower() == 'true'
+
+        self._queue: Queue = Queue(maxsize=self.max_size)
+        self._stop = Event()
+        self._lock = Lock()
+        self._worker: Optional[Thread] = None
+        self._worker_pid: Optional[int] = None
+        self._app: Optional[Flask] = None
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+        atexit.register(self.stop)
+
+    def start(self, app: Flask) -> None:
+        """Start the worker thread for this process (restarted after a fork).
+
+        Args:
+            app (Flask): Application whose context the worker uses for database access.
+        """
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return
+            if self._worker_pid != os.getpid():
+                # Forked child: the parent's queue contents and thread are not ours.
+                self._queue = Queue(maxsize=self.max_size)
+            self._app = app
+            self._stop.clear()
+            self._worker = Thread(target=self._run, name="request-log-writer", daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def submit(self, row: Dict[str, Any], app: Flask) -> bool:
+        """Queue a row for insertion.
+
+        Args:
+            row (Dict[str, Any]): Column values for `ip_info`.
+            app (Flask): Current application, used to start the worker lazily.
+
+        Returns:
+            bool: True if the row was queued, False if it was dropped.
+        """
+        if self._worker_pid != os.getpid() or self._worker is None or not self._worker.is_alive():
+            self.start(app)
+
+        try:
+            if self.put_timeout > 0:
+                self._queue.put(row, timeout=self.put_timeout)
+            else:
+                self._queue.put_nowait(row)
+        except Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def _collect(self) -> List[Dict[str, Any]]:
+        """Block until a batch is full or the flush interval has elapsed."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        """Insert a batch with one executemany.
+
+        When a row violates a constraint the statement fails for the whole batch, so the batch is
+        retried row by row and only the bad rows are lost.
+        """
+        from modal.RequestInfo import RequestInfo
+        from sqlalchemy.exc import DataError, IntegrityError
+
+        if not batch:
+            return
+        for row in batch:
+            if 'ua_family' not in row:
+                row.update(parse_columns(row.get('user_agent')))
+        with self._app.app_context():
+            try:
+                db.session.execute(RequestInfo.__table__.insert(), batch)
+                db.session.commit()
+                with self._lock:
+                    self.written += len(batch)
+                    self.batches += 1
+                return
+            except (IntegrityError, DataError) as e:
+                db.session.rollback()
+                logging.warning(f"Request log batch ({len(batch)} rows) rejected, retrying row by row: {str(e.orig)}")
+            except Exception as e:
+                db.session.rollback()
+                with self._lock:
+                    self.failed += len(batch)
+                logging.error(f"Error writing request log batch ({len(batch)} rows): {str(e)}")
+                return
+
+            for row in batch:
+                try:
+                    db.session.execute(RequestInfo.__table__.insert(), row)
+                    db.session.commit()
+                    with self._lock:
+                        self.written += 1
+                except Exception as e:
+                    db.session.rollback()
+                    with self._lock:
+                        self.failed += 1
+                    logging.error(f"Error writing request log row ({row.get('path')}): {str(e)}")
+            with self._lock:
+                self.batches += 1
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._write(self._collect())
+
+        # Shutdown: flush whatever is left.
+        batch = self._drain()
+        while batch:
+            self._write(batch)
+            batch = self._drain()
+
+    def flush(self) -> None:
+        """Synchronously write every queued row from the calling thread."""
+        if self._app is None:
+            return
+        batch = self._drain()
+        while batch:
+            self._write(batch)
+            batch = self._drain()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the worker and flush the remaining rows (registered with atexit)."""
+        self._stop.set()
+        worker = self._worker
+        if worker is not None and worker.is_alive() and self._worker_pid == os.getpid():
+            worker.join(timeout=timeout)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the buffer counters."""
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "capacity": self.max_size,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches,
+                "ua_cache": ua_stats(),
+            }
+
+
+request_log_buffer = RequestLogBuffer()
@@ -0,0 +1,267 @@
+from modal import db, invalidate_teacher_lessons_cache
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import logging
+
+from sqlalchemy import insert
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Kart okuma durum kodları (tekil /burada ucu ile aynı)
+SESSION_OPENED = 100
+SCAN_RECORDED = 200
+SESSION_CLOSED = 0  # Cihazlar "000" olarak gösterir
+SCAN_REJECTED = 400
+
+MAX_SCANS = int(os.getenv('BURADA_BATCH_MAX_SCANS', 500))
+# Cihaz saati bu kadar ileride olabilir; daha ilerisi geçersiz zaman sayılır
+MAX_CLOCK_SKEW = timedelta(seconds=int(os.getenv('BURADA_BATCH_MAX_CLOCK_SKEW', 300)))
+
+
+def _result(status: int, message: str, **fields) -> Dict[str, Any]:
+    return dict(status=status, message=message, **fields)
+
+
+def parse_scan_time(scan: Dict[str, Any], received_at: datetime) -> datetime:
+    """
+    Time a buffered scan was read.
+
+    Args:
+        scan (Dict[str, Any]): `ts` as epoch seconds or ISO 8601 (local time), or `age_ms`, the
+            milliseconds between the read and the upload (for readers without a real time clock).
+        received_at (datetime): Time the batch arrived; scans without a time get it.
+
+    Raises:
+        ValueError: Unreadable time or a time in the future.
+
+    Returns:
+        datetime: Naive local time in whole seconds, like the other timestamps of the app.
+    """
+    if scan.get('ts') not in (None, ''):
+        value = scan['ts']
+        if isinstance(value, bool):
+            raise ValueError(value)
+        if isinstance(value, (int, float)):
+            scanned_at = datetime.fromtimestamp(value)
+        else:
+            scanned_at = datetime.fromisoformat(str(value))
+            if scanned_at.tzinfo is not None:
+                scanned_at = scanned_at.astimezone().replace(tzinfo=None)
+    elif scan.get('age_ms') not in (None, ''):
+        scanned_at = received_at - timedelta(milliseconds=max(0, int(scan['age_ms'])))
+    else:
+        scanned_at = received_at
+
+    if scanned_at > received_at + MAX_CLOCK_SKEW:
+        raise ValueError(scanned_at)
+    # DATETIME sütunları saniye hassasiyetinde; tekrar gönderilen okumalar birebir eşleşmeli
+    return scanned_at.replace(microsecond=0)
+
+
+def process_scan_batch(scans: List[Any], lesson_uuid: str = '') -> List[Dict[str, Any]]:
+    """
+    Apply a batch of card scans, e.g. the buffer of a reader that was offline, in one transaction.
+
+    Scans are applied in the order they were read with the same rules as a single `/burada` scan
+    (teacher opens / closes the session, students are recorded once per session). Identities are
+    resolved through the card index, active sessions, lesson permissions and already recorded
+    students are loaded with one query each, and the new attendance rows are written with a single
+    executemany INSERT.
+
+    Sending the same batch again (the reader lost the response) changes nothing: a teacher scan
+    whose time matches the `created_at` / `closed_at` of one of the teacher's sessions is taken as
+    already applied, so the students land in that session again and are deduped. This needs `ts`;
+    `age_ms` times move with the upload time. Scans older than the session they would apply to
+    are rejected instead of touching it.
+
+    Args:
+        scans (List[Any]): Scans with `id24`, `id25`, `id26` and optionally `lesson_uuid`, `ts` / `age_ms`.
+        lesson_uuid (str, optional): Lesson of the scans that do not name one.
+
+    Returns:
+        List[Dict[str, Any]]: A result with `status` (100/200/000/400) and `message` per scan, in input order.
+    """
+    from modal.Attenation import Attenation
+    from modal.AttenationDetail import AttenationDetail
+    from modal.Lesson import Lesson
+    from modal.LessonTeacher import LessonTeacher
+    from modal.CardIndex import card_index
+
+    received_at = datetime.now()
+    results: List[Optional[Dict[str, Any]]] = [None] * len(scans)
+
+    # region Parse
+    parsed: List[Tuple[int, datetime, str, str, str, str]] = []
+    for index, scan in enumerate(scans):
+        if not isinstance(scan, dict):
+            results[index] = _result(SCAN_REJECTED, 'Veri formatı geçersiz')
+            continue
+        try:
+            scanned_at = parse_scan_time(scan, received_at)
+        except (TypeError, ValueError, OverflowError, OSError):
+            results[index] = _result(SCAN_REJECTED, 'Okuma zamanı geçersiz')
+            continue
+        # Nokta karakterlerini kaldır
+        sector24 = str(scan.get('id24') or '').replace('.', '')
+        sector25 = str(scan.get('id25') or '').replace('.', '')
+        sector26 = str(scan.get('id26') or '').replace('.', '')
+        parsed.append((index, scanned_at, sector24, sector25, sector26, str(scan.get('lesson_uuid') or lesson_uuid or '')))
+    # Okunma sırasına göre uygula (aynı zamandakiler gönderim sırasında kalır)
+    parsed.sort(key=lambda item: (item[1], item[0]))
+    # endregion
+
+    new_details = []
+    changed_teachers = set()
+    try:
+        # region Bulk lookups
+        identities = card_index.resolve_many([(sector24, sector25, sector26) for _, _, sector24, sector25, sector26, _ in parsed])
+        lesson_uuids = {scan_lesson for *_, scan_lesson in parsed}
+        teacher_uuids = {identity.uuid for identity in identities if identity is not None and identity.is_teacher}
+        student_uuids = {identity.uuid for identity in identities if identity is not None and identity.is_student}
+
+        active_sessions: Dict[str, Any] = {}
+        if lesson_uuids:
+            for session in (
+                Attenation.query
+                .filter(Attenation.is_active == True, Attenation.lesson_uuid.in_(lesson_uuids))
+                .order_by(Attenation.id)
+            ):
+                active_sessions.setdefault(session.lesson_uuid, session)
+
+        allowed = set()
+        lesson_names = {}
+        if teacher_uuids and lesson_uuids - {''}:
+            allowed = set(
+                db.session.query(LessonTeacher.lesson_uuid, LessonTeacher.teacher_uuid)
+                .filter(LessonTeacher.lesson_uuid.in_(lesson_uuids), LessonTeacher.teacher_uuid.in_(teacher_uuids))
+            )
+            lesson_names = dict(db.session.query(Lesson.lesson_uuid, Lesson.name).filter(Lesson.lesson_uuid.in_(lesson_uuids)))
+
+        # Daha önce uygulanmış öğretmen okumaları: cihaz yanıtı alamayıp aynı paketi tekrar gönderebilir
+        teacher_times = {scanned_at for (_, scanned_at, *_), identity in zip(parsed, identities) if identity is not None and identity.is_teacher}
+        opened_at: Dict[Tuple[str, str, datetime], Any] = {}
+        closed_at: Dict[Tuple[str, str, datetime], Any] = {}
+        if teacher_times and lesson_uuids:
+            for session in (
+                Attenation.query
+                .filter(
+                    Attenation.lesson_uuid.in_(lesson_uuids),
+                    Attenation.teacher_uuid.in_(teacher_uuids),
+                    db.or_(Attenation.created_at.in_(teacher_times), Attenation.closed_at.in_(teacher_times))
+                )
+                .order_by(Attenation.id)
+            ):
+                opened_at.setdefault((session.lesson_uuid, session.teacher_uuid, session.created_at), session)
+                if session.closed_at is not None:
+                    closed_at.setdefault((session.lesson_uuid, session.teacher_uuid, session.closed_at), session)
+
+        recorded = set()
+        session_ids = {session.id for session in active_sessions.values()} | {session.id for session in opened_at.values()}
+        if student_uuids and session_ids:
+            recorded = set(
+                db.session.query(AttenationDetail.attenation_id, AttenationDetail.student_uuid)
+                .filter(
+                    AttenationDetail.attenation_id.in_(session_ids),
+                    AttenationDetail.student_uuid.in_(student_uuids)
+                )
+            )
+        # endregion
+
+        for (index, scanned_at, sector24, sector25, sector26, scan_lesson), identity in zip(parsed, identities):
+            active_session = active_sessions.get(scan_lesson)
+            if active_session is not None and not active_session.is_active and active_session.closed_at < scanned_at:
+                active_session = None  # Tekrar gönderilen pakette bilinen oturum bu okumadan önce kapanmış
+
+            if identity is None:
+                results[index] = _result(SCAN_REJECTED, 'Kullanıcı bulunamadı', data={'full_name': f"{sector24} {sector25}%".strip()})
+
+            elif identity.is_teacher:
+                teacher_name = f"{identity.name} {identity.surname}"
+                applied_open = opened_at.get((scan_lesson, identity.uuid, scanned_at))
+                applied_close = closed_at.get((scan_lesson, identity.uuid, scanned_at))
+
+                if applied_open is not None:
+                    # Bu okuma yoklamayı zaten açmış; sonraki okumalar aynı oturuma gider
+                    active_sessions[scan_lesson] = applied_open
+                    results[index] = _result(SESSION_OPENED, 'Yoklama açıldı', session_name=applied_open.session_name, teacher=teacher_name)
+
+                elif applied_close is not None:
+                    if active_sessions.get(scan_lesson) is applied_close:
+                        active_sessions[scan_lesson] = None
+                    results[index] = _result(SESSION_CLOSED, 'Yoklama kapatıldı', teacher=teacher_name, session_name=applied_close.session_name)
+
+                elif active_session is None:
+                    if scan_lesson:
+                        if (scan_lesson, identity.uuid) not in allowed:
+                            results[index] = _result(SCAN_REJECTED, 'Bu ders için yoklama açma yetkiniz yok')
+                            continue
+                        if scan_lesson not in lesson_names:
+                            results[index] = _result(SCAN_REJECTED, 'Belirtilen ders bulunamadı')
+                            continue
+                        session_name = f"{lesson_names[scan_lesson]} - {scanned_at.strftime('%d/%m/%Y %H:%M')}"
+                    else:
+                        session_name = f"Yoklama Oturumu - {scanned_at.strftime('%d/%m/%Y %H:%M')}"
+
+                    new_session = Attenation(
+                        lesson_uuid=scan_lesson or None,
+                        teacher_uuid=identity.uuid,
+                        is_active=True,
+                        session_name=session_name,
+                        created_at=scanned_at,
+                        closed_at=None
+                    )
+                    db.session.add(new_session)
+                    db.session.flush()  # Sonraki öğrenci kayıtları için id
+                    active_sessions[scan_lesson] = new_session
+                    changed_teachers.add((identity.uuid, scan_lesson))
+                    results[index] = _result(SESSION_OPENED, 'Yoklama açıldı', session_name=session_name, teacher=teacher_name)
+
+                elif active_session.teacher_uuid != identity.uuid:
+                    results[index] = _result(SCAN_REJECTED, 'Bu yoklamayı yalnızca açan öğretmen kapatabilir')
+
+                elif scanned_at < active_session.created_at:
+                    # Eski bir okuma, kendisinden sonra açılmış oturumu kapatamaz
+                    results[index] = _result(SCAN_REJECTED, 'Okuma yoklama açılmadan önce yapılmış', teacher=teacher_name)
+
+                else:
+                    active_session.is_active = False
+                    active_session.closed_at = scanned_at
+                    active_sessions[scan_lesson] = None
+                    changed_teachers.add((identity.uuid, scan_lesson))
+                    results[index] = _result(SESSION_CLOSED, 'Yoklama kapatıldı', teacher=teacher_name, session_name=active_session.session_name)
+
+            else:
+                student_name = f"{identity.name} {identity.surname}"
+                if active_session is None:
+                    results[index] = _result(SCAN_REJECTED, 'Aktif yoklama bulunmamaktadır', student=student_name)
+                elif scanned_at < active_session.created_at:
+                    results[index] = _result(SCAN_REJECTED, 'Okuma yoklama açılmadan önce yapılmış', student=student_name)
+                elif (active_session.id, identity.uuid) in recorded:
+                    results[index] = _result(SCAN_REJECTED, 'Bu öğrenci zaten yoklamada kayıtlı', student=student_name)
+                else:
+                    recorded.add((active_session.id, identity.uuid))
+                    new_details.append(dict(
+                        attenation_id=active_session.id,
+                        student_uuid=identity.uuid,
+                        card_id=sector26 if sector26 else "NOCARD",
+                        timestamp=scanned_at
+                    ))
+                    results[index] = _result(SCAN_RECORDED, 'Yoklama kaydedildi', student=student_name, session_name=active_session.session_name)
+
+        if new_details:
+            db.session.execute(insert(AttenationDetail), new_details)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Toplu yoklama işleminde hata: {str(e)}")
+        # Hiçbir okuma kaydedilmedi; cihaz geçerli okumaları tekrar gönderebilir
+        for index, *_ in parsed:
+            results[index] = _result(SCAN_REJECTED, 'İşlem sırasında hata oluştu')
+        return results
+
+    for teacher_uuid, changed_lesson in changed_teachers:
+        invalidate_teacher_lessons_cache(teacher_uuid, changed_lesson)
+    return results
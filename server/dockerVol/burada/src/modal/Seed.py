@@ -0,0 +1,182 @@
+from modal import db
+from typing import Dict, List, Tuple, Any
+from datetime import datetime
+import logging
+import time
+
+from sqlalchemy import insert, inspect, tuple_
+
+
+def _dt(value: str) -> datetime:
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+
+
+_PASSWORD_HASH = '002097684c6b1b20817abbb72a341294731adfbcd00d61d0afa232b9147ae2f6'
+_PASSWORD_SALT = '21f10f95514bea7a543ee41f9b01842e'
+
+# Geliştirme verisi: öğretmenler, öğrenciler, dersler ve yoklama oturumları
+USERS = [
+    dict(id=1, username='yagcimustafa', email='yagci@tahakara.dev', phone=None, isEmailVerified=False, isPhoneVerified=False,
+         lastLogin=_dt('2025-05-17 19:28:34'), uniqueID='36db24d9-3347-11f0-8318-1aebcda1d33f', updatedAt=_dt('2025-05-17 19:28:34'), createdAt=_dt('2025-05-17 17:49:00')),
+    dict(id=2, username='alikaya', email='ali.kaya@tahakara.dev', phone='5551234567', isEmailVerified=True, isPhoneVerified=True,
+         lastLogin=_dt('2025-05-18 10:15:22'), uniqueID='44db24d9-3347-11f0-8318-1aebcda1d34f', updatedAt=_dt('2025-05-18 10:15:22'), createdAt=_dt('2025-05-17 18:30:00')),
+    dict(id=3, username='aycademir', email='ayca.demir@tahakara.dev', phone='5551234568', isEmailVerified=True, isPhoneVerified=True,
+         lastLogin=_dt('2025-05-18 11:20:45'), uniqueID='45db24d9-3347-11f0-8318-1aebcda1d35f', updatedAt=_dt('2025-05-18 11:20:45'), createdAt=_dt('2025-05-17 19:00:00')),
+    dict(id=4, username='mehmetyilmaz', email='mehmet.yilmaz@tahakara.dev', phone='5551234569', isEmailVerified=True, isPhoneVerified=False,
+         lastLogin=_dt('2025-05-18 09:45:30'), uniqueID='46db24d9-3347-11f0-8318-1aebcda1d36f', updatedAt=_dt('2025-05-18 09:45:30'), createdAt=_dt('2025-05-17 20:15:00')),
+]
+for _user in USERS:
+    _user.update(passwordHash=_PASSWORD_HASH, passwordSalt=_PASSWORD_SALT, isActive=True, isDeleted=False)
+
+STUDENTS = [
+    dict(name='Ahmet', surname='Yılmaz', student_uuid='a1db24d9-3347-11f0-8318-1aebcda10001'),
+    dict(name='Ayşe', surname='Demir', student_uuid='a2db24d9-3347-11f0-8318-1aebcda10002'),
+    dict(name='Mehmet', surname='Kara', student_uuid='a3db24d9-3347-11f0-8318-1aebcda10003'),
+    dict(name='Zeynep', surname='Çelik', student_uuid='a4db24d9-3347-11f0-8318-1aebcda10004'),
+    dict(name='Ali', surname='Öztürk', student_uuid='a5db24d9-3347-11f0-8318-1aebcda10005'),
+    dict(name='Fatma', surname='Şahin', student_uuid='a6db24d9-3347-11f0-8318-1aebcda10006'),
+    dict(name='Can', surname='Aydın', student_uuid='a7db24d9-3347-11f0-8318-1aebcda10007'),
+    dict(name='Ece', surname='Yıldız', student_uuid='a8db24d9-3347-11f0-8318-1aebcda10008'),
+    dict(name='Burak', surname='Aksoy', student_uuid='a9db24d9-3347-11f0-8318-1aebcda10009'),
+    dict(name='Deniz', surname='Koç', student_uuid='a0db24d9-3347-11f0-8318-1aebcda10010'),
+]
+
+LESSONS = [
+    dict(name="Yazılım Mühendisliği", lesson_uuid="48db24d9-3347-11f0-8318-1aebcda1d44f"),
+    dict(name="Veritabanı Sistemleri", lesson_uuid="49db24d9-3347-11f0-8318-1aebcda1d45f"),
+    dict(name="Yapay Zeka", lesson_uuid="50db24d9-3347-11f0-8318-1aebcda1d46f"),
+    dict(name="Web Programlama", lesson_uuid="51db24d9-3347-11f0-8318-1aebcda1d47f"),
+    dict(name="Mobil Uygulama Geliştirme", lesson_uuid="52db24d9-3347-11f0-8318-1aebcda1d48f"),
+    dict(name="Siber Güvenlik", lesson_uuid="53db24d9-3347-11f0-8318-1aebcda1d49f"),
+]
+
+LESSON_TEACHERS = [
+    dict(lesson_uuid="48db24d9-3347-11f0-8318-1aebcda1d44f", teacher_uuid="36db24d9-3347-11f0-8318-1aebcda1d33f"),  # Yazılım Müh - yagcimustafa
+    dict(lesson_uuid="49db24d9-3347-11f0-8318-1aebcda1d45f", teacher_uuid="44db24d9-3347-11f0-8318-1aebcda1d34f"),  # Veritabanı - alikaya
+    dict(lesson_uuid="50db24d9-3347-11f0-8318-1aebcda1d46f", teacher_uuid="45db24d9-3347-11f0-8318-1aebcda1d35f"),  # Yapay Zeka - aycademir
+    dict(lesson_uuid="51db24d9-3347-11f0-8318-1aebcda1d47f", teacher_uuid="46db24d9-3347-11f0-8318-1aebcda1d36f"),  # Web Prog - mehmetyilmaz
+    dict(lesson_uuid="52db24d9-3347-11f0-8318-1aebcda1d48f", teacher_uuid="36db24d9-3347-11f0-8318-1aebcda1d33f"),  # Mobil - yagcimustafa
+    dict(lesson_uuid="53db24d9-3347-11f0-8318-1aebcda1d49f", teacher_uuid="44db24d9-3347-11f0-8318-1aebcda1d34f"),  # Siber - alikaya
+]
+
+ATTENATIONS = [
+    dict(id=1, lesson_uuid='48db24d9-3347-11f0-8318-1aebcda1d44f', teacher_uuid='36db24d9-3347-11f0-8318-1aebcda1d33f', is_active=False,
+         session_name='Yazılım Mühendisliği - 15 Mayıs Oturumu', created_at=_dt('2025-05-15 09:00:00'), closed_at=_dt('2025-05-15 11:30:00')),
+    dict(id=2, lesson_uuid='49db24d9-3347-11f0-8318-1aebcda1d45f', teacher_uuid='44db24d9-3347-11f0-8318-1aebcda1d34f', is_active=False,
+         session_name='Veritabanı Sistemleri - 16 Mayıs Oturumu', created_at=_dt('2025-05-16 13:00:00'), closed_at=_dt('2025-05-16 15:30:00')),
+    dict(id=3, lesson_uuid='50db24d9-3347-11f0-8318-1aebcda1d46f', teacher_uuid='45db24d9-3347-11f0-8318-1aebcda1d35f', is_active=True,
+         session_name='Yapay Zeka - 17 Mayıs Oturumu', created_at=_dt('2025-05-17 10:00:00'), closed_at=_dt('2025-05-17 12:30:00')),
+    dict(id=4, lesson_uuid='51db24d9-3347-11f0-8318-1aebcda1d47f', teacher_uuid='46db24d9-3347-11f0-8318-1aebcda1d36f', is_active=True,
+         session_name='Web Programlama - 18 Mayıs Oturumu', created_at=_dt('2025-05-18 14:00:00'), closed_at=None),
+    dict(id=5, lesson_uuid='52db24d9-3347-11f0-8318-1aebcda1d48f', teacher_uuid='36db24d9-3347-11f0-8318-1aebcda1d33f', is_active=True,
+         session_name='Mobil Uygulama Geliştirme - 18 Mayıs Oturumu', created_at=_dt('2025-05-18 16:00:00'), closed_at=None),
+]
+
+ATTENATION_DETAILS = [
+    dict(attenation_id=1, student_uuid='a1db24d9-3347-11f0-8318-1aebcda10001', card_id='CARD001', timestamp=_dt('2025-05-15 09:05:23')),
+    dict(attenation_id=1, student_uuid='a2db24d9-3347-11f0-8318-1aebcda10002', card_id='CARD002', timestamp=_dt('2025-05-15 09:06:45')),
+    dict(attenation_id=1, student_uuid='a3db24d9-3347-11f0-8318-1aebcda10003', card_id='CARD003', timestamp=_dt('2025-05-15 09:08:12')),
+    dict(attenation_id=1, student_uuid='a4db24d9-3347-11f0-8318-1aebcda10004', card_id='CARD004', timestamp=_dt('2025-05-15 09:10:05')),
+    dict(attenation_id=1, student_uuid='a5db24d9-3347-11f0-8318-1aebcda10005', card_id='CARD005', timestamp=_dt('2025-05-15 09:12:33')),
+
+    dict(attenation_id=2, student_uuid='a2db24d9-3347-11f0-8318-1aebcda10002', card_id='CARD002', timestamp=_dt('2025-05-16 13:04:18')),
+    dict(attenation_id=2, student_uuid='a3db24d9-3347-11f0-8318-1aebcda10003', card_id='CARD003', timestamp=_dt('2025-05-16 13:05:37')),
+    dict(attenation_id=2, student_uuid='a6db24d9-3347-11f0-8318-1aebcda10006', card_id='CARD006', timestamp=_dt('2025-05-16 13:07:22')),
+    dict(attenation_id=2, student_uuid='a7db24d9-3347-11f0-8318-1aebcda10007', card_id='CARD007', timestamp=_dt('2025-05-16 13:10:45')),
+    dict(attenation_id=2, student_uuid='a8db24d9-3347-11f0-8318-1aebcda10008', card_id='CARD008', timestamp=_dt('2025-05-16 13:12:19')),
+]
+
+
+def _models() -> list:
+    """Seed groups in foreign key order: (model, rows, natural key columns)."""
+    from modal.User import User
+    from modal.Student import Student
+    from modal.Lesson import Lesson
+    from modal.LessonTeacher import LessonTeacher
+    from modal.Attenation import Attenation
+    from modal.AttenationDetail import AttenationDetail
+
+    return [
+        (User, USERS, ('uniqueID',)),
+        (Student, STUDENTS, ('student_uuid',)),
+        (Lesson, LESSONS, ('lesson_uuid',)),
+        (LessonTeacher, LESSON_TEACHERS, ('lesson_uuid', 'teacher_uuid')),
+        (Attenation, ATTENATIONS, ('id',)),
+        (AttenationDetail, ATTENATION_DETAILS, ('attenation_id', 'student_uuid')),
+    ]
+
+
+def _missing_rows(model, rows: List[Dict[str, Any]], key_columns: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """Rows whose natural key is not in the table yet, found with one query per group."""
+    columns = [getattr(model, name) for name in key_columns]
+    keys = [tuple(row[name] for name in key_columns) for row in rows]
+    if len(columns) == 1:
+        condition = columns[0].in_([key[0] for key in keys])
+    else:
+        condition = tuple_(*columns).in_(keys)
+    existing = {tuple(found) for found in db.session.query(*columns).filter(condition)}
+    return [row for row, key in zip(rows, keys) if key not in existing]
+
+
+def init_db(drop: bool = False) -> Dict[str, Any]:
+    """
+    Create the missing tables (`create_all` skips existing ones) and build the availability filter.
+
+    Args:
+        drop (bool): Drop every table first. Destroys all data.
+
+    Returns:
+        Dict[str, Any]: tables, dropped and seconds.
+    """
+    import modal  # noqa: F401  Registers every model on the metadata
+    from modal.AvailabilityFilter import availability_filter
+
+    started = time.perf_counter()
+    if drop:
+        db.drop_all()
+    db.create_all()
+    availability_filter.build()
+    tables = sorted(inspect(db.engine).get_table_names())
+    logging.info(f"Database initialized in {time.perf_counter() - started:.2f}s ({len(tables)} tables, dropped={drop})")
+    return {"tables": tables, "dropped": drop, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def seed(bulk: bool = False) -> Dict[str, Dict[str, int]]:
+    """
+    Insert the development data that is not in the database yet, in one transaction.
+    Running it again inserts nothing.
+
+    Args:
+        bulk (bool): Insert each group with a single executemany INSERT instead of ORM objects
+            (no per-object identity map bookkeeping; column defaults still apply).
+
+    Returns:
+        Dict[str, Dict[str, int]]: table -> inserted and skipped row counts.
+    """
+    from modal.AvailabilityFilter import availability_filter
+    from modal.CardIndex import card_index
+
+    report = {}
+    inserted_users = []
+    try:
+        for model, rows, key_columns in _models():
+            missing = _missing_rows(model, rows, key_columns)
+            if missing:
+                if bulk:
+                    db.session.execute(insert(model), missing)
+                else:
+                    db.session.add_all([model(**row) for row in missing])
+                # Later groups reference these rows
+                db.session.flush()
+            report[model.__tablename__] = {"inserted": len(missing), "skipped": len(rows) - len(missing)}
+            if model.__tablename__ == 'users':
+                inserted_users = missing
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    for user in inserted_users:
+        availability_filter.add(user['username'], user['email'], user['phone'])
+    card_index.invalidate()
+    return report
@@ -4,6 +4,8 @@ from sqlalchemy.exc import SQLAlchemyError
 import logging
 
 from modal.messages.Messages import StudentModelMessages as SMM
+from modal.CardIndex import card_index
+from modal.IdGenerator import generate_uuid
 
 class Student(db.Model):
     __tablename__ = 'students'
@@ -18,7 +20,7 @@ class Student(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(255), nullable=False)
     surname = db.Column(db.String(255), nullable=False)
-    student_uuid = db.Column(db.String(36), unique=True, default=db.func.uuid())
+    student_uuid = db.Column(db.String(36), unique=True, default=generate_uuid)
     created_at = db.Column(db.DateTime, server_default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, server_default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
     
@@ -40,11 +42,12 @@ class Student(db.Model):
             student = Student(
                 name=name,
                 surname=surname,
-                student_uuid=db.func.uuid()
+                student_uuid=generate_uuid()
             )
             
             db.session.add(student)
             db.session.commit()
+            card_index.invalidate()
             
             return (True, SMM.STUDENT_CREATED_SUCCESSFULLY, student)
             
@@ -91,6 +94,7 @@ class Student(db.Model):
         
         try:
             db.session.commit()
+            card_index.invalidate()
             return (True, SMM.STUDENT_UPDATED_SUCCESSFULLY, self)
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -106,6 +110,7 @@ class Student(db.Model):
         try:
             db.session.delete(self)
             db.session.commit()
+            card_index.invalidate()
             return (True, SMM.STUDENT_DELETED_SUCCESSFULLY)
         except SQLAlchemyError as e:
             db.session.rollback()
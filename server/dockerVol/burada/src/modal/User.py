@@ -6,6 +6,9 @@ import logging
 
 from modal.messages.Messages import UserModelMessages as UMM
 from utils.PasswordUtils import PasswordUtils
+from modal.CardIndex import card_index
+from modal.AvailabilityFilter import availability_filter
+from modal.IdGenerator import generate_uuid
 
 
 class User(db.Model):
@@ -35,7 +38,7 @@ class User(db.Model):
     isEmailVerified = db.Column(db.Boolean, default=False)
     isPhoneVerified = db.Column(db.Boolean, default=False)
     lastLogin = db.Column(db.DateTime, nullable=True)
-    uniqueID = db.Column(db.String(36), unique=True, nullable=False, default=db.func.uuid())
+    uniqueID = db.Column(db.String(36), unique=True, nullable=False, default=generate_uuid)
     updatedAt = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
     createdAt = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
     
@@ -72,7 +75,7 @@ class User(db.Model):
                     isEmailVerified=False,
                     isPhoneVerified=False,
                     lastLogin=None,
-                    uniqueID=db.func.uuid(),
+                    uniqueID=generate_uuid(),
                     updatedAt=db.func.current_timestamp(),
                     createdAt=db.func.current_timestamp()
                 )
@@ -85,6 +88,8 @@ class User(db.Model):
             logging.error(UMM.ERROR_CREATING_USER + " " + str(e))
             return (False, UMM.ERROR_CREATING_USER, None)
         
+        availability_filter.add(username=user.username, email=user.email, phone=user.phone)
+
         return (True, UMM.USER_CREATED_SUCCESSFULLY, user)
     
     def update(self, userId: int, username: str = None, email: str = None, phone: str = None, passwordHash: str = None, passwordSalt: str = None) -> Tuple[bool, str, Optional[Self: object]]:
@@ -235,6 +240,9 @@ class User(db.Model):
             logging.error(UMM.ERROR_UPDATING_USERNAME + " " + e)
             return (False, UMM.ERROR_UPDATING_USERNAME)
 
+        card_index.invalidate()
+        availability_filter.add(username=newUsername)
+
         return (True, UMM.USERNAME_CHANGED_SUCCESSFULLY, user)
         
     def verify_email(self, userId: int) -> Tuple[bool, str, Optional[Self: object]]:
@@ -291,6 +299,8 @@ class User(db.Model):
             logging.error(UMM.ERROR_CHANGING_EMAIL + " " + e)
             return (False, UMM.ERROR_CHANGING_EMAIL)
 
+        availability_filter.add(email=newEmail)
+
         return (True, UMM.EMAIL_CHANGED_SUCCESSFULLY, user)
     
     def verify_phone(self, userId: int) -> Tuple[bool, str, Optional[Self: object]]:
@@ -347,6 +357,8 @@ class User(db.Model):
             db.session.rollback()
             logging.error(UMM.ERROR_CHANGING_PHONE + " " + e)
             return (False, UMM.ERROR_CHANGING_PHONE)
+
+        availability_filter.add(phone=newPhone)
         
         return (True, UMM.PHONE_CHANGED_SUCCESSFULLY, user)
     
@@ -436,6 +448,10 @@ class User(db.Model):
         if not PasswordUtils.validate_password(password, user.passwordHash, user.passwordSalt):
             return (False, UMM.INVALID_USERNAME_OR_PASSWORD)
 
+        # Upgrade legacy or cheaper hashes while the plain password is at hand
+        if PasswordUtils.needs_rehash(user.passwordHash):
+            user.passwordHash, user.passwordSalt = PasswordUtils.password_hash(password)
+
         # Update last login time
         user.lastLogin = db.func.current_timestamp()
 
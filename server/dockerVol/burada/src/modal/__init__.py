@@ -1,13 +1,18 @@
-from flask import Request
+from flask import Request, current_app
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeMeta
-from sqlalchemy import text
+from sqlalchemy import text, func, case
 from typing import Type, Any
 from logging import error
 from datetime import datetime
-import uuid
+import os
 
-db = SQLAlchemy()
+from modal.ReplicaRouting import RoutingSession
+
+# Okuma yapan uçlar replikaya yönlendirilebilir (bkz. modal.ReplicaRouting.use_replica)
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+from modal.IdGenerator import generate_uuid, set_id_generator
 
 from modal.RequestInfo import RequestInfo
 from modal.User import User
@@ -16,6 +21,8 @@ from modal.LessonTeacher import LessonTeacher
 from modal.Student import Student
 from modal.Attenation import Attenation
 from modal.AttenationDetail import AttenationDetail
+from modal.RequestLogBuffer import request_log_buffer
+from utils.CacheUtils import TTLCache
 
 
 def add_and_commit(db=db, obj: SQLAlchemy = None) -> None:
@@ -26,71 +33,149 @@ def add_and_commit(db=db, obj: SQLAlchemy = None) -> None:
     db.session.commit()
 
 def save_request_info(db=db, request: Request = None, dust: str=None, dust_device: str=None) -> None:
-    """Save request information to the database."""
+    """Queue request information for the write-behind request log (no commit in the request)."""
     if request is None:
         return None
-    request_info = RequestInfo.create_request_info(request, dust, dust_device)
-    add_and_commit(db, request_info)
+    request_info_row = RequestInfo.create_request_info_row(request, dust, dust_device, parse_ua=not request_log_buffer.lazy_ua)
+    request_log_buffer.submit(request_info_row, current_app._get_current_object())
 
 def select_uuid(db=db) -> str:
-    """Select a UUID from the database."""
+    """Select a UUID from the database. Prefer `generate_uuid`, which needs no connection."""
     result = db.session.execute(text("SELECT UUID()")).fetchone()
     return result[0]
 
+# Entries are (version, lessons); the version lives in Redis so every worker sees an invalidation
+_teacher_lessons_cache = TTLCache(
+    ttl_seconds=float(os.getenv('TEACHER_LESSONS_CACHE_TTL', 10)),
+    max_size=int(os.getenv('TEACHER_LESSONS_CACHE_SIZE', 1024))
+)
+_TEACHER_LESSONS_VERSION_KEY = "teacher_lessons:version:{}"
+_teacher_lessons_redis = None
+
+def _teacher_lessons_client():
+    global _teacher_lessons_redis
+    if _teacher_lessons_redis is None:
+        from utils.redis.RedisUtils import AuthRedisClientUtils
+        _teacher_lessons_redis = AuthRedisClientUtils()
+    return _teacher_lessons_redis.client
+
+def _teacher_lessons_version(teacher_uuid):
+    """Current lesson summary version of a teacher, None if Redis cannot be reached."""
+    try:
+        return int(_teacher_lessons_client().get(_TEACHER_LESSONS_VERSION_KEY.format(teacher_uuid)) or 0)
+    except Exception as e:
+        error(f"Teacher lessons cache version could not be read: {str(e)}")
+        return None
+
+def invalidate_teacher_lessons_cache(teacher_uuid, lesson_uuid=None) -> None:
+    """Drop the cached lesson summary of a teacher in every worker and read their data from the
+    primary until the replicas have the change (read-your-writes).
+
+    The summary counts the sessions of every teacher of a lesson, so with `lesson_uuid` all the
+    teachers linked to that lesson are invalidated, not only the one who made the change.
+    """
+    from modal.ReplicaRouting import replica_router
+
+    teacher_uuids = {teacher_uuid}
+    if lesson_uuid:
+        try:
+            teacher_uuids.update(
+                uuid for (uuid,) in db.session.query(LessonTeacher.teacher_uuid).filter(LessonTeacher.lesson_uuid == lesson_uuid)
+            )
+        except Exception as e:
+            error(f"Teachers of lesson {lesson_uuid} could not be read: {str(e)}")
+
+    for uuid in teacher_uuids:
+        _teacher_lessons_cache.delete(uuid)
+    try:
+        pipe = _teacher_lessons_client().pipeline()
+        for uuid in teacher_uuids:
+            key = _TEACHER_LESSONS_VERSION_KEY.format(uuid)
+            pipe.incr(key)
+            pipe.expire(key, 86400)
+        pipe.execute()
+    except Exception as e:
+        error(f"Teacher lessons cache could not be invalidated: {str(e)}")
+    for uuid in teacher_uuids:
+        replica_router.pin_primary(uuid)
+
 def get_teacher_lessons(teacher_uuid, db=db) -> list:
-    """Get all lessons assigned to a teacher using SQLAlchemy ORM"""
+    """Get all lessons assigned to a teacher with their session summary in a single grouped query"""
+    # Without Redis other workers' invalidations are unknown, so the cache is skipped
+    version = _teacher_lessons_version(teacher_uuid) if _teacher_lessons_cache.enabled else None
+    if version is not None:
+        cached = _teacher_lessons_cache.get(teacher_uuid)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
     try:
-        # Query lessons for the teacher
-        lessons = (
-            db.session.query(Lesson)
+        is_active = case((Attenation.is_active == True, 1), else_=0)
+        rows = (
+            db.session.query(
+                Lesson.lesson_uuid,
+                Lesson.name,
+                func.count(Attenation.id).label("total_sessions"),
+                func.coalesce(func.sum(is_active), 0).label("active_sessions"),
+                func.max(case((Attenation.is_active == True, Attenation.id), else_=None)).label("active_session_id"),
+                func.max(Attenation.created_at).label("last_session"),
+            )
             .join(LessonTeacher, Lesson.lesson_uuid == LessonTeacher.lesson_uuid)
+            .outerjoin(Attenation, Attenation.lesson_uuid == Lesson.lesson_uuid)
             .filter(LessonTeacher.teacher_uuid == teacher_uuid)
+            .group_by(Lesson.id, Lesson.lesson_uuid, Lesson.name)
             .order_by(Lesson.name)
             .all()
         )
 
         result = []
-        for lesson in lessons:
-            # Active sessions
-            active_sessions = (
-                db.session.query(Attenation)
-                .filter(Attenation.lesson_uuid == lesson.lesson_uuid, Attenation.is_active == True)
-                .all()
-            )
-            active_session_uuid = active_sessions[0].lesson_uuid if active_sessions else None
-
-            # Last session date
-            last_session = (
-                db.session.query(Attenation)
-                .filter(Attenation.lesson_uuid == lesson.lesson_uuid)
-                .order_by(Attenation.created_at.desc())
-                .first()
-            )
-            last_session_str = last_session.created_at.strftime('%d.%m.%Y %H:%M') if last_session else None
-
-            # Total sessions
-            total_sessions = (
-                db.session.query(Attenation)
-                .filter(Attenation.lesson_uuid == lesson.lesson_uuid)
-                .count()
-            )
-            print(active_sessions)
+        for row in rows:
+            active_sessions = int(row.active_sessions or 0)
             result.append({
-                "lesson_uuid": lesson.lesson_uuid,
-                "lesson_name": lesson.name,
-                "active_session_id": active_sessions[0].id if active_sessions else None,
-                "active_sessions": len(active_sessions),
-                "active_session_uuid": active_session_uuid,
-                "last_session": last_session_str,
-                "total_sessions": total_sessions
+                "lesson_uuid": row.lesson_uuid,
+                "lesson_name": row.name,
+                "active_session_id": row.active_session_id if active_sessions else None,
+                "active_sessions": active_sessions,
+                "active_session_uuid": row.lesson_uuid if active_sessions else None,
+                "last_session": row.last_session.strftime('%d.%m.%Y %H:%M') if row.last_session else None,
+                "total_sessions": row.total_sessions
             })
+
+        if version is not None:
+            _teacher_lessons_cache.set(teacher_uuid, (version, result))
         return result
     except Exception as e:
         error(f"Error fetching teacher lessons: {str(e)}")
         return []
 
-def get_lesson_detail(lesson_uuid, teacher_uuid, db=db):
-    """Get lesson details for a specific lesson"""
+def get_session_student_counts(session_ids, db=db) -> dict:
+    """Get the number of attended students for each session with a single GROUP BY query"""
+    if not session_ids:
+        return {}
+    rows = (
+        db.session.query(AttenationDetail.attenation_id, func.count(AttenationDetail.id))
+        .filter(AttenationDetail.attenation_id.in_(session_ids))
+        .group_by(AttenationDetail.attenation_id)
+        .all()
+    )
+    return {attenation_id: count for attenation_id, count in rows}
+
+def _session_to_dict(session, student_count) -> dict:
+    return {
+        "id": session.id,
+        "session_name": session.session_name,
+        "status": session.is_active,
+        "created_at": session.created_at.strftime('%d.%m.%Y %H:%M'),
+        "closed_at": session.closed_at.strftime('%d.%m.%Y %H:%M') if session.closed_at else None,
+        "student_count": student_count,
+    }
+
+def get_lesson_detail(lesson_uuid, teacher_uuid, since_id=None, before_id=None, limit=None, db=db):
+    """Get lesson details for a specific lesson
+
+    Without paging arguments every session is returned. `since_id` returns only sessions newer
+    than the given id (incremental polling), `before_id` + `limit` page through older ones.
+    The active session is always returned in `active_session`.
+    """
     try:
         # Check if lesson exists and belongs to this teacher
         lesson = (
@@ -107,32 +192,45 @@ def get_lesson_detail(lesson_uuid, teacher_uuid, db=db):
             }
         
         # Get attendance sessions for the lesson
-        sessions = (
+        sessions_query = (
             db.session.query(Attenation)
             .filter(Attenation.lesson_uuid == lesson_uuid)
-            .order_by(Attenation.id.desc())
-            .all()
         )
-        active_session = False
-        session_list = []
-        for session in sessions:
-            if session.is_active:
-                active_session = {
-                    "id": session.id,
-                    "session_name": session.session_name,
-                    "status": session.is_active,
-                    "created_at": session.created_at.strftime('%d.%m.%Y %H:%M'),
-                    "closed_at": session.closed_at.strftime('%d.%m.%Y %H:%M') if session.closed_at else None,
-                    "student_count": db.session.query(AttenationDetail).filter(AttenationDetail.attenation_id == session.id).count(),
-                }
-            session_list.append({
-                "id": session.id,
-                "session_name": session.session_name,
-                "status": session.is_active,
-                "created_at": session.created_at.strftime('%d.%m.%Y %H:%M'),
-                "closed_at": session.closed_at.strftime('%d.%m.%Y %H:%M') if session.closed_at else None,
-                "student_count": db.session.query(AttenationDetail).filter(AttenationDetail.attenation_id == session.id).count(),
-            })
+        is_paged = since_id is not None or before_id is not None or limit is not None
+        if since_id is not None:
+            sessions_query = sessions_query.filter(Attenation.id > since_id)
+        if before_id is not None:
+            sessions_query = sessions_query.filter(Attenation.id < before_id)
+        sessions_query = sessions_query.order_by(Attenation.id.desc())
+        if limit is not None:
+            sessions_query = sessions_query.limit(limit)
+        sessions = sessions_query.all()
+
+        active = next((session for session in sessions if session.is_active), None)
+        if active is None and is_paged:
+            active = (
+                db.session.query(Attenation)
+                .filter(Attenation.lesson_uuid == lesson_uuid, Attenation.is_active == True)
+                .order_by(Attenation.id.desc())
+                .first()
+            )
+
+        session_ids = [session.id for session in sessions]
+        if active is not None and active.id not in session_ids:
+            session_ids.append(active.id)
+        student_counts = get_session_student_counts(session_ids, db)
+
+        session_list = [_session_to_dict(session, student_counts.get(session.id, 0)) for session in sessions]
+        active_session = _session_to_dict(active, student_counts.get(active.id, 0)) if active is not None else False
+
+        if is_paged:
+            total_sessions = (
+                db.session.query(func.count(Attenation.id))
+                .filter(Attenation.lesson_uuid == lesson_uuid)
+                .scalar()
+            )
+        else:
+            total_sessions = len(sessions)
         
         return {
             "success": True,
@@ -141,8 +239,9 @@ def get_lesson_detail(lesson_uuid, teacher_uuid, db=db):
                 "lesson_name": lesson.name,
                 "sessions": session_list,
                 "active_session": active_session ,
-                "total_sessions": len(sessions),
-                "total_students": None
+                "total_sessions": total_sessions,
+                "total_students": None,
+                "latest_session_id": max([since_id or 0] + [session.id for session in sessions]) if is_paged else (sessions[0].id if sessions else None)
             }
         }
     except Exception as e:
@@ -184,7 +283,7 @@ def create_attendance_session(lesson_uuid, teacher_uuid, session_name="", db=db)
         
         # Create new attendance session
         now = datetime.now()
-        session_uuid = str(uuid.uuid4())
+        session_uuid = generate_uuid()
         
         new_session = Attenation(
             teacher_uuid=teacher_uuid,
@@ -195,6 +294,7 @@ def create_attendance_session(lesson_uuid, teacher_uuid, session_name="", db=db)
         
         db.session.add(new_session)
         db.session.commit()
+        invalidate_teacher_lessons_cache(teacher_uuid, lesson_uuid)
         
         return {
             "success": True,
@@ -240,6 +340,7 @@ def close_attendance_session(attendance_uuid, teacher_uuid, db=db):
         session.closed_by = teacher_uuid
         
         db.session.commit()
+        invalidate_teacher_lessons_cache(teacher_uuid, session.lesson_uuid)
         
         return {
             "success": True,
@@ -308,197 +409,162 @@ def get_attendance_students_list(attendance_id, teacher_uuid, db=db):
             "message": f"Yoklama katılımcıları yüklenirken bir hata oluştu: {str(e)}"
         }
     
-def generate_lesson_single_attendance_report(lesson_uuid, teacher_uuid, attendance_id, db=db):
-    """Generate a PDF report for a single attendance session"""
-    try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.lib import colors
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
-        import os
-        from flask import current_app
-        
-        # Önce yoklama oturumunun bu derse ve öğretmene ait olduğunu kontrol et
-        attendance = (
-            db.session.query(Attenation)
-            .join(Lesson, Attenation.lesson_uuid == Lesson.lesson_uuid)
-            .join(LessonTeacher, Lesson.lesson_uuid == LessonTeacher.lesson_uuid)
-            .filter(
-                Attenation.id == attendance_id,
-                Lesson.lesson_uuid == lesson_uuid,
-                LessonTeacher.teacher_uuid == teacher_uuid
-            )
-            .first()
-        )
-        
-        if not attendance:
-            return {
-                "success": False,
-                "message": "Yoklama oturumu bulunamadi veya erisim izniniz yok."
-            }
-        
-        # Ders bilgilerini al
-        lesson = (
-            db.session.query(Lesson)
-            .filter(Lesson.lesson_uuid == lesson_uuid)
-            .first()
+def _prepare_session_report(lesson_uuid, teacher_uuid, attendance_id, db=db):
+    """Check access to a session and build its report key, metadata and data loader"""
+    from modal.ReportJobs import report_jobs
+    from utils.ReportUtils import safe_filename
+
+    # Önce yoklama oturumunun bu derse ve öğretmene ait olduğunu kontrol et
+    row = (
+        db.session.query(Attenation, Lesson)
+        .join(Lesson, Attenation.lesson_uuid == Lesson.lesson_uuid)
+        .join(LessonTeacher, Lesson.lesson_uuid == LessonTeacher.lesson_uuid)
+        .filter(
+            Attenation.id == attendance_id,
+            Lesson.lesson_uuid == lesson_uuid,
+            LessonTeacher.teacher_uuid == teacher_uuid
         )
-        
+        .first()
+    )
+    if not row:
+        return None
+    attendance, lesson = row
+
+    # Oturum ya da katılımcılar değiştiğinde rapor anahtarı da değişir
+    detail_count, last_detail_id = (
+        db.session.query(func.count(AttenationDetail.id), func.max(AttenationDetail.id))
+        .filter(AttenationDetail.attenation_id == attendance_id)
+        .one()
+    )
+    fingerprint = [
+        lesson.name, attendance.session_name, attendance.is_active,
+        attendance.updated_at, attendance.closed_at, detail_count, last_detail_id
+    ]
+    key = report_jobs.cache_key("session", attendance_id, teacher_uuid, fingerprint)
+
+    attendance_name = attendance.session_name if attendance.session_name else f"Oturum_{attendance.id}"
+    meta = {
+        "kind": "session",
+        "subject": attendance_id,
+        "teacher_uuid": teacher_uuid,
+        "filename": f"yoklama_{safe_filename(attendance_name)}.pdf",
+        "title": f"Yoklama Raporu - {attendance.session_name or f'Oturum {attendance.id}'}"
+    }
+
+    def loader():
         # Yoklamaya katılan öğrencileri al
         students_data = (
-            db.session.query(AttenationDetail, Student)
+            db.session.query(AttenationDetail.timestamp, Student.name, Student.surname, Student.student_uuid)
             .join(Student, AttenationDetail.student_uuid == Student.student_uuid)
             .filter(AttenationDetail.attenation_id == attendance_id)
             .order_by(AttenationDetail.timestamp.desc())
             .all()
         )
-        
-        # Dosya adını belirle
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        attendance_name = attendance.session_name if attendance.session_name else f"Oturum_{attendance.id}"
-        attendance_name = attendance_name.replace(' ', '_').replace('ı', 'i').replace('ğ', 'g').replace('ü', 'u').replace('ş', 's').replace('ç', 'c').replace('ö', 'o')
-        filename = f"yoklama_{attendance_name}_{timestamp}.pdf"
-        
-        # PDF'i kaydetmek için dizin
-        static_dir = os.path.join(current_app.root_path, 'static', 'reports')
-        os.makedirs(static_dir, exist_ok=True)
-        filepath = os.path.join(static_dir, filename)
-        
-        # PDF dokümanı oluştur
-        doc = SimpleDocTemplate(filepath, pagesize=letter)
-        elements = []
-        
-        # Stiller
-        styles = getSampleStyleSheet()
-        title_style = styles['Heading1']
-        subtitle_style = styles['Heading2']
-        normal_style = styles['Normal']
-        
-        # Cell stili
-        cell_style = ParagraphStyle(
-            'CellStyle',
-            parent=normal_style,
-            wordWrap='CJK',
-            fontSize=9
-        )
-        
-        # Türkçe karakterleri temizle
-        def clean_text(text):
-            if not isinstance(text, str):
-                text = str(text)
-            replacements = {
-                'ı': 'i', 'İ': 'I', 'ğ': 'g', 'Ğ': 'G', 
-                'ü': 'u', 'Ü': 'U', 'ş': 's', 'Ş': 'S', 
-                'ç': 'c', 'Ç': 'C', 'ö': 'o', 'Ö': 'O'
+        return {
+            "lesson": {"name": lesson.name, "lesson_uuid": lesson.lesson_uuid},
+            "session": {
+                "id": attendance.id,
+                "session_name": attendance.session_name,
+                "created_at": attendance.created_at.strftime('%d.%m.%Y %H:%M'),
+                "closed_at": attendance.closed_at.strftime('%d.%m.%Y %H:%M') if attendance.closed_at else None,
+                "is_active": attendance.is_active
+            },
+            "students": [
+                {
+                    "name": f"{name} {surname}",
+                    "student_id": student_uuid,
+                    "timestamp": timestamp.strftime('%d.%m.%Y %H:%M:%S')
+                }
+                for timestamp, name, surname, student_uuid in students_data
+            ],
+            "generated_at": datetime.now().strftime('%d.%m.%Y %H:%M')
+        }
+
+    return key, meta, loader
+
+def _report_result(meta):
+    return {
+        "success": True,
+        "job_id": meta["job_id"],
+        "status": meta["status"],
+        "filename": meta["filename"],
+        "pdf_url": f"/api/dashboard/reports/jobs/{meta['job_id']}/file",
+        "title": meta["title"]
+    }
+
+def generate_lesson_single_attendance_report(lesson_uuid, teacher_uuid, attendance_id, db=db):
+    """Generate a PDF report for a single attendance session, served from the report cache when unchanged"""
+    from modal.ReportJobs import report_jobs
+
+    try:
+        prepared = _prepare_session_report(lesson_uuid, teacher_uuid, attendance_id, db)
+        if not prepared:
+            return {
+                "success": False,
+                "message": "Yoklama oturumu bulunamadi veya erisim izniniz yok."
             }
-            for old, new in replacements.items():
-                text = text.replace(old, new)
-            return text
-        
-        # Başlık ekle
-        elements.append(Paragraph(f"Yoklama Oturumu Raporu: {clean_text(attendance.session_name or 'Belirtilmemis')}", title_style))
-        elements.append(Spacer(1, 20))
-        
-        # Ders ve yoklama bilgileri ekle
-        elements.append(Paragraph("Ders ve Yoklama Bilgileri", subtitle_style))
-        elements.append(Spacer(1, 10))
-        
-        info_data = [
-            ["Ders Adi:", clean_text(lesson.name)],
-            ["Ders UUID:", lesson.lesson_uuid],
-            ["Yoklama ID:", str(attendance.id)],
-            ["Oturum Adi:", clean_text(attendance.session_name or "Belirtilmemis")],
-            ["Baslangic Zamani:", attendance.created_at.strftime('%d.%m.%Y %H:%M')],
-            ["Bitis Zamani:", attendance.closed_at.strftime('%d.%m.%Y %H:%M') if attendance.closed_at else "Aktif"],
-            ["Durum:", "Aktif" if attendance.is_active else "Kapali"],
-            ["Katilimci Sayisi:", str(len(students_data))],
-            ["Rapor Tarihi:", datetime.now().strftime('%d.%m.%Y %H:%M')]
-        ]
-        
-        # Her bir hücre için Paragraph kullan
-        for i in range(len(info_data)):
-            for j in range(len(info_data[i])):
-                info_data[i][j] = Paragraph(str(info_data[i][j]), cell_style)
-        
-        info_table = Table(info_data, colWidths=[120, 350])
-        info_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.black),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
-        ]))
-        
-        elements.append(info_table)
-        elements.append(Spacer(1, 20))
-        
-        # Öğrenci listesi
-        elements.append(Paragraph("Katilan Ogrenciler", subtitle_style))
-        elements.append(Spacer(1, 10))
-        
-        if students_data:
-            students_header = [
-                Paragraph("Ogrenci Adi Soyadi", cell_style),
-                Paragraph("Ogrenci ID", cell_style),
-                Paragraph("Katilim Zamani", cell_style)
-            ]
-            students_rows = [students_header]
-            
-            for detail, student in students_data:
-                # Öğrenci numarası veya UUID
-                student_id = student.student_number if hasattr(student, 'student_number') and student.student_number else student.student_uuid
-                
-                student_row = [
-                    Paragraph(clean_text(f"{student.name} {student.surname}"), cell_style),
-                    Paragraph(str(student_id), cell_style),
-                    Paragraph(detail.timestamp.strftime('%d.%m.%Y %H:%M:%S'), cell_style)
-                ]
-                students_rows.append(student_row)
-            
-            students_table = Table(students_rows, colWidths=[180, 180, 120])
-            students_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('ALIGN', (2, 0), (2, -1), 'CENTER'),  # Katılım zamanı ortala
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
-            ]))
-            
-            elements.append(students_table)
-        else:
-            elements.append(Paragraph("Bu oturuma henuz hicbir ogrenci katilmamis.", normal_style))
-        
-        # PDF'i oluştur
-        doc.build(elements)
-        
-        # URL ve dosya bilgilerini döndür
-        pdf_url = f"/static/reports/{filename}"
-        
+        key, meta, loader = prepared
+        return _report_result(report_jobs.render("session", key, meta, loader))
+    except Exception as e:
+        error(f"Error generating single attendance report: {str(e)}")
         return {
+            "success": False,
+            "message": f"PDF rapor olusturulurken bir hata olustu: {str(e)}"
+        }
+
+def stream_lesson_single_attendance_report(lesson_uuid, teacher_uuid, attendance_id, if_none_match=None, db=db):
+    """Render the PDF report of a single attendance session into memory
+
+    The report key doubles as the ETag, so a client that already has the current version gets
+    `not_modified` without the PDF being rendered again.
+    """
+    from modal.ReportJobs import report_jobs
+
+    try:
+        prepared = _prepare_session_report(lesson_uuid, teacher_uuid, attendance_id, db)
+        if not prepared:
+            return {
+                "success": False,
+                "message": "Yoklama oturumu bulunamadi veya erisim izniniz yok."
+            }
+        key, meta, loader = prepared
+        result = {
             "success": True,
-            "filename": filename,
-            "pdf_url": pdf_url,
-            "title": f"Yoklama Raporu - {clean_text(attendance.session_name or f'Oturum {attendance.id}')}"
+            "etag": key,
+            "filename": meta["filename"],
+            "title": meta["title"],
+            "not_modified": bool(if_none_match) and if_none_match.contains(key)
         }
+        if not result["not_modified"]:
+            result["content"], result["timings"] = report_jobs.render_bytes("session", loader)
+        return result
     except Exception as e:
-        error(f"Error generating single attendance report: {str(e)}")
+        error(f"Error streaming single attendance report: {str(e)}")
         return {
             "success": False,
             "message": f"PDF rapor olusturulurken bir hata olustu: {str(e)}"
         }
 
+def enqueue_lesson_single_attendance_report(lesson_uuid, teacher_uuid, attendance_id, db=db):
+    """Queue the PDF report of a single attendance session for background rendering"""
+    from modal.ReportJobs import report_jobs
+
+    try:
+        prepared = _prepare_session_report(lesson_uuid, teacher_uuid, attendance_id, db)
+        if not prepared:
+            return {
+                "success": False,
+                "message": "Yoklama oturumu bulunamadi veya erisim izniniz yok."
+            }
+        key, meta, loader = prepared
+        return _report_result(report_jobs.submit("session", key, meta, loader))
+    except Exception as e:
+        error(f"Error queueing single attendance report: {str(e)}")
+        return {
+            "success": False,
+            "message": f"PDF rapor kuyruga eklenirken bir hata olustu: {str(e)}"
+        }
+
 def get_attendance_session(attendance_id, teacher_uuid, db=db):
     """Get attendance session information with permission check"""
     try:
@@ -532,238 +598,135 @@ def get_attendance_session(attendance_id, teacher_uuid, db=db):
             "message": f"Yoklama oturumu yüklenirken bir hata oluştu: {str(e)}"
         }
         
-def generate_lesson_pdf_report(lesson_uuid, teacher_uuid, sessions, db=db):
-    """Generate a PDF report for a lesson with attendance statistics"""
-    try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.lib import colors
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
-        import os
-        from flask import current_app
-        
-        # Get lesson details
-        lesson = (
-            db.session.query(Lesson)
-            .filter(Lesson.lesson_uuid == lesson_uuid)
-            .first()
+def _prepare_lesson_report(lesson_uuid, teacher_uuid, db=db):
+    """Check access to a lesson and build its report key, metadata and data loader"""
+    from modal.ReportJobs import report_jobs
+    from utils.ReportUtils import safe_filename
+
+    lesson = (
+        db.session.query(Lesson)
+        .join(LessonTeacher, Lesson.lesson_uuid == LessonTeacher.lesson_uuid)
+        .filter(Lesson.lesson_uuid == lesson_uuid, LessonTeacher.teacher_uuid == teacher_uuid)
+        .first()
+    )
+    if not lesson:
+        return None
+
+    # Dersin yoklama verisi değiştiğinde rapor anahtarı da değişir
+    fingerprint = list(
+        db.session.query(
+            func.count(db.distinct(Attenation.id)),
+            func.sum(case((Attenation.is_active == True, 1), else_=0)),
+            func.max(Attenation.updated_at),
+            func.max(Attenation.closed_at),
+            func.count(AttenationDetail.id),
+            func.max(AttenationDetail.id)
         )
-        
-        if not lesson:
-            return {
-                "success": False,
-                "message": "Ders bulunamadi."
-            }
-        
-        # Create a unique filename - Türkçe karakterleri ingilizce harflerle değiştir
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        lesson_name_safe = lesson.name.replace(' ', '_')
-        lesson_name_safe = lesson_name_safe.replace('ı', 'i').replace('ğ', 'g').replace('ü', 'u').replace('ş', 's').replace('ç', 'c').replace('ö', 'o')
-        filename = f"yoklama_raporu_{lesson_name_safe}_{timestamp}.pdf"
-        
-        # Set the path to save the PDF
-        static_dir = os.path.join(current_app.root_path, 'static', 'reports')
-        os.makedirs(static_dir, exist_ok=True)
-        filepath = os.path.join(static_dir, filename)
-        
-        # Create PDF document
-        doc = SimpleDocTemplate(filepath, pagesize=letter)
-        elements = []
-        
-        # Get styles
-        styles = getSampleStyleSheet()
-        title_style = styles['Heading1']
-        subtitle_style = styles['Heading2']
-        normal_style = styles['Normal']
-        
-        # Özel paragraf stili oluştur - word wrap için
-        cell_style = ParagraphStyle(
-            'CellStyle',
-            parent=normal_style,
-            wordWrap='CJK',
-            fontSize=9
+        .outerjoin(AttenationDetail, AttenationDetail.attenation_id == Attenation.id)
+        .filter(Attenation.lesson_uuid == lesson_uuid)
+        .one()
+    ) + [lesson.name, lesson.updated_at]
+    key = report_jobs.cache_key("lesson", lesson_uuid, teacher_uuid, fingerprint)
+
+    meta = {
+        "kind": "lesson",
+        "subject": lesson_uuid,
+        "teacher_uuid": teacher_uuid,
+        "filename": f"yoklama_raporu_{safe_filename(lesson.name)}.pdf",
+        "title": f"Yoklama Raporu - {lesson.name}"
+    }
+
+    def loader():
+        sessions = (
+            db.session.query(Attenation)
+            .filter(Attenation.lesson_uuid == lesson_uuid)
+            .order_by(Attenation.id.desc())
+            .all()
         )
-        
-        # Replace problematic characters in text
-        def clean_text(text):
-            if not isinstance(text, str):
-                text = str(text)
-            # Replace Turkish special characters with ASCII equivalents
-            replacements = {
-                'ı': 'i', 'İ': 'I', 'ğ': 'g', 'Ğ': 'G', 
-                'ü': 'u', 'Ü': 'U', 'ş': 's', 'Ş': 'S', 
-                'ç': 'c', 'Ç': 'C', 'ö': 'o', 'Ö': 'O'
-            }
-            for old, new in replacements.items():
-                text = text.replace(old, new)
-            return text
-        
-        # Add title
-        elements.append(Paragraph(f"Yoklama Raporu: {clean_text(lesson.name)}", title_style))
-        elements.append(Spacer(1, 20))
-        
-        # Add lesson information
-        elements.append(Paragraph("Ders Bilgileri", subtitle_style))
-        elements.append(Spacer(1, 10))
-        
-        lesson_data = [
-            ["Ders Adi:", clean_text(lesson.name)],
-            ["Ders UUID:", lesson.lesson_uuid],
-            ["Toplam Oturum Sayisi:", str(len(sessions))],
-            ["Rapor Tarihi:", datetime.now().strftime('%d.%m.%Y %H:%M')]
-        ]
-        
-        # Her bir hücre için Paragraph kullan
-        for i in range(len(lesson_data)):
-            for j in range(len(lesson_data[i])):
-                lesson_data[i][j] = Paragraph(str(lesson_data[i][j]), cell_style)
-        
-        lesson_table = Table(lesson_data, colWidths=[120, 350])
-        lesson_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.black),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')  # Dikey ortalama
-        ]))
-        
-        elements.append(lesson_table)
-        elements.append(Spacer(1, 20))
-        
-        # Add sessions information
-        elements.append(Paragraph("Yoklama Oturumlari", subtitle_style))
-        elements.append(Spacer(1, 10))
-        
-        # Table header
-        sessions_data = [["ID", "Oturum Adi", "Baslangic", "Bitis", "Durum", "Katilim"]]
-        
-        # Add session data
-        for session in sessions:
-            # Get student count for this session
-            student_count = db.session.query(AttenationDetail).filter(
-                AttenationDetail.attenation_id == session["id"]
-            ).count()
-            
-            session_status = "Aktif" if session["status"] else "Kapali"
-            
-            # Her bir hücre normal metin yerine Paragraph olacak
-            session_row = [
-                Paragraph(str(session["id"]), cell_style),
-                Paragraph(clean_text(session["session_name"] or "Belirtilmemis"), cell_style),
-                Paragraph(session["created_at"], cell_style),
-                Paragraph(session["closed_at"] or "Aktif", cell_style),
-                Paragraph(session_status, cell_style),
-                Paragraph(str(student_count), cell_style)
-            ]
-            sessions_data.append(session_row)
-        
-        # Oturum isimlerinin çok uzun olması durumunda 2. sütunun genişliğini arttır
-        session_table = Table(sessions_data, colWidths=[40, 150, 80, 80, 50, 50])
-        session_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('ALIGN', (0, 0), (0, -1), 'CENTER'),  # ID centered
-            ('ALIGN', (4, 0), (4, -1), 'CENTER'),  # Status centered
-            ('ALIGN', (5, 0), (5, -1), 'CENTER'),  # Student count centered
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')  # Dikey ortalama
-        ]))
-        
-        elements.append(session_table)
-        elements.append(Spacer(1, 20))
-        
-        # Add detailed statistics
-        elements.append(Paragraph("Katilim Istatistikleri", subtitle_style))
-        elements.append(Spacer(1, 10))
-        
-        # Get all students in the course
-        all_students = (
-            db.session.query(Student)
-            .join(Attenation, Attenation.lesson_uuid == lesson_uuid)
-            .join(AttenationDetail, AttenationDetail.attenation_id == Attenation.id)
-            .filter(AttenationDetail.student_uuid == Student.student_uuid)
-            .distinct()
+        student_counts = get_session_student_counts([session.id for session in sessions], db)
+
+        # Öğrenci başına katılım sayısı tek bir gruplanmış sorgu ile
+        students = (
+            db.session.query(Student.student_uuid, Student.name, Student.surname, func.count(AttenationDetail.id))
+            .join(AttenationDetail, AttenationDetail.student_uuid == Student.student_uuid)
+            .join(Attenation, Attenation.id == AttenationDetail.attenation_id)
+            .filter(Attenation.lesson_uuid == lesson_uuid)
+            .group_by(Student.student_uuid, Student.name, Student.surname)
+            .order_by(Student.name, Student.surname)
             .all()
         )
-        
-        if all_students:
-            # Create table for students and their attendance
-            student_header = [
-                Paragraph("Ogrenci Adi Soyadi", cell_style),
-                Paragraph("Ogrenci ID", cell_style),
-                Paragraph("Katilim", cell_style),
-                Paragraph("Oran", cell_style)
-            ]
-            student_data = [student_header]
-            
-            for student in all_students:
-                # Count sessions this student attended
-                attended_sessions = db.session.query(AttenationDetail) \
-                    .join(Attenation, Attenation.id == AttenationDetail.attenation_id) \
-                    .filter(
-                        Attenation.lesson_uuid == lesson_uuid,
-                        AttenationDetail.student_uuid == student.student_uuid
-                    ).count()
-                
-                # Calculate attendance rate
-                attendance_rate = (attended_sessions / len(sessions)) * 100 if sessions else 0
-                
-                # Kullan öğrenci numarası varsa, yoksa UUID
-                student_id = student.student_number if hasattr(student, 'student_number') and student.student_number else student.student_uuid
-                
-                student_row = [
-                    Paragraph(clean_text(f"{student.name} {student.surname}"), cell_style),
-                    Paragraph(str(student_id), cell_style),
-                    Paragraph(f"{attended_sessions} / {len(sessions)}", cell_style),
-                    Paragraph(f"%{attendance_rate:.1f}", cell_style)
-                ]
-                student_data.append(student_row)
-            
-            # Değiştirilen kolon genişlikleri - Katılım sütunu daraltıldı, Oran sütunu genişletildi
-            student_table = Table(student_data, colWidths=[150, 200, 50, 50])  # Katılım 60->50, Oran 40->50
-            student_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('ALIGN', (2, 0), (3, -1), 'CENTER'),  # Katılım ve oran centered
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')  # Dikey ortalama
-            ]))
-            
-            elements.append(student_table)
-        else:
-            elements.append(Paragraph("Bu derse henuz hicbir ogrenci katilmamis.", normal_style))
-        
-        # Build the PDF
-        doc.build(elements)
-        
-        # Get the URL to access the file
-        pdf_url = f"/static/reports/{filename}"
-        
         return {
-            "success": True,
-            "filename": filename,
-            "pdf_url": pdf_url,
-            "title": f"Yoklama Raporu - {clean_text(lesson.name)}"
+            "lesson": {"name": lesson.name, "lesson_uuid": lesson.lesson_uuid},
+            "sessions": [_session_to_dict(session, student_counts.get(session.id, 0)) for session in sessions],
+            "students": [
+                {"name": f"{name} {surname}", "student_id": student_uuid, "attended": attended}
+                for student_uuid, name, surname, attended in students
+            ],
+            "total_sessions": len(sessions),
+            "generated_at": datetime.now().strftime('%d.%m.%Y %H:%M')
         }
+
+    return key, meta, loader
+
+def generate_lesson_pdf_report(lesson_uuid, teacher_uuid, db=db):
+    """Generate a PDF report for a lesson with attendance statistics, served from the report cache when unchanged"""
+    from modal.ReportJobs import report_jobs
+
+    try:
+        prepared = _prepare_lesson_report(lesson_uuid, teacher_uuid, db)
+        if not prepared:
+            return {
+                "success": False,
+                "message": "Ders bulunamadi."
+            }
+        key, meta, loader = prepared
+        return _report_result(report_jobs.render("lesson", key, meta, loader))
     except Exception as e:
         error(f"Error generating PDF report: {str(e)}")
         return {
             "success": False,
             "message": f"PDF rapor olusturulurken bir hata olustu: {str(e)}"
-        }
\ No newline at end of file
+        }
+
+def enqueue_lesson_pdf_report(lesson_uuid, teacher_uuid, db=db):
+    """Queue the PDF report of a lesson for background rendering"""
+    from modal.ReportJobs import report_jobs
+
+    try:
+        prepared = _prepare_lesson_report(lesson_uuid, teacher_uuid, db)
+        if not prepared:
+            return {
+                "success": False,
+                "message": "Ders bulunamadi."
+            }
+        key, meta, loader = prepared
+        return _report_result(report_jobs.submit("lesson", key, meta, loader))
+    except Exception as e:
+        error(f"Error queueing PDF report: {str(e)}")
+        return {
+            "success": False,
+            "message": f"PDF rapor kuyruga eklenirken bir hata olustu: {str(e)}"
+        }
+
+def get_report_job(job_id, teacher_uuid):
+    """Get the status of a report job; None if it is unknown or belongs to another teacher"""
+    from modal.ReportJobs import report_jobs
+
+    job = report_jobs.status(job_id, teacher_uuid)
+    if job is None:
+        return None
+    result = _report_result(job)
+    if "timings" in job:
+        result["timings"] = job["timings"]
+    if job["status"] == "failed":
+        result["error"] = job.get("error")
+    return result
+
+def get_report_file(job_id, teacher_uuid):
+    """Get the cached PDF path and metadata of a finished report job"""
+    from modal.ReportJobs import report_jobs
+
+    meta = report_jobs.get_cached(job_id, teacher_uuid)
+    if meta is None:
+        return None, None
+    return report_jobs.pdf_path(job_id), meta
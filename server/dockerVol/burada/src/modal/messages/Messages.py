@@ -81,6 +81,7 @@ class AttenationModelMessages:
     ERROR_CLOSING_SESSION = "An error occurred while closing the attendance session."
     NO_ACTIVE_SESSION = "No active attendance session found for this lesson."
     NOT_AUTHORIZED_FOR_LESSON = "You are not authorized to start attendance for this lesson."
+    INVALID_ACADEMIC_TERM = "Invalid academic term. Expected e.g. 2024-2025 or 2024-2025-fall."
 
 class AttenationDetailModelMessages:
     ALREADY_MARKED_PRESENT = "This student has already been marked present in this session."
@@ -1,9 +1,11 @@
-from flask import Blueprint, jsonify, request, current_app, g
+from flask import Blueprint, jsonify, request, current_app, g, send_file, Response
 from modal import (get_teacher_lessons, get_lesson_detail, create_attendance_session, 
                   close_attendance_session, get_attendance_students_list, 
                   generate_lesson_pdf_report, generate_lesson_single_attendance_report,
-                  get_attendance_session)
+                  get_attendance_session, enqueue_lesson_pdf_report, stream_lesson_single_attendance_report,
+                  enqueue_lesson_single_attendance_report, get_report_job, get_report_file)
 from auth.authmiddleware import AuthMiddleware
+from modal.ReplicaRouting import use_replica
 
 AuthMiddleware = AuthMiddleware()
 # Create blueprint
@@ -11,6 +13,7 @@ lessons_api = Blueprint('lessons_api', __name__)
 
 @lessons_api.route('/api/dashboard/lessons', methods=['GET'])
 @AuthMiddleware.login_required
+@use_replica
 def get_teacher_lessons_route():
     """Get all lessons for the logged-in teacher"""
     try:
@@ -39,6 +42,7 @@ def get_teacher_lessons_route():
     
 @lessons_api.route('/api/dashboard/lessons/detail/<lesson_uuid>', methods=['GET'])  
 @AuthMiddleware.login_required
+@use_replica
 def get_lesson_detail_route(lesson_uuid):
     """Get details of a specific lesson"""
     try:
@@ -50,8 +54,15 @@ def get_lesson_detail_route(lesson_uuid):
                 "message": "Kullanıcı kimliği bulunamadı."
             }), 401
         
+        # Optional incremental / paged mode
+        since_id = request.args.get('since_id', type=int)
+        before_id = request.args.get('before_id', type=int)
+        limit = request.args.get('limit', type=int)
+        if limit is not None:
+            limit = max(1, min(limit, 500))
+
         # Use the model function to get lesson details
-        lesson_details = get_lesson_detail(lesson_uuid, teacher_uuid)
+        lesson_details = get_lesson_detail(lesson_uuid, teacher_uuid, since_id=since_id, before_id=before_id, limit=limit)
         
         if not lesson_details["success"]:
             return jsonify(lesson_details), 404
@@ -124,6 +135,7 @@ def close_attendance_session_route(attendance_uuid):
 
 @lessons_api.route('/api/dashboard/attendance/students/<int:attendance_id>', methods=['GET'])
 @AuthMiddleware.login_required
+@use_replica
 def get_attendance_students(attendance_id):
     """Get students who attended a specific attendance session"""
     try:
@@ -152,6 +164,7 @@ def get_attendance_students(attendance_id):
 
 @lessons_api.route('/api/dashboard/lessons/report/<lesson_uuid>', methods=['GET'])
 @AuthMiddleware.login_required
+@use_replica
 def generate_lesson_report(lesson_uuid):
     """Generate a PDF report for a specific lesson"""
     try:
@@ -163,20 +176,11 @@ def generate_lesson_report(lesson_uuid):
                 "message": "Kullanıcı kimliği bulunamadı."
             }), 401
         
-        # Get lesson details and attendance data
-        lesson_data = get_lesson_detail(lesson_uuid, teacher_uuid)
-        
-        if not lesson_data["success"]:
-            return jsonify(lesson_data), 404
-        
-        # Get all attendance sessions for this lesson
-        all_sessions = lesson_data["data"]["sessions"]
-        
-        # Create PDF using a helper function (defined in modal/__init__.py)
-        pdf_result = generate_lesson_pdf_report(lesson_uuid, teacher_uuid, all_sessions)
+        # Create PDF using a helper function (defined in modal/__init__.py), cached while the data is unchanged
+        pdf_result = generate_lesson_pdf_report(lesson_uuid, teacher_uuid)
         
         if not pdf_result["success"]:
-            return jsonify(pdf_result), 500
+            return jsonify(pdf_result), 404 if pdf_result["message"] == "Ders bulunamadi." else 500
             
         # Return the PDF file URL
         return jsonify({
@@ -197,6 +201,7 @@ def generate_lesson_report(lesson_uuid):
 
 @lessons_api.route('/api/dashboard/attendance/report/<int:attendance_id>', methods=['GET'])
 @AuthMiddleware.login_required
+@use_replica
 def generate_attendance_report(attendance_id):
     """Generate a PDF report for a specific attendance session"""
     try:
@@ -216,8 +221,33 @@ def generate_attendance_report(attendance_id):
         
         attendance = attendance_result["data"]
         
-        # Generate PDF using the helper function
         lesson_uuid = attendance.lesson_uuid
+        
+        # ?stream=1 returns the PDF itself, rendered in memory, instead of a file URL
+        if request.args.get('stream') == '1':
+            stream_result = stream_lesson_single_attendance_report(
+                lesson_uuid, teacher_uuid, attendance_id, if_none_match=request.if_none_match
+            )
+            
+            if not stream_result["success"]:
+                return jsonify(stream_result), 500
+            
+            if stream_result["not_modified"]:
+                response = Response(status=304)
+            else:
+                content = stream_result["content"]
+                response = Response(content, mimetype='application/pdf')
+                response.headers['Content-Length'] = str(len(content))
+                disposition = 'attachment' if request.args.get('download') == '1' else 'inline'
+                response.headers['Content-Disposition'] = f'{disposition}; filename="{stream_result["filename"]}"'
+                response.headers['Server-Timing'] = ', '.join(
+                    f'{phase[:-3]};dur={ms}' for phase, ms in stream_result["timings"].items()
+                )
+            response.set_etag(stream_result["etag"])
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        
+        # Generate PDF using the helper function
         pdf_result = generate_lesson_single_attendance_report(lesson_uuid, teacher_uuid, attendance_id)
         
         if not pdf_result["success"]:
@@ -239,4 +269,85 @@ def generate_attendance_report(attendance_id):
         return jsonify({
             "success": False,
             "message": "Rapor oluşturulurken bir hata oluştu."
-        }), 500
\ No newline at end of file
+        }), 500
+
+@lessons_api.route('/api/dashboard/lessons/report/<lesson_uuid>/jobs', methods=['POST'])
+@AuthMiddleware.login_required
+def enqueue_lesson_report(lesson_uuid):
+    """Queue a PDF report build for a lesson; poll the returned job id for the result"""
+    try:
+        result = enqueue_lesson_pdf_report(lesson_uuid, g.user['user_uuid'])
+        
+        if not result["success"]:
+            return jsonify(result), 404 if result["message"] == "Ders bulunamadi." else 500
+        
+        return jsonify({"success": True, "data": result}), 200 if result["status"] == "done" else 202
+        
+    except Exception as e:
+        current_app.logger.error(f"Error queueing lesson report: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Rapor kuyruğa eklenirken bir hata oluştu."
+        }), 500
+
+@lessons_api.route('/api/dashboard/attendance/report/<int:attendance_id>/jobs', methods=['POST'])
+@AuthMiddleware.login_required
+def enqueue_attendance_report(attendance_id):
+    """Queue a PDF report build for an attendance session; poll the returned job id for the result"""
+    try:
+        teacher_uuid = g.user['user_uuid']
+        attendance_result = get_attendance_session(attendance_id, teacher_uuid)
+        
+        if not attendance_result["success"]:
+            return jsonify(attendance_result), 404
+        
+        result = enqueue_lesson_single_attendance_report(attendance_result["data"].lesson_uuid, teacher_uuid, attendance_id)
+        
+        if not result["success"]:
+            return jsonify(result), 500
+        
+        return jsonify({"success": True, "data": result}), 200 if result["status"] == "done" else 202
+        
+    except Exception as e:
+        current_app.logger.error(f"Error queueing attendance report: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "Rapor kuyruğa eklenirken bir hata oluştu."
+        }), 500
+
+@lessons_api.route('/api/dashboard/reports/jobs/<job_id>', methods=['GET'])
+@AuthMiddleware.login_required
+def get_report_job_status(job_id):
+    """Get the status of a report job (pending, done or failed)"""
+    job = get_report_job(job_id, g.user['user_uuid'])
+    
+    if job is None:
+        return jsonify({
+            "success": False,
+            "message": "Rapor bulunamadı."
+        }), 404
+    
+    return jsonify({"success": True, "data": job})
+
+@lessons_api.route('/api/dashboard/reports/jobs/<job_id>/file', methods=['GET'])
+@AuthMiddleware.login_required
+def download_report_file(job_id):
+    """Stream the PDF of a finished report job"""
+    path, meta = get_report_file(job_id, g.user['user_uuid'])
+    
+    if path is None:
+        return jsonify({
+            "success": False,
+            "message": "Rapor bulunamadı veya henüz hazır değil."
+        }), 404
+    
+    response = send_file(
+        path,
+        mimetype='application/pdf',
+        download_name=meta["filename"],
+        as_attachment=request.args.get('download') == '1',
+        etag=job_id,
+        conditional=True
+    )
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -11,6 +11,7 @@ from routes.auth import auth_bp
 
 # Middlewares
 from auth.authmiddleware import AuthMiddleware
+from auth.ratelimit import rate_limit
 
 # Utils
 from utils.JwtUtils import JwtUtils
@@ -30,6 +31,7 @@ def login_get():
 
 @auth_bp.route("/login", methods=["POST"])
 @auth_middleware.not_login_required
+@rate_limit("login", window=60, ip=30, device=10, username=5)
 def login_post():
     """
     Handles user login by validating input data, authenticating the user, and generating a JWT token.
@@ -91,11 +93,10 @@ def login_post():
     if not login[0]:    # Error occurred (false, error message)
         response = make_response(jsonify({"error": login[1]}), 418)
         response.headers["Location"] = f"{urlparse(url_for('auth.login_get'))}?redirectedFrom={request.path}"
+        return response
 
     # login[0] is True, login[1] message login[2] is the user object
-    token = _jwt_util.create_token(login[2].uniqueID, login[2].username, login[2].email)
-
-    _auth_redis_client_util.whitelist_token(login[2].uniqueID, token["access_token"], token)
+    token = _auth_redis_client_util.create_whitelisted_token(login[2].uniqueID, login[2].username, login[2].email, jwt_util=_jwt_util)
 
     response = make_response(jsonify({"message": login[1], "redirect": url_for("dash.dash_index")}), 200)
     response.headers["Access-Control-Expose-Headers"] = "Authorization"
@@ -6,6 +6,7 @@ from modal.User import User
 from routes.auth import auth_bp
 
 from auth.authmiddleware import AuthMiddleware
+from auth.tokencache import token_cache
 from utils.JwtUtils import JwtUtils
 from utils.redis.RedisUtils import AuthRedisClientUtils
 
@@ -26,12 +27,17 @@ def logout_get():
         token = request.headers.get("Authorization")
         if token:
             token = token.split(" ")[1]
+        else:
+            token = request.cookies.get("auth_token")
+        if token:
             payload = _jwt_util.validate_token(token)
 
             if not payload:
                 return response
 
-            _auth_redis_client_util.convert_token_whitelist_to_blacklist(token)
+            # Deleting the whitelist entry also evicts the token from every worker's token cache
+            _auth_redis_client_util.convert_token_whitelist_to_blacklist(payload["user_uuid"], token)
+            token_cache.invalidate(token)
 
     except Exception as e:
         logging.error(f"Error during logout: {str(e)}")
@@ -5,18 +5,19 @@ from hashlib import sha256
 import logging
 
 from modal.User import User
+from modal.AvailabilityFilter import availability_filter
 from routes.auth import auth_bp
 
 from auth.authmiddleware import AuthMiddleware
+from auth.ratelimit import rate_limit
 from utils.JwtUtils import JwtUtils
-from utils.EmailUtils import EmailUtils, EmailTemplates
+from utils.EmailUtils import EmailTemplates
+from utils.MailQueueUtils import mail_queue
 from utils.redis.RedisUtils import AuthRedisClientUtils
 from schemas.auth_schemas.RegisterSchema import RegisterSchema, UsernameCheckSchema, EmailCheckSchema, PhoneCheckSchema
 
 auth_middleware = AuthMiddleware()
 
-_email_utils = EmailUtils()
-
 @auth_bp.route("/register", methods=["GET"])
 @auth_middleware.not_login_required
 def register_get():
@@ -25,6 +26,7 @@ def register_get():
 
 @auth_bp.route("/register", methods=["POST"])
 @auth_middleware.not_login_required
+@rate_limit("register", window=3600, ip=20, device=5)
 def register_post():
     data = request.get_json()
     
@@ -60,8 +62,9 @@ def register_post():
 
     verificaiton_email_content = EmailTemplates.get_verification_email(url_for("auth.verify_email", token=message, _external=True))
     try:
-        is_hello_email_sent = _email_utils.send_email(user.email, "Hello", body_html=EmailTemplates.get_hello_mail())
-        is_verificaiton_email_sent = _email_utils.send_email(user.email, "Verification Email", body_html=verificaiton_email_content)
+        # Delivered by the mail workers, registration does not wait for SMTP
+        mail_queue.enqueue(user.email, "Hello", body_html=EmailTemplates.get_hello_mail(user.username))
+        mail_queue.enqueue(user.email, "Verification Email", body_html=verificaiton_email_content)
     except Exception as e:
         logging.error(f"Error sending email: {e}")
 
@@ -69,6 +72,7 @@ def register_post():
 
 @auth_bp.route("/register/username/available", methods=["POST"])
 @auth_middleware.not_login_required
+@rate_limit("availability", window=60, ip=60, device=30)
 def check_username():
     """ Check if the username is already taken."""
     data = request.get_json()
@@ -85,6 +89,10 @@ def check_username():
 
     username = schema_data.username.lower()
 
+    # Values the filter has never seen are free, only possible hits reach the database
+    if availability_filter.might_contain("username", username) is False:
+        return jsonify({"available": True})
+
     user = User.query.filter_by(username=username).first()
     if user:
         return jsonify({"available": False})
@@ -93,6 +101,7 @@ def check_username():
 
 @auth_bp.route("/register/email/available", methods=["POST"])
 @auth_middleware.not_login_required
+@rate_limit("availability", window=60, ip=60, device=30)
 def check_email():
     """ Check if the username is already taken."""
     data = request.get_json()
@@ -108,7 +117,11 @@ def check_email():
     except ValidationError as e:
         return make_response(jsonify({"error": str(e)}), 400)
 
-    email = schema_data.username.lower()
+    email = schema_data.email.lower()
+
+    # Values the filter has never seen are free, only possible hits reach the database
+    if availability_filter.might_contain("email", email) is False:
+        return jsonify({"available": True})
 
     user = User.query.filter_by(email=email).first()
     if user:
@@ -118,6 +131,7 @@ def check_email():
 
 @auth_bp.route("/register/phone/available", methods=["POST"])
 @auth_middleware.not_login_required
+@rate_limit("availability", window=60, ip=60, device=30)
 def check_phone():
     """ Check if the username is already taken."""
     data = request.get_json()
@@ -131,7 +145,11 @@ def check_phone():
     except ValidationError as e:
         return make_response(jsonify({"error": str(e)}), 400)
 
-    phone = schema_data.username.lower()
+    phone = schema_data.phone.lower()
+
+    # Values the filter has never seen are free, only possible hits reach the database
+    if availability_filter.might_contain("phone", phone) is False:
+        return jsonify({"available": True})
 
     user = User.query.filter_by(phone=phone).first()
     if user:
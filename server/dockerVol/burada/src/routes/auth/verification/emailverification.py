@@ -8,6 +8,7 @@ from routes.auth import auth_bp
 from auth.authmiddleware import AuthMiddleware
 from utils.JwtUtils import JwtUtils
 from utils.EmailUtils import EmailUtils, EmailTemplates
+from utils.MailQueueUtils import mail_queue
 from utils.redis.RedisUtils import AuthRedisClientUtils
 from utils.redis.RedisUtils import VerificaitonRedisClientUtils
 
@@ -64,8 +65,8 @@ def resend_verification_email():
         # set the token to redis for email verification
         _verificaiton_redis_client_util.set_email_verificaiton_token(user.uniqueID, jwtToken)
 
-        _email_utils.send_email(user.email, "Email Verification", body_html=EmailTemplates.get_verification_email(url_for("auth.verify_email", token=jwtToken, _external=True)))
-        return make_response(jsonify({"status": "ok"}), 200)
+        message_id = mail_queue.enqueue(user.email, "Email Verification", body_html=EmailTemplates.get_verification_email(url_for("auth.verify_email", token=jwtToken, _external=True)))
+        return make_response(jsonify({"status": "ok", "message_id": message_id}), 200)
     except Exception as e:
         logging.error(f"Error sending verification email: {e}")
         return make_response(jsonify({"error": "Failed to send verification email"}), 500)
@@ -2,13 +2,14 @@ from flask import Blueprint
 from flask import request, g
 from flask import current_app 
 from flask import jsonify, make_response, send_from_directory, render_template
-from modal import db
+from modal import db, invalidate_teacher_lessons_cache
 from modal.Attenation import Attenation
 from modal.AttenationDetail import AttenationDetail
 from modal.User import User
 from modal.Student import Student
 from modal.Lesson import Lesson  # Ders bilgisi için Lesson modelini ekleyelim
 from modal.LessonTeacher import LessonTeacher  # Öğretmen-ders ilişkisi için
+from modal.CardIndex import card_index
 from datetime import datetime
 import json
 import re
@@ -54,18 +55,10 @@ def burada():
             # Aktif yoklama oturumu var mı kontrol et
             active_session = Attenation.query.filter_by(is_active=True, lesson_uuid=lesson_uuid).first()
 
-            # Kullanıcıyı bul (öğretmen veya öğrenci)
-            teacher = User.query.filter(
-                db.func.concat(User.username).like(str.lower(f"{sector25}{sector24}"))
-            ).first()
-            
-            student = None
-            if not teacher:
-                # Öğrenci olarak ara
-                student = Student.query.filter(
-                    # db.func.concat(Student.name, ' ', Student.surname).ilike(f"TAHA KARA")
-                    db.func.concat(Student.name, ' ', Student.surname).like(full_name)
-                ).first()
+            # Kullanıcıyı bul (öğretmen veya öğrenci) - önce bellek içi kart indeksine bak
+            identity = card_index.resolve(sector24, sector25, sector26)
+            teacher = identity if identity and identity.is_teacher else None
+            student = identity if identity and identity.is_student else None
             
             # Öğretmen kartı ve yoklama açma/kapama durumu
             if teacher:
@@ -75,7 +68,7 @@ def burada():
                         # Öğretmenin verdiği bir ders mi kontrol et
                         lesson_teacher = LessonTeacher.query.filter_by(
                             lesson_uuid=lesson_uuid,
-                            teacher_uuid=teacher.uniqueID
+                            teacher_uuid=teacher.uuid
                         ).first()
                         
                         if not lesson_teacher:
@@ -100,7 +93,7 @@ def burada():
                     # Yoklama yok, öğretmen yeni yoklama açıyor
                     new_session = Attenation(
                         lesson_uuid=lesson_uuid if lesson_uuid else None,
-                        teacher_uuid=teacher.uniqueID,
+                        teacher_uuid=teacher.uuid,
                         is_active=True,
                         session_name=session_name,
                         created_at=datetime.now(),
@@ -108,6 +101,7 @@ def burada():
                     )
                     db.session.add(new_session)
                     db.session.commit()
+                    invalidate_teacher_lessons_cache(teacher.uuid, lesson_uuid)
                     current_app.logger.info(f"Yoklama açıldı: {teacher.name} {teacher.surname}, Ders: {lesson_uuid}")
                     return make_response(jsonify({
                         'status': 100, 
@@ -117,7 +111,7 @@ def burada():
                     }), 200)
                 else:
                     # Yoklama var, öğretmenin yoklamayı kapatma yetkisi var mı kontrol et
-                    if active_session.teacher_uuid != teacher.uniqueID:
+                    if active_session.teacher_uuid != teacher.uuid:
                         return make_response(jsonify({
                             'status': 400, 
                             'message': 'Bu yoklamayı yalnızca açan öğretmen kapatabilir'
@@ -127,6 +121,7 @@ def burada():
                     active_session.is_active = False
                     active_session.closed_at = datetime.now()
                     db.session.commit()
+                    invalidate_teacher_lessons_cache(teacher.uuid, active_session.lesson_uuid)
                     current_app.logger.info(f"Yoklama kapatıldı: {teacher.name} {teacher.surname}")
                     return make_response(jsonify({
                         'status': 000, 
@@ -149,7 +144,7 @@ def burada():
                     # Daha önce bu yoklamaya kaydedilmiş mi kontrol et
                     existing_record = AttenationDetail.query.filter_by(
                         attenation_id=active_session.id, 
-                        student_uuid=student.student_uuid
+                        student_uuid=student.uuid
                     ).first()
                     
                     if existing_record:
@@ -162,7 +157,7 @@ def burada():
                     # Yeni yoklama kaydı oluştur
                     new_detail = AttenationDetail(
                         attenation_id=active_session.id,
-                        student_uuid=student.student_uuid,
+                        student_uuid=student.uuid,
                         card_id=sector26 if sector26 else "NOCARD",
                         timestamp=datetime.now()
                     )
@@ -198,4 +193,38 @@ def burada():
         return make_response(jsonify({
             'status': 400, 
             'message': f'İşlem sırasında hata oluştu: {str(e)}'
-        }), 200)
\ No newline at end of file
+        }), 200)
+
+@burada_bp.route('/batch', methods=['POST'])
+def burada_batch():
+    """
+    IoT cihazında biriken kart okumalarını (ör. Wi-Fi yokken) tek istekte işler.
+
+    Gövde bir okuma dizisi ya da `{"lesson_uuid": ..., "scans": [...]}` olabilir. Her okuma
+    tekil uçtaki alanlara ek olarak `ts` (epoch saniye / ISO 8601) veya `age_ms` taşıyabilir.
+    Okumalar okunma sırasına göre uygulanır; yanıtta her okuma için durum kodu
+    (100/200/000/400) gönderim sırasıyla döner.
+    """
+    from modal.ScanBatch import process_scan_batch, MAX_SCANS
+
+    data = request.get_json(silent=True)
+    lesson_uuid = ''
+    if isinstance(data, dict):
+        lesson_uuid = data.get('lesson_uuid', '') or ''
+        data = data.get('scans')
+    if not isinstance(data, list) or not data:
+        return make_response(jsonify({'status': 400, 'message': 'Veri formatı geçersiz'}), 400)
+    if len(data) > MAX_SCANS:
+        return make_response(jsonify({
+            'status': 400,
+            'message': f'Tek istekte en fazla {MAX_SCANS} okuma gönderilebilir'
+        }), 400)
+
+    results = process_scan_batch(data, lesson_uuid)
+    for index, result in enumerate(results):
+        result['index'] = index
+    current_app.logger.info(
+        f"Toplu yoklama: {len(results)} okuma, "
+        f"{sum(1 for result in results if result['status'] != 400)} işlendi"
+    )
+    return make_response(jsonify({'status': 200, 'count': len(results), 'results': results}), 200)
@@ -2,25 +2,31 @@ from flask import Blueprint, jsonify, request, g
 from auth.authmiddleware import AuthMiddleware
 from modal.Attenation import Attenation
 from modal.Lesson import Lesson
+from modal.ReplicaRouting import use_replica
 
 attendance_bp = Blueprint('attendance', __name__)
 auth_middleware = AuthMiddleware()
 
 @attendance_bp.route('/lessons', methods=['GET'])
 @auth_middleware.login_required
+@use_replica
 def get_teacher_lessons():
     """Öğretmenin derslerini listeler."""
-    teacher_uuid = g.user.uniqueID
+    teacher_uuid = g.user['user_uuid']
     academic_term = request.args.get('term')
     
-    reports = Attenation.get_teacher_lessons_report(teacher_uuid, academic_term)
+    try:
+        reports = Attenation.get_teacher_lessons_report(teacher_uuid, academic_term)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     return jsonify({"success": True, "data": reports})
 
 @attendance_bp.route('/report/<lesson_uuid>', methods=['GET'])
 @auth_middleware.login_required
+@use_replica
 def get_lesson_attendance_report(lesson_uuid):
     """Bir ders için yoklama raporunu getirir."""
-    teacher_uuid = g.user.uniqueID
+    teacher_uuid = g.user['user_uuid']
     academic_term = request.args.get('term')
     
     # Dersin bu öğretmene ait olup olmadığını kontrol et
@@ -33,7 +39,10 @@ def get_lesson_attendance_report(lesson_uuid):
     if not lesson_teacher:
         return jsonify({"success": False, "message": "Bu dersi görüntüleme yetkiniz yok."}), 403
     
-    report = Attenation.get_lesson_attendance_report(lesson_uuid, academic_term)
+    try:
+        report = Attenation.get_lesson_attendance_report(lesson_uuid, academic_term)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     return jsonify({"success": True, "data": report})
 
 @attendance_bp.route('/create', methods=['POST'])
@@ -41,7 +50,7 @@ def get_lesson_attendance_report(lesson_uuid):
 def create_attendance_session():
     """Yeni bir yoklama oturumu başlatır."""
     data = request.get_json()
-    teacher_uuid = g.user.uniqueID
+    teacher_uuid = g.user['user_uuid']
     
     lesson_uuid = data.get('lesson_uuid')
     week_number = int(data.get('week_number', 1))
@@ -77,7 +86,7 @@ def create_attendance_session():
 @auth_middleware.login_required
 def close_attendance_session(attenation_id):
     """Bir yoklama oturumunu kapatır."""
-    teacher_uuid = g.user.uniqueID
+    teacher_uuid = g.user['user_uuid']
     
     attenation = Attenation.query.get(attenation_id)
     if not attenation:
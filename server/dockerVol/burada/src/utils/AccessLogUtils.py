@@ -0,0 +1,182 @@
+from typing import Optional, Dict, Any, List
+from datetime import datetime, timezone
+from threading import Thread, Lock
+import queue
+import json
+import sys
+import atexit
+
+import os
+from dotenv import load_dotenv
+
+from utils.ProxyUtils import client_ip
+
+load_dotenv()
+
+
+class AccessLogWriter:
+    """Structured (one JSON object per line) access log written by a background thread.
+
+    Request threads only put the entry on a bounded queue. The writer thread takes whatever has
+    piled up, up to `batch_size` entries, and writes them to stdout with a single write and flush,
+    so a busy worker does not block on the terminal or the container log driver once per request.
+    When the queue is full the entry is dropped and counted instead of slowing the request down.
+    """
+
+    def __init__(self, batch_size: int = 256, flush_interval: float = 1.0, max_queue: int = 10000):
+        """
+        Args:
+            batch_size (int): Most lines written with one write call (ACCESS_LOG_BATCH_SIZE).
+            flush_interval (float): Longest time a line waits in the queue (ACCESS_LOG_FLUSH_INTERVAL).
+            max_queue (int): Lines kept before new ones are dropped (ACCESS_LOG_MAX_QUEUE).
+        """
+        self.enabled = os.getenv('ACCESS_LOG_ENABLED', 'true').lower() == 'true'
+        self.batch_size = int(os.getenv('ACCESS_LOG_BATCH_SIZE', batch_size))
+        self.flush_interval = float(os.getenv('ACCESS_LOG_FLUSH_INTERVAL', flush_interval))
+        self.max_queue = int(os.getenv('ACCESS_LOG_MAX_QUEUE', max_queue))
+        self.stream = sys.stdout
+
+        self._lock = Lock()
+        self._queue: Optional[queue.Queue] = None
+        self._worker: Optional[Thread] = None
+        self._worker_pid: Optional[int] = None
+
+        self.written = 0
+        self.dropped = 0
+        self.writes = 0
+
+    def _ensure_worker(self) -> None:
+        """Start the writer in this process (again after a fork)."""
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._worker = Thread(target=self._run, name="access-log-writer", daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def log(self, entry: Dict[str, Any]) -> None:
+        """
+        Queue an access log entry.
+
+        Args:
+            entry (Dict[str, Any]): JSON serializable fields of the request.
+        """
+        if not self.enabled:
+            return
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            try:
+                batch: List[Optional[Dict[str, Any]]] = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            lines = [json.dumps(entry, ensure_ascii=False, default=str) for entry in batch if entry is not None]
+            if lines:
+                try:
+                    self.stream.write('\n'.join(lines) + '\n')
+                    self.stream.flush()
+                    self.written += len(lines)
+                    self.writes += 1
+                except Exception:
+                    self.dropped += len(lines)
+            if stop:
+                return
+
+    def close(self, timeout: float = 2) -> None:
+        """Write the queued lines and stop the writer (at exit)."""
+        if self._worker_pid != os.getpid() or self._worker is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._worker.join(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the writer counters."""
+        running = self._worker_pid == os.getpid() and self._worker is not None and self._worker.is_alive()
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize() if running else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "lines_per_write": round(self.written / self.writes, 2) if self.writes else 0.0,
+        }
+
+
+access_log_writer = AccessLogWriter()
+atexit.register(access_log_writer.close)
+
+
+def build_entry(method: str, path: str, query: str, protocol: str, status, size, duration_ms: Optional[float], headers, remote_addr: Optional[str]) -> Dict[str, Any]:
+    """Fields of one access log line, shared by the development server and gunicorn."""
+    return {
+        "time": datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+        "pid": os.getpid(),
+        "client_ip": client_ip(headers, remote_addr),
+        "remote_addr": remote_addr,
+        "method": method,
+        "path": path,
+        "query": query or None,
+        "protocol": protocol,
+        "status": status,
+        "size": size,
+        "duration_ms": duration_ms,
+        "user_agent": headers.get("User-Agent"),
+        "referer": headers.get("Referer"),
+    }
+
+
+class _EnvironHeaders:
+    """Read request headers from a WSGI environ by their HTTP names."""
+
+    def __init__(self, environ: Dict[str, Any]):
+        self.environ = environ
+
+    def get(self, name: str, default=None):
+        return self.environ.get('HTTP_' + name.upper().replace('-', '_'), default)
+
+
+try:
+    from gunicorn.glogging import Logger as _GunicornLogger
+except ImportError:  # Development server only
+    _GunicornLogger = None
+
+if _GunicornLogger is not None:
+    class GunicornAccessLogger(_GunicornLogger):
+        """Gunicorn logger class (`logger_class` in gunicorn.conf.py) that sends the access log
+        through `access_log_writer`. The error log is left to gunicorn."""
+
+        def access(self, resp, req, environ, request_time) -> None:
+            if not self.cfg.accesslog:
+                return
+            try:
+                status = int(str(resp.status).split(None, 1)[0])
+            except (TypeError, ValueError):
+                status = resp.status
+            access_log_writer.log(build_entry(
+                method=environ.get('REQUEST_METHOD'),
+                path=environ.get('PATH_INFO'),
+                query=environ.get('QUERY_STRING'),
+                protocol=environ.get('SERVER_PROTOCOL'),
+                status=status,
+                size=getattr(resp, 'sent', None),
+                duration_ms=round(request_time.total_seconds() * 1000, 2),
+                headers=_EnvironHeaders(environ),
+                remote_addr=environ.get('REMOTE_ADDR'),
+            ))
@@ -0,0 +1,114 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, Optional
+import time
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache whose entries expire after a TTL.
+
+    A `ttl_seconds` of 0 disables the cache: every `get` is a miss and `set` is a no-op.
+    """
+
+    def __init__(self, ttl_seconds: float = 10, max_size: int = 1024):
+        """
+        Args:
+            ttl_seconds (float): Default time-to-live of an entry in seconds.
+            max_size (int): Maximum number of entries; the least recently used one is evicted.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_size > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a value if it exists and has not expired.
+
+        Args:
+            key (Hashable): Cache key.
+            default (Any, optional): Value returned on a miss. Defaults to None.
+
+        Returns:
+            Any: Cached value or `default`.
+        """
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Store a value.
+
+        Args:
+            key (Hashable): Cache key.
+            value (Any): Value to store.
+            ttl_seconds (float, optional): Entry specific TTL, capped at the cache TTL.
+        """
+        if not self.enabled:
+            return
+
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        """
+        Remove a key.
+
+        Returns:
+            bool: True if the key was cached, False otherwise.
+        """
+        with self._lock:
+            return self._data.pop(key, _MISSING) is not _MISSING
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,46 @@
+from flask import current_app
+from flask.cli import AppGroup
+import click
+import json
+
+# flask --app app burada <komut>
+burada_cli = AppGroup('burada', help="Burada database and startup commands.")
+
+
+@burada_cli.command('init-db')
+@click.option('--drop', is_flag=True, help="Drop every table first. Destroys all data.")
+@click.option('--yes', is_flag=True, help="Do not ask before dropping.")
+def init_db_command(drop: bool, yes: bool) -> None:
+    """Create the missing tables and build the availability filter. Safe to run on every deploy."""
+    from modal.Seed import init_db
+
+    if drop and not yes:
+        click.confirm("Drop all tables and data?", abort=True)
+    result = init_db(drop=drop)
+    click.echo(f"{len(result['tables'])} tables ready in {result['seconds']}s{' (dropped first)' if drop else ''}")
+
+
+@burada_cli.command('seed')
+@click.option('--bulk', is_flag=True, help="One executemany INSERT per table instead of ORM objects.")
+def seed_command(bulk: bool) -> None:
+    """Insert the development data that is missing. Running it again inserts nothing."""
+    from modal.Seed import seed
+    import time
+
+    started = time.perf_counter()
+    report = seed(bulk=bulk)
+    for table, counts in report.items():
+        click.echo(f"{table:<20} inserted={counts['inserted']:<4} skipped={counts['skipped']}")
+    click.echo(f"Seeded in {time.perf_counter() - started:.3f}s (bulk={bulk})")
+
+
+@burada_cli.command('startup-report')
+@click.option('--warm-up', 'warm_up', type=int, default=0, help="Also time opening this many database connections.")
+def startup_report_command(warm_up: int) -> None:
+    """Print how long building the app took, per phase."""
+    timer = current_app.extensions['burada_startup']
+    report = timer.report()
+    if warm_up:
+        from utils.StartupUtils import warm_up_pool
+        report["phases"]["db_warmup"] = round(warm_up_pool(current_app._get_current_object(), warm_up) * 1000, 1)
+    click.echo(json.dumps(report, indent=2))
@@ -0,0 +1,159 @@
+from flask import Flask, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
+from typing import Any, Dict
+from threading import Lock
+import logging
+import time
+
+import os
+from dotenv import load_dotenv
+
+from utils.GlobalUtilities import str_to_bool
+
+load_dotenv()
+
+
+def engine_options(database_url: str) -> Dict[str, Any]:
+    """
+    SQLAlchemy engine options (SQLALCHEMY_ENGINE_OPTIONS) from the environment.
+
+    Every gunicorn worker gets its own pool, so `DB_POOL_SIZE + DB_MAX_OVERFLOW` times the worker
+    count must stay below MySQL's max_connections. Connections are recycled before MySQL's
+    wait_timeout closes them and checked with a ping when taken from the pool.
+
+    Args:
+        database_url (str): Database URL; SQLite gets no pool options.
+
+    Returns:
+        Dict[str, Any]: Keyword arguments of `create_engine`.
+    """
+    options = {
+        "pool_pre_ping": str_to_bool(os.getenv('DB_POOL_PRE_PING', 'true')),
+        "echo": str_to_bool(os.getenv('DB_ECHO', 'false')),
+    }
+    if make_url(database_url).get_backend_name() == 'sqlite':
+        return options
+    options.update(
+        pool_size=int(os.getenv('DB_POOL_SIZE', 10)),
+        max_overflow=int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        pool_timeout=float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        pool_recycle=int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        pool_use_lifo=str_to_bool(os.getenv('DB_POOL_USE_LIFO', 'true')),  # Idle extras time out instead of rotating
+    )
+    return options
+
+
+class QueryStats:
+    """Counts and times every SQL statement through SQLAlchemy cursor events.
+
+    Statements run inside a request are also summed per request: `X-DB-Queries` and `X-DB-Time`
+    (milliseconds) are added to the response when DB_QUERY_HEADERS is on, and a request with more
+    than DB_QUERY_WARN_COUNT statements is logged, which is how N+1 loops show up. Statements
+    slower than DB_SLOW_QUERY_MS are logged with the request path.
+    """
+
+    def __init__(self, slow_query_ms: float = 200, warn_count: int = 50, max_statement_length: int = 500):
+        """
+        Args:
+            slow_query_ms (float): Statements slower than this are logged (DB_SLOW_QUERY_MS, 0 disables).
+            warn_count (int): Requests with more statements are logged (DB_QUERY_WARN_COUNT, 0 disables).
+            max_statement_length (int): Logged statements are cut to this length.
+        """
+        self.slow_query_seconds = float(os.getenv('DB_SLOW_QUERY_MS', slow_query_ms)) / 1000
+        self.warn_count = int(os.getenv('DB_QUERY_WARN_COUNT', warn_count))
+        self.max_statement_length = max_statement_length
+        self.headers = False
+
+        self._lock = Lock()
+        self._installed = False
+        self.queries = 0
+        self.total_seconds = 0.0
+        self.slow_queries = 0
+        self.requests = 0
+        self.request_queries = 0
+        self.max_request_queries = 0
+        self.heavy_requests = 0
+
+    def install(self) -> None:
+        """Listen on every engine (the replicas included); done once per process."""
+        with self._lock:
+            if self._installed:
+                return
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(Engine, 'handle_error', self._handle_error)
+            self._installed = True
+
+    def init_app(self, app: Flask) -> None:
+        """Install the listeners and the per request hooks (see `create_app`)."""
+        self.headers = str_to_bool(os.getenv('DB_QUERY_HEADERS', os.getenv('APP_DEBUG', 'false')))
+        self.install()
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        started = conn.info['query_started'].pop()
+        self._record(time.perf_counter() - started, statement)
+
+    def _handle_error(self, exception_context) -> None:
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_started'):
+            started = connection.info['query_started'].pop()
+            self._record(time.perf_counter() - started, exception_context.statement)
+
+    def _record(self, elapsed: float, statement: str) -> None:
+        with self._lock:
+            self.queries += 1
+            self.total_seconds += elapsed
+
+        in_request = has_request_context() and 'db_queries' in g
+        if in_request:
+            g.db_queries += 1
+            g.db_seconds += elapsed
+
+        if self.slow_query_seconds and elapsed >= self.slow_query_seconds:
+            with self._lock:
+                self.slow_queries += 1
+            where = f" ({request.method} {request.path})" if in_request else ""
+            logging.warning(f"Slow query {elapsed * 1000:.1f}ms{where}: {' '.join(str(statement).split())[:self.max_statement_length]}")
+
+    def _before_request(self) -> None:
+        g.db_queries = 0
+        g.db_seconds = 0.0
+
+    def _after_request(self, response):
+        queries = g.get('db_queries', 0)
+        seconds = g.get('db_seconds', 0.0)
+        with self._lock:
+            self.requests += 1
+            self.request_queries += queries
+            self.max_request_queries = max(self.max_request_queries, queries)
+            if self.warn_count and queries > self.warn_count:
+                self.heavy_requests += 1
+        if self.warn_count and queries > self.warn_count:
+            logging.warning(f"{request.method} {request.path} ran {queries} queries in {seconds * 1000:.1f}ms")
+        if self.headers:
+            response.headers['X-DB-Queries'] = str(queries)
+            response.headers['X-DB-Time'] = f"{seconds * 1000:.2f}"
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the query counters of this process."""
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "avg_query_ms": round(self.total_seconds / self.queries * 1000, 2) if self.queries else 0.0,
+                "slow_queries": self.slow_queries,
+                "requests": self.requests,
+                "avg_queries_per_request": round(self.request_queries / self.requests, 2) if self.requests else 0.0,
+                "max_queries_per_request": self.max_request_queries,
+                "heavy_requests": self.heavy_requests,
+            }
+
+
+query_stats = QueryStats()
@@ -4,6 +4,7 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
 
+from typing import Any, Dict, Iterable, List
 from dotenv import load_dotenv
 import os
 
@@ -17,10 +18,27 @@ class EmailUtils:
         self.password = os.getenv("SMTP_PASSWORD", password)
         self.useTLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
         self.useSSL = os.getenv("SMTP_USE_SSL", "false").lower() == "true"
+        self.timeout = float(os.getenv("SMTP_TIMEOUT", 30))
+        # A local debugging server (e.g. `python -m aiosmtpd -n -l 127.0.0.1:1025` with
+        # SMTP_USE_TLS=false) has no account, so SMTP_FROM can stand in for the username
+        self.from_email = os.getenv("SMTP_FROM", self.username)
 
-    def send_email(self, to_email: str, subject: str, body_text: str=None, body_html: str=None, attachments=None):
+    def build_message(self, to_email: str, subject: str, body_text: str=None, body_html: str=None, attachments=None) -> MIMEMultipart:
+        """
+        Build a MIME message.
+
+        Args:
+            to_email (str): Recipient address.
+            subject (str): Subject line.
+            body_text (str, optional): Plain text body.
+            body_html (str, optional): HTML body.
+            attachments (list, optional): Paths of the files to attach.
+
+        Returns:
+            MIMEMultipart: The message.
+        """
         message = MIMEMultipart()
-        message["From"] = self.username
+        message["From"] = self.from_email
         message["To"] = to_email
         message["Subject"] = subject
 
@@ -38,34 +56,84 @@ class EmailUtils:
                     part = MIMEApplication(f.read(), Name=file_path)
                 part['Content-Disposition'] = f'attachment; filename="{file_path}"'
                 message.attach(part)
+        return message
+
+    def connect(self) -> smtplib.SMTP:
+        """
+        Open an SMTP connection, upgrade it to TLS and log in as configured.
+        The caller owns the connection and must `quit()` it.
 
+        Returns:
+            smtplib.SMTP: Ready to send connection.
+        """
+        if self.useSSL:
+            context = ssl.create_default_context()
+            server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, context=context, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
         try:
-            if self.useSSL:
-                context = ssl.create_default_context()
-                with smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, context=context) as server:
-                    server.login(self.username, self.password)
-                    server.send_message(message)
-            else:
-                with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                    if self.useTLS:
-                        server.starttls()
-                    server.login(self.username, self.password)
-                    server.send_message(message)
+            if self.useTLS and not self.useSSL:
+                server.starttls()
+            if self.username and self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def send_email(self, to_email: str, subject: str, body_text: str=None, body_html: str=None, attachments=None) -> bool:
+        """
+        Send one email over a new connection, blocking until it is delivered to the SMTP server.
+        Request handlers should use `utils.MailQueueUtils.mail_queue` instead.
+
+        Returns:
+            bool: True if the message was sent, False otherwise.
+        """
+        message = self.build_message(to_email, subject, body_text, body_html, attachments)
+        try:
+            with self.connect() as server:
+                server.send_message(message)
             print("Email sent successfully!")
+            return True
         except Exception as e:
             print(f"Failed to send email: {e}")
+            return False
 
-class EmailTemplates:
-
-    @staticmethod
-    def get_mail_protection_start() -> str:
+    def send_bulk(self, template_name: str, subject: str, recipients: Iterable[Dict[str, Any]], chunk_size: int = 500, **common_context) -> List[str]:
         """
-        Generates the starting HTML for protected email content.
-        The content inside this block will not be immediately visible when previewed externally.
+        Render a template for every recipient and queue the messages for delivery.
+
+        The template is compiled once; each recipient only costs a render with its own values
+        and one MIME message. Messages are handed to the mail queue in chunks of `chunk_size`.
+
+        Args:
+            template_name (str): Template name, see `EmailTemplates.render`.
+            subject (str): Subject line.
+            recipients (Iterable[Dict[str, Any]]): One dict per message with the `email` address
+                and the recipient specific template values (e.g. `username`).
+            chunk_size (int, optional): Messages queued at once. Defaults to 500.
+            **common_context: Template values shared by every recipient (e.g. `lesson_name`).
+
         Returns:
-            HTML (str): Mail protection start HTML content.
+            List[str]: Message ids in recipient order, see `MailQueue.status`.
         """
-        return """
+        from utils.MailQueueUtils import mail_queue
+
+        template = _get_template(template_name)
+        message_ids = []
+        chunk = []
+        for recipient in recipients:
+            context = dict(common_context, **recipient)
+            chunk.append(self.build_message(recipient["email"], subject, body_html=template.render(context)))
+            if len(chunk) >= chunk_size:
+                message_ids.extend(mail_queue.enqueue_many(chunk))
+                chunk = []
+        if chunk:
+            message_ids.extend(mail_queue.enqueue_many(chunk))
+        return message_ids
+
+# Static blocks shared by every template; they are inlined into the template sources once
+_MAIL_PROTECTION_START = """
         <div style="display:none;max-height:0;overflow:hidden;">
             This email requires proper rendering to be viewed correctly.
         </div>
@@ -84,54 +152,39 @@ class EmailTemplates:
         </script>
         """
 
-    @staticmethod
-    def get_footer() -> str:
-        """
-        Returns:
-            HTML (str): Footer HTML content.
-        """
-        return """
+_MAIL_FOOTER = """
         <hr style="border:1px solid #555;">
         <p style="font-size:12px; color:#888; text-align:center;">
             This is an automated email. Please do not reply.
         </p>
         """
 
-    @staticmethod
-    def get_verification_email(verification_url: str) -> str:
-        """
-        Generates an HTML email template for email verification.
-
-        Returns:
-            HTML (str): HTML content for email verification.
-        """
-        return f"""
+# Jinja sources; `{% raw %}` keeps the static blocks out of the template parser
+_TEMPLATE_SOURCES = {
+    "verification": """
         <html>
             <body style="background-color:#1c1c1c; color:#f0f0f0; font-family:Arial, sans-serif; padding:20px;">
-                {EmailTemplates.get_mail_protection_start()}
+                {% raw %}""" + _MAIL_PROTECTION_START + """{% endraw %}
                 <h2 style="color:#ffffff;">Verify Your Email Address</h2>
                 <p>Please click the button below to verify your email address. This helps us secure your account.</p>
                 
                 <div style="text-align:center; margin:30px 0;">
-                    <a href="{verification_url}" target="_blank" style="background-color:#4CAF50;color:white;padding:14px 25px;text-align:center;text-decoration:none;display:inline-block;font-size:16px;border-radius:8px;">
+                    <a href="{{ verification_url }}" target="_blank" style="background-color:#4CAF50;color:white;padding:14px 25px;text-align:center;text-decoration:none;display:inline-block;font-size:16px;border-radius:8px;">
                         Verify Email
                     </a>
                 </div>
 
                 <p>If the button does not work, copy and paste the link below into your browser:</p>
-                <p style="word-break:break-all;">{verification_url}</p>
+                <p style="word-break:break-all;">{{ verification_url }}</p>
 
-                {EmailTemplates.get_footer()}
+                {% raw %}""" + _MAIL_FOOTER + """{% endraw %}
             </body>
         </html>
-        """
-
-    @staticmethod
-    def get_hello_mail(username: str) ->str:
-        return f"""
+        """,
+    "hello": """
         <div style="background-color: #121212; color: #ffffff; padding: 20px; border-radius: 8px; font-family: Arial, sans-serif;">
-        {EmailTemplates.get_mail_protection_start()}
-            <h2 style="text-align: center;">👋 Welcome, {username}!</h2>
+        {% raw %}""" + _MAIL_PROTECTION_START + """{% endraw %}
+            <h2 style="text-align: center;">👋 Welcome, {{ username }}!</h2>
             <p style="font-size: 16px; text-align: center;">
                 We're excited to have you here. Thank you for joining our community!
             </p>
@@ -142,6 +195,90 @@ class EmailTemplates:
             <p style="font-size: 12px; color: #aaaaaa; text-align: center;">
                 This is an automated email. Please do not reply.
             </p>
-        {EmailTemplates.get_footer()}
+        {% raw %}""" + _MAIL_FOOTER + """{% endraw %}
+        </div>
+        """,
+    "missed_class": """
+        <div style="background-color: #121212; color: #ffffff; padding: 20px; border-radius: 8px; font-family: Arial, sans-serif;">
+            <h2 style="text-align: center;">Hello {{ username }},</h2>
+            <p style="font-size: 16px; text-align: center;">
+                You were not marked as present in <b>{{ lesson_name }}</b> on {{ session_date }}.
+            </p>
+            <p style="font-size: 14px; text-align: center; margin-top: 20px;">
+                If you think this is a mistake, please contact the instructor of the lesson.
+            </p>
+        {% raw %}""" + _MAIL_FOOTER + """{% endraw %}
         </div>
-        """
\ No newline at end of file
+        """,
+}
+
+_template_env = None
+
+
+def _get_template(name: str):
+    """Compile a template on first use; the compiled template is reused for every recipient."""
+    global _template_env
+    if _template_env is None:
+        from jinja2 import Environment, DictLoader
+        # Values are HTML-escaped, a username can not inject markup into the mail
+        _template_env = Environment(loader=DictLoader(_TEMPLATE_SOURCES), autoescape=True, cache_size=-1)
+    return _template_env.get_template(name)
+
+
+class EmailTemplates:
+
+    @staticmethod
+    def get_mail_protection_start() -> str:
+        """
+        Generates the starting HTML for protected email content.
+        The content inside this block will not be immediately visible when previewed externally.
+        Returns:
+            HTML (str): Mail protection start HTML content.
+        """
+        return _MAIL_PROTECTION_START
+
+    @staticmethod
+    def get_footer() -> str:
+        """
+        Returns:
+            HTML (str): Footer HTML content.
+        """
+        return _MAIL_FOOTER
+
+    @staticmethod
+    def render(template_name: str, **context) -> str:
+        """
+        Render a precompiled template.
+
+        Args:
+            template_name (str): `verification`, `hello` or `missed_class`.
+            **context: Values of the template placeholders.
+
+        Returns:
+            HTML (str): Rendered HTML content.
+        """
+        return _get_template(template_name).render(**context)
+
+    @staticmethod
+    def get_verification_email(verification_url: str) -> str:
+        """
+        Generates an HTML email template for email verification.
+
+        Returns:
+            HTML (str): HTML content for email verification.
+        """
+        return EmailTemplates.render("verification", verification_url=verification_url)
+
+    @staticmethod
+    def get_hello_mail(username: str) ->str:
+        return EmailTemplates.render("hello", username=username)
+
+    @staticmethod
+    def get_missed_class_mail(username: str, lesson_name: str, session_date: str) -> str:
+        """
+        Generates an HTML email telling a student that they were absent from a session.
+
+        Returns:
+            HTML (str): HTML content for the absence notification.
+        """
+        return EmailTemplates.render("missed_class", username=username, lesson_name=lesson_name, session_date=session_date)
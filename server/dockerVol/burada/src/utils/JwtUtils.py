@@ -47,6 +47,7 @@ class JwtUtils:
                 'user_uuid': payload['user_uuid'],
                 'username': payload.get('username'),
                 'email': payload.get('email'),
+                'exp': payload.get('exp'),
             }
         return None
 
@@ -1,13 +1,23 @@
 from werkzeug.serving import WSGIRequestHandler
 
+from utils.AccessLogUtils import access_log_writer, build_entry
+
 class RequestLogHandler(WSGIRequestHandler):
     def log_message(self, format, *args):
         # Disable the default logging completely
         pass
 
     def log_request(self, code='-', size='-'):
-        forwarded_ip = self.headers.get('Cf-Connecting-IP', self.headers.get('X-Forwarded-For','-'))
-        real_ip = self.client_address[0]
-
-        log_message = f'{forwarded_ip} + {real_ip} - - [{self.log_date_time_string()}] "{self.requestline}" {code} {size}'
-        print(log_message)
+        # Same structured, buffered access log as the gunicorn workers (see gunicorn.conf.py)
+        path, _, query = self.path.partition('?')
+        access_log_writer.log(build_entry(
+            method=self.command,
+            path=path,
+            query=query,
+            protocol=self.request_version,
+            status=getattr(code, 'value', code),
+            size=None if size == '-' else size,
+            duration_ms=None,
+            headers=self.headers,
+            remote_addr=self.client_address[0],
+        ))
@@ -0,0 +1,299 @@
+from typing import Optional, Dict, Any, Iterable, List
+from email.mime.multipart import MIMEMultipart
+from threading import Thread, Condition
+import smtplib
+import logging
+import atexit
+import heapq
+import uuid
+import time
+
+import os
+from dotenv import load_dotenv
+
+from utils.CacheUtils import TTLCache
+from utils.EmailUtils import EmailUtils
+
+load_dotenv()
+
+QUEUED = "queued"
+SENDING = "sending"
+RETRYING = "retrying"
+SENT = "sent"
+FAILED = "failed"
+
+
+class MailQueue:
+    """Outbound mail queue drained by background worker threads.
+
+    Request handlers only build the message and enqueue it. Each worker keeps one authenticated
+    SMTP connection open and sends every ready message over it, so the TCP handshake, STARTTLS
+    and login are paid once per `max_per_connection` messages instead of once per email. The
+    connection is closed after `idle_timeout` seconds without mail.
+
+    A message that fails with a temporary error (4xx, dropped connection) is retried with
+    exponential backoff up to `max_retries` times; permanent (5xx) errors fail it at once.
+    The status of every message is kept for `status_ttl` seconds, see `status()`.
+    """
+
+    def __init__(self, workers: int = 1, batch_size: int = 20, max_per_connection: int = 100, idle_timeout: float = 30, max_retries: int = 3, retry_backoff: float = 2, status_ttl: int = 24 * 3600, shutdown_timeout: float = 5):
+        """
+        Args:
+            workers (int): Worker threads, each with its own connection (MAIL_WORKERS).
+            batch_size (int): Messages a worker takes from the queue at once (MAIL_BATCH_SIZE).
+            max_per_connection (int): Messages sent before the connection is renewed (MAIL_MAX_PER_CONNECTION).
+            idle_timeout (float): Seconds an unused connection stays open (MAIL_IDLE_TIMEOUT).
+            max_retries (int): Retries of a temporarily failed message (MAIL_MAX_RETRIES).
+            retry_backoff (float): First retry delay in seconds, doubled on each retry (MAIL_RETRY_BACKOFF).
+            status_ttl (int): Seconds the status of a message is kept (MAIL_STATUS_TTL).
+            shutdown_timeout (float): Seconds to wait for queued mail at exit (MAIL_SHUTDOWN_TIMEOUT).
+        """
+        self.workers = int(os.getenv('MAIL_WORKERS', workers))
+        self.batch_size = int(os.getenv('MAIL_BATCH_SIZE', batch_size))
+        self.max_per_connection = int(os.getenv('MAIL_MAX_PER_CONNECTION', max_per_connection))
+        self.idle_timeout = float(os.getenv('MAIL_IDLE_TIMEOUT', idle_timeout))
+        self.max_retries = int(os.getenv('MAIL_MAX_RETRIES', max_retries))
+        self.retry_backoff = float(os.getenv('MAIL_RETRY_BACKOFF', retry_backoff))
+        self.shutdown_timeout = float(os.getenv('MAIL_SHUTDOWN_TIMEOUT', shutdown_timeout))
+        self.email_utils = EmailUtils()
+
+        self._cond = Condition()
+        # (ready_at, sequence, message_id, message, attempts)
+        self._heap: List[tuple] = []
+        self._sequence = 0
+        self._sending = 0
+        self._stopping = False
+        self._threads: List[Thread] = []
+        self._threads_pid: Optional[int] = None
+        self._statuses = TTLCache(ttl_seconds=int(os.getenv('MAIL_STATUS_TTL', status_ttl)), max_size=100000)
+
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.connections = 0
+
+    def _ensure_workers(self) -> None:
+        """Start the workers in this process (again after a fork)."""
+        if self._threads_pid == os.getpid():
+            return
+        with self._cond:
+            if self._threads_pid == os.getpid():
+                return
+            self._stopping = False
+            self._threads = [
+                Thread(target=self._work, name=f"mail-worker-{i}", daemon=True)
+                for i in range(max(1, self.workers))
+            ]
+            self._threads_pid = os.getpid()
+            for thread in self._threads:
+                thread.start()
+
+    def enqueue(self, to_email: str, subject: str, body_text: str = None, body_html: str = None, attachments=None) -> str:
+        """
+        Queue an email for delivery.
+
+        Args:
+            to_email (str): Recipient address.
+            subject (str): Subject line.
+            body_text (str, optional): Plain text body.
+            body_html (str, optional): HTML body.
+            attachments (list, optional): Paths of the files to attach.
+
+        Returns:
+            str: Message id to look up with `status()`.
+        """
+        message = self.email_utils.build_message(to_email, subject, body_text, body_html, attachments)
+        return self.enqueue_many([message])[0]
+
+    def enqueue_many(self, messages: Iterable[MIMEMultipart]) -> List[str]:
+        """
+        Queue prebuilt messages with a single lock acquisition (see `EmailUtils.send_bulk`).
+
+        Args:
+            messages (Iterable[MIMEMultipart]): Messages from `EmailUtils.build_message`.
+
+        Returns:
+            List[str]: Message ids in the order of `messages`.
+        """
+        queued_at = time.time()
+        entries = []
+        for message in messages:
+            message_id = uuid.uuid4().hex
+            self._set_status(message_id, QUEUED, to=message["To"], attempts=0, queued_at=queued_at)
+            entries.append((message_id, message))
+
+        self._ensure_workers()
+        ready_at = time.monotonic()
+        with self._cond:
+            for message_id, message in entries:
+                self._sequence += 1
+                heapq.heappush(self._heap, (ready_at, self._sequence, message_id, message, 0))
+            self._cond.notify_all()
+        return [message_id for message_id, _ in entries]
+
+    def _push(self, ready_at: float, message_id: str, message, attempts: int) -> None:
+        # Caller holds self._cond
+        self._sequence += 1
+        heapq.heappush(self._heap, (ready_at, self._sequence, message_id, message, attempts))
+        # flush() waits on the same condition, wake everyone so a worker is among them
+        self._cond.notify_all()
+
+    def _set_status(self, message_id: str, status: str, **fields) -> None:
+        entry = dict(self._statuses.get(message_id) or {}, **fields)
+        entry["status"] = status
+        self._statuses.set(message_id, entry)
+
+    def status(self, message_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the delivery status of a message.
+
+        Args:
+            message_id (str): Id returned by `enqueue`.
+
+        Returns:
+            Optional[Dict[str, Any]]: status (queued, sending, retrying, sent, failed), to, attempts,
+                queued_at, sent_at and error; None if unknown or expired.
+        """
+        entry = self._statuses.get(message_id)
+        return dict(entry, message_id=message_id) if entry else None
+
+    def _take_batch(self, wait: float) -> list:
+        """Pop up to `batch_size` ready messages, waiting at most `wait` seconds for the first."""
+        deadline = time.monotonic() + wait
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self._heap and self._heap[0][0] <= now:
+                    batch = []
+                    while self._heap and self._heap[0][0] <= now and len(batch) < self.batch_size:
+                        batch.append(heapq.heappop(self._heap))
+                    self._sending += len(batch)
+                    return batch
+                if self._stopping and not self._heap:
+                    return []
+                timeout = deadline - now
+                if self._heap:
+                    timeout = min(timeout, self._heap[0][0] - now)
+                if timeout <= 0:
+                    return []
+                self._cond.wait(timeout)
+
+    @staticmethod
+    def _is_permanent(error: Exception) -> bool:
+        """5xx replies and refused recipients will fail the same way again."""
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return all(code >= 500 for code, _ in error.recipients.values())
+        code = getattr(error, 'smtp_code', None)
+        return isinstance(code, int) and code >= 500
+
+    def _work(self) -> None:
+        server = None
+        sent_on_connection = 0
+        while True:
+            batch = self._take_batch(self.idle_timeout if server is not None else 60)
+            if not batch:
+                if server is not None:
+                    self._close(server)
+                    server = None
+                with self._cond:
+                    if self._stopping and not self._heap:
+                        return
+                continue
+
+            for ready_at, _, message_id, message, attempts in batch:
+                attempts += 1
+                self._set_status(message_id, SENDING, attempts=attempts)
+                try:
+                    if server is None or sent_on_connection >= self.max_per_connection:
+                        if server is not None:
+                            self._close(server)
+                        server = self.email_utils.connect()
+                        sent_on_connection = 0
+                        with self._cond:
+                            self.connections += 1
+                    server.send_message(message)
+                    sent_on_connection += 1
+                    with self._cond:
+                        self.sent += 1
+                    self._set_status(message_id, SENT, sent_at=time.time(), error=None, next_attempt_in=None)
+                except Exception as e:
+                    if not isinstance(e, (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError, smtplib.SMTPSenderRefused)):
+                        # The connection itself is broken or was never opened
+                        if server is not None:
+                            self._close(server)
+                        server = None
+                    self._retry_or_fail(message_id, message, attempts, e)
+                finally:
+                    with self._cond:
+                        self._sending -= 1
+                        self._cond.notify_all()
+
+    def _retry_or_fail(self, message_id: str, message, attempts: int, error: Exception) -> None:
+        if self._is_permanent(error) or attempts > self.max_retries:
+            with self._cond:
+                self.failed += 1
+            self._set_status(message_id, FAILED, error=str(error))
+            logging.error(f"Mail {message_id} to {message['To']} failed after {attempts} attempt(s): {str(error)}")
+            return
+
+        delay = self.retry_backoff * (2 ** (attempts - 1))
+        self._set_status(message_id, RETRYING, error=str(error), next_attempt_in=delay)
+        logging.warning(f"Mail {message_id} to {message['To']} will be retried in {delay}s: {str(error)}")
+        with self._cond:
+            self.retried += 1
+            self._push(time.monotonic() + delay, message_id, message, attempts)
+
+    @staticmethod
+    def _close(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def flush(self, timeout: float = 10) -> bool:
+        """
+        Wait until every ready message has been handed to the SMTP server or failed.
+        Messages waiting for a retry later than `timeout` are not waited for.
+
+        Returns:
+            bool: True if the queue was drained in time.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._sending or (self._heap and self._heap[0][0] <= deadline):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._threads_pid != os.getpid():
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def stop(self) -> None:
+        """Let the workers send what is ready, close their connections and exit."""
+        if self._threads_pid != os.getpid():
+            return
+        self.flush(self.shutdown_timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the queue counters."""
+        with self._cond:
+            queued = len(self._heap)
+            sending = self._sending
+        return {
+            "workers": len(self._threads) if self._threads_pid == os.getpid() else 0,
+            "queued": queued,
+            "sending": sending,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "connections": self.connections,
+            "messages_per_connection": round(self.sent / self.connections, 2) if self.connections else 0.0,
+        }
+
+
+mail_queue = MailQueue()
+atexit.register(mail_queue.stop)
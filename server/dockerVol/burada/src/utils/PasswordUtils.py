@@ -1,36 +1,329 @@
 # databsede password hash alanım ve password salt alanım var ve 128 karakter limiti var ikisinin de ayrı ayrı mysql kullanıyorum be string olarak tutuyorum
+# Yeni hash'ler kendini tanımlayan bir formatta tutulur: "<algoritma>$<parametreler>$<hex>" (128 karakteri geçmez)
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
 import hashlib
+import hmac
+import logging
 import secrets
-from typing import Optional, Tuple
+import time
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class PasswordHasher(ABC):
+    """Base class of the password hashers. A hasher encodes its cost parameters into the hash,
+    so hashes made with older parameters (or another hasher) can still be verified."""
+
+    name = ""
+
+    @abstractmethod
+    def hash(self, password: str, salt: str) -> str:
+        """Hash a password with the current parameters."""
+
+    @abstractmethod
+    def verify(self, password: str, password_hash: str, salt: str) -> bool:
+        """Check a password against a hash of this hasher."""
+
+    @abstractmethod
+    def cost(self, password_hash: str) -> int:
+        """Work factor stored in a hash of this hasher."""
+
+    @abstractmethod
+    def calibrate(self, target_seconds: float) -> None:
+        """Raise the work factor until one hash takes about `target_seconds`."""
+
+    @property
+    @abstractmethod
+    def current_cost(self) -> int:
+        """Work factor of new hashes."""
+
+    @abstractmethod
+    def describe(self) -> Dict[str, Any]:
+        """Algorithm and parameters, for the startup report."""
+
+
+class ScryptHasher(PasswordHasher):
+    """Memory-hard scrypt; memory use is 128 * n * r bytes."""
+
+    name = "scrypt"
+
+    def __init__(self, n: int = 2 ** 14, r: int = 8, p: int = 1, max_n: int = 2 ** 20, max_memory: Optional[int] = None):
+        """
+        Args:
+            max_n (int): Highest n the calibration goes to.
+            max_memory (int, optional): Memory one hash may use in bytes; caps the calibrated n as well.
+        """
+        self.n = int(os.getenv('PASSWORD_SCRYPT_N', n))
+        self.r = int(os.getenv('PASSWORD_SCRYPT_R', r))
+        self.p = int(os.getenv('PASSWORD_SCRYPT_P', p))
+        self.max_n = max_n
+        if max_memory is not None:
+            while self.max_n > 2 and 128 * self.max_n * self.r > max_memory:
+                self.max_n //= 2
+        self.fixed = os.getenv('PASSWORD_SCRYPT_N') is not None
+        if not self.fixed and self.n > self.max_n:
+            logging.warning(f"scrypt n lowered from {self.n} to {self.max_n} to fit the hashing memory budget (PASSWORD_HASH_MEMORY_MB)")
+            self.n = self.max_n
+
+    def _derive(self, password: str, salt: str, n: int, r: int, p: int) -> str:
+        return hashlib.scrypt(
+            password.encode('utf-8'), salt=salt.encode('utf-8'), n=n, r=r, p=p,
+            maxmem=256 * n * r * p, dklen=32
+        ).hex()
+
+    def hash(self, password: str, salt: str) -> str:
+        return f"{self.name}${self.n},{self.r},{self.p}${self._derive(password, salt, self.n, self.r, self.p)}"
+
+    def verify(self, password: str, password_hash: str, salt: str) -> bool:
+        _, params, digest = password_hash.split('$')
+        n, r, p = (int(value) for value in params.split(','))
+        return hmac.compare_digest(self._derive(password, salt, n, r, p), digest)
+
+    def cost(self, password_hash: str) -> int:
+        n, r, p = (int(value) for value in password_hash.split('$')[1].split(','))
+        return n * r * p
+
+    @property
+    def current_cost(self) -> int:
+        return self.n * self.r * self.p
+
+    def calibrate(self, target_seconds: float) -> None:
+        if self.fixed:
+            return
+        # Double n (memory and time) while one hash stays under the target
+        while self.n < self.max_n:
+            started = time.perf_counter()
+            self._derive("calibration", "calibration", self.n, self.r, self.p)
+            if (time.perf_counter() - started) * 2 > target_seconds:
+                break
+            self.n *= 2
+
+    def describe(self) -> Dict[str, Any]:
+        return {"algorithm": self.name, "n": self.n, "r": self.r, "p": self.p}
+
+
+class Pbkdf2Hasher(PasswordHasher):
+    """Iterated PBKDF2-HMAC-SHA512, for hosts where scrypt's memory cost is not wanted."""
+
+    name = "pbkdf2_sha512"
+
+    def __init__(self, iterations: int = 210000):
+        self.iterations = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', iterations))
+        self.fixed = os.getenv('PASSWORD_PBKDF2_ITERATIONS') is not None
+
+    def _derive(self, password: str, salt: str, iterations: int) -> str:
+        return hashlib.pbkdf2_hmac('sha512', password.encode('utf-8'), salt.encode('utf-8'), iterations, dklen=32).hex()
+
+    def hash(self, password: str, salt: str) -> str:
+        return f"{self.name}${self.iterations}${self._derive(password, salt, self.iterations)}"
+
+    def verify(self, password: str, password_hash: str, salt: str) -> bool:
+        _, iterations, digest = password_hash.split('$')
+        return hmac.compare_digest(self._derive(password, salt, int(iterations)), digest)
+
+    def cost(self, password_hash: str) -> int:
+        return int(password_hash.split('$')[1])
+
+    @property
+    def current_cost(self) -> int:
+        return self.iterations
+
+    def calibrate(self, target_seconds: float) -> None:
+        if self.fixed:
+            return
+        # Iterations scale linearly; never go below the default
+        started = time.perf_counter()
+        self._derive("calibration", "calibration", self.iterations)
+        elapsed = time.perf_counter() - started
+        if 0 < elapsed < target_seconds:
+            self.iterations = max(self.iterations, int(self.iterations * target_seconds / elapsed) // 1000 * 1000)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"algorithm": self.name, "iterations": self.iterations}
+
+
+class LegacySha256Hasher(PasswordHasher):
+    """The former sha256(password + salt) scheme. Only verifies; such hashes are upgraded on login."""
+
+    name = "sha256"
+
+    def hash(self, password: str, salt: str) -> str:
+        raise ValueError("sha256 password hashes can only be verified")
+
+    def verify(self, password: str, password_hash: str, salt: str) -> bool:
+        return hmac.compare_digest(hashlib.sha256((password + salt).encode('utf-8')).hexdigest(), password_hash)
+
+    def cost(self, password_hash: str) -> int:
+        return 0
+
+    @property
+    def current_cost(self) -> int:
+        return 0
+
+    def calibrate(self, target_seconds: float) -> None:
+        return  # No work factor to tune
+
+    def describe(self) -> Dict[str, Any]:
+        return {"algorithm": self.name, "verify_only": True}
+
+
+class PasswordHasherRegistry:
+    """Selects the hasher of new hashes (PASSWORD_HASHER) and runs all hashing in a bounded thread pool.
+
+    hashlib releases the GIL while deriving, so hashes run in parallel on the pool threads while
+    a burst of logins waits in the pool queue instead of occupying every request thread with
+    CPU-bound work.
+    """
+
+    def __init__(self, algorithm: str = "scrypt", target_ms: int = 100, workers: int = 2, memory_mb: int = 1024):
+        """
+        Args:
+            algorithm (str): Hasher of new hashes, `scrypt` or `pbkdf2_sha512` (PASSWORD_HASHER).
+            target_ms (int): Calibration target of one hash in milliseconds (PASSWORD_HASH_TARGET_MS).
+            workers (int): Hashing threads per process (PASSWORD_HASH_WORKERS). Every gunicorn worker
+                has its own pool, the processes already spread the hashing over the CPUs.
+            memory_mb (int): Memory all hashing threads of the host may use together
+                (PASSWORD_HASH_MEMORY_MB); caps the calibrated scrypt cost.
+        """
+        self.workers = int(os.getenv('PASSWORD_HASH_WORKERS', workers))
+        # Same default as gunicorn.conf.py
+        processes = int(os.getenv('GUNICORN_WORKERS', (os.cpu_count() or 1) * 2 + 1))
+        self.memory_per_hash = int(os.getenv('PASSWORD_HASH_MEMORY_MB', memory_mb)) * 2 ** 20 // max(1, self.workers * processes)
+        self.hashers: Dict[str, PasswordHasher] = {
+            hasher.name: hasher for hasher in (ScryptHasher(max_memory=self.memory_per_hash), Pbkdf2Hasher(), LegacySha256Hasher())
+        }
+        algorithm = os.getenv('PASSWORD_HASHER', algorithm)
+        if algorithm not in self.hashers or algorithm == LegacySha256Hasher.name:
+            raise ValueError(f"Unsupported PASSWORD_HASHER: {algorithm}")
+        self.default = self.hashers[algorithm]
+        self.target_seconds = int(os.getenv('PASSWORD_HASH_TARGET_MS', target_ms)) / 1000
+
+        self._lock = Lock()
+        self._calibrated = False
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self.hashes = 0
+        self.verifications = 0
+        self.total_seconds = 0.0
+
+    def calibrate(self) -> None:
+        """Calibrate the default hasher once per process (at startup, see `create_app`)."""
+        if self._calibrated:
+            return
+        with self._lock:
+            if self._calibrated:
+                return
+            started = time.perf_counter()
+            self.default.calibrate(self.target_seconds)
+            self._calibrated = True
+            logging.info(f"Password hasher calibrated in {time.perf_counter() - started:.2f}s: {self.default.describe()}")
+
+    def _run(self, fn, *args):
+        if self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor_pid != os.getpid():
+                    # Forked child: the parent's pool threads do not exist here
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+                    self._executor_pid = os.getpid()
+        started = time.perf_counter()
+        result = self._executor.submit(fn, *args).result()
+        with self._lock:
+            self.total_seconds += time.perf_counter() - started
+        return result
+
+    def hasher_of(self, password_hash: str) -> PasswordHasher:
+        """Hasher that produced a stored hash; hashes without a prefix are legacy sha256."""
+        name = password_hash.split('$', 1)[0] if '$' in password_hash else LegacySha256Hasher.name
+        hasher = self.hashers.get(name)
+        if hasher is None:
+            raise ValueError(f"Unknown password hash algorithm: {name}")
+        return hasher
+
+    def hash(self, password: str, salt: str) -> str:
+        self.calibrate()
+        with self._lock:
+            self.hashes += 1
+        return self._run(self.default.hash, password, salt)
+
+    def verify(self, password: str, password_hash: str, salt: str) -> bool:
+        hasher = self.hasher_of(password_hash)
+        with self._lock:
+            self.verifications += 1
+        return self._run(hasher.verify, password, password_hash, salt)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """True if the hash uses another algorithm or a lower cost than new hashes.
+        Only upgrades: workers that calibrated differently never downgrade each other's hashes."""
+        self.calibrate()
+        hasher = self.hasher_of(password_hash)
+        return hasher is not self.default or hasher.cost(password_hash) < self.default.current_cost
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the hasher settings and counters."""
+        operations = self.hashes + self.verifications
+        return dict(
+            self.default.describe(),
+            calibrated=self._calibrated,
+            workers=self.workers,
+            memory_per_hash_mb=round(self.memory_per_hash / 2 ** 20, 1),
+            hashes=self.hashes,
+            verifications=self.verifications,
+            avg_ms=round(self.total_seconds / operations * 1000, 2) if operations else 0.0,  # Pool wait included
+        )
+
+
+password_hashers = PasswordHasherRegistry()
+
 
 class PasswordUtils:
     """Utility class for password hashing and validation."""
 
     @staticmethod
     def validate_password(password: str, password_hash: str, salt: str) -> bool:
-        """Validate a password against a stored hash and salt.
-        
+        """Validate a password against a stored hash and salt in constant time.
+
         Args:
             password (str): The password to validate.
             password_hash (str): The stored hashed password.
             salt (str): The stored salt used for hashing.
-            
+
         Returns:
             bool: True if the password is valid, False otherwise.
         """
-        # Hash the provided password with the same salt
-        hashed_password, _ = PasswordUtils.password_hash(password, salt)
-        
-        # Compare the hashed password with the stored hash
-        return hashed_password == password_hash
+        try:
+            return password_hashers.verify(password, password_hash, salt)
+        except ValueError as e:
+            logging.error(f"Invalid password hash: {str(e)}")
+            return False
+
+    @staticmethod
+    def needs_rehash(password_hash: str) -> bool:
+        """Check if a stored hash should be replaced with one made by the current hasher.
+
+        Args:
+            password_hash (str): The stored hashed password.
+
+        Returns:
+            bool: True if the hash is outdated.
+        """
+        try:
+            return password_hashers.needs_rehash(password_hash)
+        except ValueError:
+            return True
 
     @staticmethod
     def generate_salt(length: int = 16) -> str:
         """Generate a random salt for password hashing.
-        
+
         Args:
             length (int): The length of the salt.
-            
+
         Returns:
             str: The generated salt.
         """
@@ -41,19 +334,19 @@ class PasswordUtils:
     @staticmethod
     def password_hash(password: str, salt: Optional[str] = None) -> Tuple[str, str]:
         """Hash a password with an optional salt.
-        
+
         Args:
             password (str): The password to hash.
             salt (str, optional): The salt to use for hashing. If None, a new salt will be generated.
-        
+
         Returns:
             tuple[str, str]: TThe hashed password and the used salt.
-        
+
         """
         if salt is None:
             salt = PasswordUtils.generate_salt()
-        
-        # Hash the password with the salt using sha256
-        hashed_password = hashlib.sha256((password + salt).encode('utf-8')).hexdigest()
-        
+
+        # Hash the password with the salt using the configured KDF (scrypt by default)
+        hashed_password = password_hashers.hash(password, salt)
+
         return hashed_password, salt
@@ -0,0 +1,127 @@
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union
+import ipaddress
+import logging
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# https://www.cloudflare.com/ips/
+CLOUDFLARE_RANGES = (
+    "173.245.48.0/20", "103.21.244.0/22", "103.22.200.0/22", "103.31.4.0/22", "141.101.64.0/18",
+    "108.162.192.0/18", "190.93.240.0/20", "188.114.96.0/20", "197.234.240.0/22", "198.41.128.0/17",
+    "162.158.0.0/15", "104.16.0.0/13", "104.24.0.0/14", "172.64.0.0/13", "131.0.72.0/22",
+    "2400:cb00::/32", "2606:4700::/32", "2803:f800::/32", "2405:b500::/32", "2405:8100::/32",
+    "2a06:98c0::/29", "2c0f:f248::/32",
+)
+
+_Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def _parse_networks(value: str, env_name: str) -> Tuple[_Network, ...]:
+    networks = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logging.error(f"{env_name}: geçersiz ağ {item!r} yok sayıldı")
+    return tuple(networks)
+
+
+@lru_cache(maxsize=1)
+def trusted_proxies() -> Tuple[_Network, ...]:
+    """Networks of our own reverse proxies (TRUSTED_PROXIES, comma separated IPs / CIDRs).
+
+    Empty by default: forwarded headers are then ignored and the peer address is the client.
+    """
+    return _parse_networks(os.getenv('TRUSTED_PROXIES', ''), 'TRUSTED_PROXIES')
+
+
+@lru_cache(maxsize=1)
+def cloudflare_networks() -> Tuple[_Network, ...]:
+    """Cloudflare edge networks (CLOUDFLARE_IPS, defaults to the published ranges, `none` disables)."""
+    value = os.getenv('CLOUDFLARE_IPS', ','.join(CLOUDFLARE_RANGES))
+    if value.strip().lower() == 'none':
+        return ()
+    return _parse_networks(value, 'CLOUDFLARE_IPS')
+
+
+def _address(value: Optional[str]):
+    try:
+        return ipaddress.ip_address((value or '').strip())
+    except ValueError:
+        return None
+
+
+def _in(address, networks: Tuple[_Network, ...]) -> bool:
+    return address is not None and any(address in network for network in networks)
+
+
+def client_ip(headers, remote_addr: Optional[str]) -> Optional[str]:
+    """
+    Client IP of a request, trusting forwarded headers only as far as our own proxies set them.
+
+    Starting at the peer, every hop that is a trusted proxy is replaced by the address it added
+    to X-Forwarded-For (right to left). A hop that is a Cloudflare edge is replaced by
+    CF-Connecting-IP, which Cloudflare overwrites. The walk stops at the first untrusted address,
+    so a client cannot choose its own IP by sending these headers.
+
+    Args:
+        headers: Request headers; anything with `get(name)` (`request.headers`, WSGI environ wrapper).
+        remote_addr (str, optional): Peer address of the connection.
+
+    Returns:
+        Optional[str]: Client IP.
+    """
+    current = remote_addr
+    address = _address(current)
+    hops: List[str] = [hop.strip() for hop in (headers.get("X-Forwarded-For") or '').split(',') if hop.strip()]
+    proxies = trusted_proxies()
+    cloudflare = cloudflare_networks()
+
+    while address is not None:
+        if _in(address, cloudflare):
+            connecting_ip = headers.get("CF-Connecting-IP")
+            if _address(connecting_ip) is not None:
+                return connecting_ip.strip()
+        elif not _in(address, proxies):
+            break
+        if not hops:
+            # Tek proxy X-Forwarded-For yerine X-Real-IP gönderebilir
+            real_ip = headers.get("X-Real-IP")
+            if _in(address, proxies) and _address(real_ip) is not None:
+                return real_ip.strip()
+            break
+        hop = hops.pop()
+        if _address(hop) is None:
+            break
+        current, address = hop, _address(hop)
+    return current
+
+
+def trusted_proxy_addresses() -> List[str]:
+    """Single addresses in TRUSTED_PROXIES; gunicorn's forwarded_allow_ips does not take networks."""
+    return [str(network.network_address) for network in trusted_proxies() if network.num_addresses == 1]
+
+
+class TrustedProxySchemeMiddleware:
+    """WSGI middleware that takes the scheme from X-Forwarded-Proto when the peer is a trusted proxy.
+
+    Gunicorn only trusts single addresses (forwarded_allow_ips); a proxy inside a TRUSTED_PROXIES
+    network (e.g. Traefik on the docker bridge) is handled here, so `url_for(..., _external=True)`
+    builds https links behind it.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        proto = (environ.get('HTTP_X_FORWARDED_PROTO') or '').split(',')[-1].strip().lower()
+        if proto in ('http', 'https') and _in(_address(environ.get('REMOTE_ADDR')), trusted_proxies()):
+            environ['wsgi.url_scheme'] = proto
+        return self.wsgi_app(environ, start_response)
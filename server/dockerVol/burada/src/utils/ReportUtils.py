@@ -0,0 +1,357 @@
+from typing import Any, BinaryIO, Callable, Dict, Optional, Union
+from threading import Lock
+from xml.sax.saxutils import escape
+import logging
+import time
+
+import os
+from dotenv import load_dotenv
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+load_dotenv()
+
+# Report renderers only take plain, picklable dicts so they can run in a worker process
+# without a Flask app or a database session.
+
+# Part of every cached report's key: bump it whenever the layout, the styles or the fonts change,
+# so PDFs cached with the old layout are not served any more.
+REPORT_RENDER_VERSION = 2
+
+_ASCII_FOLD = str.maketrans({
+    'ı': 'i', 'İ': 'I', 'ğ': 'g', 'Ğ': 'G',
+    'ü': 'u', 'Ü': 'U', 'ş': 's', 'Ş': 'S',
+    'ç': 'c', 'Ç': 'C', 'ö': 'o', 'Ö': 'O'
+})
+
+_FONT_CANDIDATES = (
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"),
+    ("/usr/share/fonts/dejavu/DejaVuSans.ttf", "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf"),
+    ("/Library/Fonts/DejaVuSans.ttf", "/Library/Fonts/DejaVuSans-Bold.ttf"),
+)
+
+
+def clean_text(text: Any) -> str:
+    """Replace Turkish special characters with ASCII equivalents."""
+    if not isinstance(text, str):
+        text = str(text)
+    return text.translate(_ASCII_FOLD)
+
+
+def safe_filename(text: str) -> str:
+    """Make a human readable, ASCII-only file name part."""
+    return clean_text(text).replace(' ', '_')
+
+
+class ReportTheme:
+    """Fonts, paragraph styles and table styles shared by every report.
+
+    Building the sample stylesheet and registering TTF fonts is the expensive part of a small
+    report, so a single theme is created per process (see `get_report_theme`). A TTF with
+    Turkish glyphs is loaded from REPORT_FONT_PATH / REPORT_FONT_BOLD_PATH or the usual DejaVu
+    locations; without one the built-in Helvetica is used and text is folded to ASCII.
+    """
+
+    def __init__(self, font_path: Optional[str] = None, bold_font_path: Optional[str] = None):
+        self.font, self.bold_font = self._register_fonts(
+            os.getenv('REPORT_FONT_PATH', font_path),
+            os.getenv('REPORT_FONT_BOLD_PATH', bold_font_path)
+        )
+        self.unicode = self.font != 'Helvetica'
+
+        styles = getSampleStyleSheet()
+        self.title_style = ParagraphStyle('ReportTitle', parent=styles['Heading1'], fontName=self.bold_font)
+        self.subtitle_style = ParagraphStyle('ReportSubtitle', parent=styles['Heading2'], fontName=self.bold_font)
+        self.normal_style = ParagraphStyle('ReportNormal', parent=styles['Normal'], fontName=self.font)
+
+        # Özel paragraf stili oluştur - word wrap için
+        self.cell_style = ParagraphStyle(
+            'CellStyle',
+            parent=self.normal_style,
+            wordWrap='CJK',
+            fontSize=9
+        )
+
+        # Sol sütunu başlık olan iki sütunlu bilgi tablosu
+        self.info_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+            ('TEXTCOLOR', (0, 0), (0, -1), colors.black),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), self.bold_font),
+            ('FONTNAME', (1, 0), (1, -1), self.font),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')  # Dikey ortalama
+        ])
+
+        # İlk satırı başlık olan liste tabloları
+        list_table_commands = [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), self.bold_font),
+            ('FONTNAME', (0, 1), (-1, -1), self.font),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')  # Dikey ortalama
+        ]
+        self.sessions_table_style = TableStyle(list_table_commands + [
+            ('ALIGN', (0, 0), (0, -1), 'CENTER'),  # ID centered
+            ('ALIGN', (4, 0), (4, -1), 'CENTER'),  # Status centered
+            ('ALIGN', (5, 0), (5, -1), 'CENTER'),  # Student count centered
+        ])
+        self.student_stats_table_style = TableStyle(list_table_commands + [
+            ('ALIGN', (2, 0), (3, -1), 'CENTER'),  # Katılım ve oran centered
+        ])
+        self.attendees_table_style = TableStyle(list_table_commands + [
+            ('ALIGN', (2, 0), (2, -1), 'CENTER'),  # Katılım zamanı ortala
+        ])
+
+    @staticmethod
+    def _register_fonts(font_path: Optional[str], bold_font_path: Optional[str]):
+        candidates = ((font_path, bold_font_path or font_path),) if font_path else _FONT_CANDIDATES
+        for regular, bold in candidates:
+            if not (os.path.exists(regular) and os.path.exists(bold)):
+                continue
+            try:
+                pdfmetrics.registerFont(TTFont('ReportSans', regular))
+                pdfmetrics.registerFont(TTFont('ReportSans-Bold', bold))
+                pdfmetrics.registerFontFamily('ReportSans', normal='ReportSans', bold='ReportSans-Bold')
+                return 'ReportSans', 'ReportSans-Bold'
+            except Exception as e:
+                logging.error(f"Error registering report font {regular}: {str(e)}")
+
+        logging.warning("No TTF font with Turkish glyphs found for reports, falling back to Helvetica")
+        return 'Helvetica', 'Helvetica-Bold'
+
+    def text(self, value: Any) -> str:
+        """Prepare text for the report font."""
+        if not isinstance(value, str):
+            value = str(value)
+        return value if self.unicode else clean_text(value)
+
+    def cell(self, value: Any) -> Paragraph:
+        """Table cell paragraph; the value is escaped for reportlab's paragraph markup."""
+        return Paragraph(escape(self.text(value)), self.cell_style)
+
+
+_theme: Optional[ReportTheme] = None
+_theme_lock = Lock()
+
+
+def get_report_theme() -> ReportTheme:
+    """Return the process-wide report theme, creating it on first use."""
+    global _theme
+
+    if _theme is None:
+        with _theme_lock:
+            if _theme is None:
+                _theme = ReportTheme()
+    return _theme
+
+
+def warm_up() -> None:
+    """Load fonts and styles ahead of the first report (also used as the worker initializer)."""
+    get_report_theme()
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def render_lesson_report(data: Dict[str, Any], output: Union[str, BinaryIO]) -> Dict[str, float]:
+    """
+    Render the lesson attendance statistics report.
+
+    Args:
+        data (Dict[str, Any]): Report data with `lesson`, `sessions`, `students`, `total_sessions` and `generated_at`.
+        output (str | BinaryIO): File path or binary stream to write the PDF to.
+
+    Returns:
+        Dict[str, float]: Milliseconds spent building the flowables (`layout_ms`) and in `doc.build` (`write_ms`).
+    """
+    started = time.perf_counter()
+    theme = get_report_theme()
+    cell = theme.cell
+    lesson = data["lesson"]
+    sessions = data["sessions"]
+    total_sessions = data["total_sessions"]
+
+    doc = SimpleDocTemplate(output, pagesize=letter)
+    elements = []
+
+    # Add title
+    elements.append(Paragraph(escape(theme.text(f"Yoklama Raporu: {lesson['name']}")), theme.title_style))
+    elements.append(Spacer(1, 20))
+
+    # Add lesson information
+    elements.append(Paragraph(theme.text("Ders Bilgileri"), theme.subtitle_style))
+    elements.append(Spacer(1, 10))
+
+    lesson_data = [
+        [cell("Ders Adı:"), cell(lesson['name'])],
+        [cell("Ders UUID:"), cell(lesson['lesson_uuid'])],
+        [cell("Toplam Oturum Sayısı:"), cell(total_sessions)],
+        [cell("Rapor Tarihi:"), cell(data["generated_at"])]
+    ]
+    lesson_table = Table(lesson_data, colWidths=[120, 350])
+    lesson_table.setStyle(theme.info_table_style)
+
+    elements.append(lesson_table)
+    elements.append(Spacer(1, 20))
+
+    # Add sessions information
+    elements.append(Paragraph(theme.text("Yoklama Oturumları"), theme.subtitle_style))
+    elements.append(Spacer(1, 10))
+
+    # Table header
+    sessions_data = [[cell("ID"), cell("Oturum Adı"), cell("Başlangıç"), cell("Bitiş"), cell("Durum"), cell("Katılım")]]
+    for session in sessions:
+        sessions_data.append([
+            cell(session["id"]),
+            cell(session["session_name"] or "Belirtilmemiş"),
+            cell(session["created_at"]),
+            cell(session["closed_at"] or "Aktif"),
+            cell("Aktif" if session["status"] else "Kapalı"),
+            cell(session["student_count"])
+        ])
+
+    # Oturum isimlerinin çok uzun olması durumunda 2. sütunun genişliğini arttır
+    session_table = Table(sessions_data, colWidths=[40, 150, 80, 80, 50, 50], repeatRows=1)
+    session_table.setStyle(theme.sessions_table_style)
+
+    elements.append(session_table)
+    elements.append(Spacer(1, 20))
+
+    # Add detailed statistics
+    elements.append(Paragraph(theme.text("Katılım İstatistikleri"), theme.subtitle_style))
+    elements.append(Spacer(1, 10))
+
+    if data["students"]:
+        # Create table for students and their attendance
+        student_data = [[cell("Öğrenci Adı Soyadı"), cell("Öğrenci ID"), cell("Katılım"), cell("Oran")]]
+        for student in data["students"]:
+            attended_sessions = student["attended"]
+            attendance_rate = (attended_sessions / total_sessions) * 100 if total_sessions else 0
+            student_data.append([
+                cell(student["name"]),
+                cell(student["student_id"]),
+                cell(f"{attended_sessions} / {total_sessions}"),
+                cell(f"%{attendance_rate:.1f}")
+            ])
+
+        student_table = Table(student_data, colWidths=[150, 200, 50, 50], repeatRows=1)
+        student_table.setStyle(theme.student_stats_table_style)
+
+        elements.append(student_table)
+    else:
+        elements.append(Paragraph(theme.text("Bu derse henüz hiçbir öğrenci katılmamış."), theme.normal_style))
+
+    layout_ms = _elapsed_ms(started)
+
+    # Build the PDF
+    started = time.perf_counter()
+    doc.build(elements)
+    return {"layout_ms": layout_ms, "write_ms": _elapsed_ms(started)}
+
+
+def render_session_report(data: Dict[str, Any], output: Union[str, BinaryIO]) -> Dict[str, float]:
+    """
+    Render the report of a single attendance session.
+
+    Args:
+        data (Dict[str, Any]): Report data with `lesson`, `session`, `students` and `generated_at`.
+        output (str | BinaryIO): File path or binary stream to write the PDF to.
+
+    Returns:
+        Dict[str, float]: Milliseconds spent building the flowables (`layout_ms`) and in `doc.build` (`write_ms`).
+    """
+    started = time.perf_counter()
+    theme = get_report_theme()
+    cell = theme.cell
+    lesson = data["lesson"]
+    session = data["session"]
+    students = data["students"]
+
+    doc = SimpleDocTemplate(output, pagesize=letter)
+    elements = []
+
+    # Başlık ekle
+    elements.append(Paragraph(escape(theme.text(f"Yoklama Oturumu Raporu: {session['session_name'] or 'Belirtilmemiş'}")), theme.title_style))
+    elements.append(Spacer(1, 20))
+
+    # Ders ve yoklama bilgileri ekle
+    elements.append(Paragraph(theme.text("Ders ve Yoklama Bilgileri"), theme.subtitle_style))
+    elements.append(Spacer(1, 10))
+
+    info_data = [
+        [cell("Ders Adı:"), cell(lesson['name'])],
+        [cell("Ders UUID:"), cell(lesson['lesson_uuid'])],
+        [cell("Yoklama ID:"), cell(session['id'])],
+        [cell("Oturum Adı:"), cell(session['session_name'] or "Belirtilmemiş")],
+        [cell("Başlangıç Zamanı:"), cell(session['created_at'])],
+        [cell("Bitiş Zamanı:"), cell(session['closed_at'] or "Aktif")],
+        [cell("Durum:"), cell("Aktif" if session['is_active'] else "Kapalı")],
+        [cell("Katılımcı Sayısı:"), cell(len(students))],
+        [cell("Rapor Tarihi:"), cell(data["generated_at"])]
+    ]
+    info_table = Table(info_data, colWidths=[120, 350])
+    info_table.setStyle(theme.info_table_style)
+
+    elements.append(info_table)
+    elements.append(Spacer(1, 20))
+
+    # Öğrenci listesi
+    elements.append(Paragraph(theme.text("Katılan Öğrenciler"), theme.subtitle_style))
+    elements.append(Spacer(1, 10))
+
+    if students:
+        students_rows = [[cell("Öğrenci Adı Soyadı"), cell("Öğrenci ID"), cell("Katılım Zamanı")]]
+        for student in students:
+            students_rows.append([
+                cell(student["name"]),
+                cell(student["student_id"]),
+                cell(student["timestamp"])
+            ])
+
+        students_table = Table(students_rows, colWidths=[180, 180, 120], repeatRows=1)
+        students_table.setStyle(theme.attendees_table_style)
+
+        elements.append(students_table)
+    else:
+        elements.append(Paragraph(theme.text("Bu oturuma henüz hiçbir öğrenci katılmamış."), theme.normal_style))
+
+    layout_ms = _elapsed_ms(started)
+
+    # PDF'i oluştur
+    started = time.perf_counter()
+    doc.build(elements)
+    return {"layout_ms": layout_ms, "write_ms": _elapsed_ms(started)}
+
+
+REPORT_RENDERERS: Dict[str, Callable[[Dict[str, Any], Union[str, BinaryIO]], Dict[str, float]]] = {
+    "lesson": render_lesson_report,
+    "session": render_session_report,
+}
+
+
+def render_report(kind: str, data: Dict[str, Any], output: Union[str, BinaryIO]) -> Dict[str, float]:
+    """
+    Render a report by kind; the entry point used by the report worker processes.
+
+    Args:
+        kind (str): Report kind, `lesson` or `session`.
+        data (Dict[str, Any]): Report data.
+        output (str | BinaryIO): File path or binary stream to write the PDF to.
+
+    Returns:
+        Dict[str, float]: Phase timings in milliseconds.
+    """
+    return REPORT_RENDERERS[kind](data, output)
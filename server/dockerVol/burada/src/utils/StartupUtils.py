@@ -0,0 +1,83 @@
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+import time
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class StartupTimer:
+    """Timing report of the app startup phases (see `create_app` and `flask burada startup-report`)."""
+
+    def __init__(self, started: Optional[float] = None):
+        """
+        Args:
+            started (float, optional): `time.perf_counter()` value the report starts from,
+                e.g. taken before the module imports. Defaults to now.
+        """
+        self.started = started if started is not None else time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        self.finished: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block as one phase of the report."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add a phase timed elsewhere."""
+        self.phases.append((name, seconds))
+
+    def finish(self) -> None:
+        self.finished = time.perf_counter()
+        logging.info(f"Startup finished in {self.total:.3f}s: " + ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in self.phases))
+
+    @property
+    def total(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def report(self) -> Dict[str, Any]:
+        """Return the total and per phase durations in milliseconds."""
+        return {
+            "pid": os.getpid(),
+            "total_ms": round(self.total * 1000, 1),
+            "phases": {name: round(seconds * 1000, 1) for name, seconds in self.phases},
+        }
+
+
+def warm_up_pool(app, connections: int = None) -> float:
+    """
+    Open database connections ahead of the first requests of a process.
+
+    Args:
+        app (Flask): Application whose engine is warmed up.
+        connections (int, optional): Connections to open, at most the pool size (DB_POOL_WARMUP, default 1).
+
+    Returns:
+        float: Seconds spent.
+    """
+    from modal import db
+    from sqlalchemy import text
+
+    connections = int(os.getenv('DB_POOL_WARMUP', 1) if connections is None else connections)
+    started = time.perf_counter()
+    opened = []
+    try:
+        with app.app_context():
+            for _ in range(connections):
+                connection = db.engine.connect()
+                opened.append(connection)
+                connection.execute(text("SELECT 1"))
+    except Exception as e:
+        logging.warning(f"Database pool warm-up failed: {str(e)}")
+    finally:
+        for connection in opened:
+            connection.close()  # Back to the pool, still open
+    return time.perf_counter() - started
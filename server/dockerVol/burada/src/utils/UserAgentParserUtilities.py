@@ -1,5 +1,13 @@
 from ua_parser import Result as UaResult ,parse as ua_parse
-from typing import Optional
+from typing import Optional, Dict, Any
+import re
+
+import os
+from dotenv import load_dotenv
+
+from utils.CacheUtils import TTLCache
+
+load_dotenv()
 
 class Result(UaResult):
     """Custom Result class to add additional fields."""
@@ -12,18 +20,70 @@ class Result(UaResult):
         """Custom representation to include is_mobile and is_bot."""
         return f"Result(ua_string={self.user_agent}, os={self.os}, device={self.device}, is_mobile={self.is_mobile}, is_bot={self.is_bot})"
 
+_BOT_MARKERS = ['bot', 'spider', 'crawl']
+_MOBILE_MARKERS = ['mobile', 'android', 'iphone', 'ipad', 'xiaomi', 'huawei', 'heytap', 'oppo', 'realme', 'samsung', 'vivo', 'silk', 'samsungbrowser', 'windows phone', 'windows mobile', 'blackberry', 'iemobile', 'opera mini', 'ucweb', 'j2me', 'midp', 'wap']
+
+# One case-insensitive pass over the UA finds both kinds of markers: group 1 is a bot marker, group 2 a mobile one
+_MARKERS_RE = re.compile(
+    '(' + '|'.join(map(re.escape, _BOT_MARKERS)) + ')|(' + '|'.join(map(re.escape, _MOBILE_MARKERS)) + ')',
+    re.IGNORECASE
+)
+
+# UA strings repeat heavily, parsed results are kept in a bounded LRU cache
+_cache = TTLCache(
+    ttl_seconds=float(os.getenv('UA_CACHE_TTL', 24 * 3600)),
+    max_size=int(os.getenv('UA_CACHE_SIZE', 4096))
+)
+
+def _check_markers(user_agent: str) -> tuple:
+    """Check if the user agent is mobile and/or a bot with a single regex scan.
+
+    Returns:
+        tuple: (is_mobile, is_bot)
+    """
+    is_mobile = is_bot = False
+    for bot, mobile in _MARKERS_RE.findall(user_agent):
+        is_bot = is_bot or bool(bot)
+        is_mobile = is_mobile or bool(mobile)
+        if is_bot and is_mobile:
+            break
+    return is_mobile, is_bot
+
 def _check_is_mobile(user_agent: str) -> bool:
     """Check if the user agent is mobile."""
-    ua = user_agent.lower()
-    return any(m in ua for m in ['mobile', 'android', 'iphone', 'ipad', 'xiaomi', 'huawei', 'heytap', 'oppo', 'realme', 'samsung', 'vivo', 'silk', 'samsungbrowser', 'windows phone', 'windows mobile', 'blackberry', 'iemobile', 'opera mini', 'ucweb', 'j2me', 'midp', 'wap'])
+    return _check_markers(user_agent)[0]
 
 def _check_is_bot(user_agent: str) -> bool:
     """Check if the user agent is a bot."""
-    ua = user_agent.lower()
-    return any(b in ua for b in ['bot', 'spider', 'crawl'])
+    return _check_markers(user_agent)[1]
 
 def parse(user_agent: str) -> Result:
-    """Parse the user agent string and enrich with is_mobile and is_bot."""
-    parsed = ua_parse(user_agent)
-    result = Result(user_agent=parsed.user_agent, os=parsed.os,  device=parsed.device, string=parsed.string, is_mobile=_check_is_mobile(user_agent), is_bot=_check_is_bot(user_agent))
+    """Parse the user agent string and enrich with is_mobile and is_bot.
+    Results are cached per UA string; treat them as read-only."""
+    user_agent = user_agent or ''
+    result = _cache.get(user_agent)
+    if result is None:
+        parsed = ua_parse(user_agent)
+        is_mobile, is_bot = _check_markers(user_agent)
+        result = Result(user_agent=parsed.user_agent, os=parsed.os,  device=parsed.device, string=parsed.string, is_mobile=is_mobile, is_bot=is_bot)
+        _cache.set(user_agent, result)
     return result
+
+def parse_columns(user_agent: Optional[str]) -> Dict[str, Any]:
+    """Parse the user agent string into the `ua_*` columns of `ip_info`."""
+    parsed_ua = parse(user_agent)
+    return dict(
+        ua_family               =parsed_ua.user_agent.family if parsed_ua.user_agent else None,
+        ua_version              =('.'.join(str(part) for part in [parsed_ua.user_agent.major, parsed_ua.user_agent.minor, parsed_ua.user_agent.patch, parsed_ua.user_agent.patch_minor] if part is not None) if parsed_ua.user_agent else None),
+        ua_os                   =parsed_ua.os.family if parsed_ua.os else None,
+        ua_os_version           =('.'.join(str(part) for part in [ parsed_ua.os.major, parsed_ua.os.minor, parsed_ua.os.patch, parsed_ua.os.patch_minor ] if part is not None) if parsed_ua.os else None ),
+        ua_device               =parsed_ua.device.family if parsed_ua.device else None,
+        ua_device_brand         =parsed_ua.device.brand if parsed_ua.device else None,
+        ua_device_model         =parsed_ua.device.model if parsed_ua.device else None,
+        ua_is_mobile            =parsed_ua.is_mobile ,
+        ua_is_bot               =parsed_ua.is_bot,
+    )
+
+def stats() -> Dict[str, Any]:
+    """Return the parse cache counters (size, hits, misses, hit_rate)."""
+    return _cache.stats()
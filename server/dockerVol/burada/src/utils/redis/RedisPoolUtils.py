@@ -0,0 +1,167 @@
+from redis import Redis, BlockingConnectionPool
+from redis.exceptions import ConnectionError
+from typing import Any, Dict, List, Optional, Tuple
+from threading import Lock
+import time
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """Blocking connection pool that records utilization and checkout wait times.
+
+    When all `max_connections` are in use a caller waits up to `timeout` seconds for one to be
+    released instead of opening yet another connection, so the counters show whether the pool
+    is sized right for the number of gunicorn workers and threads.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = Lock()
+        self._reset_stats()
+
+    def _reset_stats(self) -> None:
+        self._stats_pid = os.getpid()
+        self.checkouts = 0
+        self.failed_checkouts = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def get_connection(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            connection = super().get_connection(*args, **kwargs)
+        except ConnectionError:
+            with self._stats_lock:
+                self.failed_checkouts += 1
+            raise
+        waited = time.perf_counter() - started
+
+        with self._stats_lock:
+            if self._stats_pid != os.getpid():
+                # Forked child: redis-py resets the connections, reset the counters with them
+                self._reset_stats()
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        return connection
+
+    def release(self, connection) -> None:
+        super().release(connection)
+        with self._stats_lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the pool counters."""
+        with self._stats_lock:
+            return {
+                "max_connections": self.max_connections,
+                "created": len(self._connections),
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "utilization": round(self.in_use / self.max_connections, 4) if self.max_connections else 0.0,
+                "checkouts": self.checkouts,
+                "failed_checkouts": self.failed_checkouts,
+                "avg_wait_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+class RedisPoolRegistry:
+    """Process-wide registry that shares one connection pool per Redis endpoint.
+
+    Every `RedisClientUtils` instance asks the registry for its pool, so the clients created by
+    the middleware and the auth routes at import time reuse the same connections instead of
+    each opening their own.
+    """
+
+    def __init__(self, max_connections: int = 50, timeout: float = 5, socket_timeout: float = 5, socket_connect_timeout: float = 2, health_check_interval: int = 30):
+        """
+        Args:
+            max_connections (int): Connections per pool (REDIS_MAX_CONNECTIONS).
+            timeout (float): Seconds to wait for a free connection (REDIS_POOL_TIMEOUT).
+            socket_timeout (float): Socket read/write timeout in seconds (REDIS_SOCKET_TIMEOUT).
+            socket_connect_timeout (float): Socket connect timeout in seconds (REDIS_SOCKET_CONNECT_TIMEOUT).
+            health_check_interval (int): Seconds after which an idle connection is pinged before use (REDIS_HEALTH_CHECK_INTERVAL).
+        """
+        self.max_connections = int(os.getenv('REDIS_MAX_CONNECTIONS', max_connections))
+        self.timeout = float(os.getenv('REDIS_POOL_TIMEOUT', timeout))
+        self.socket_timeout = float(os.getenv('REDIS_SOCKET_TIMEOUT', socket_timeout))
+        self.socket_connect_timeout = float(os.getenv('REDIS_SOCKET_CONNECT_TIMEOUT', socket_connect_timeout))
+        self.health_check_interval = int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', health_check_interval))
+
+        self._lock = Lock()
+        self._pools: Dict[Tuple, InstrumentedConnectionPool] = {}
+
+    def get_pool(self, host: str, port: int, db: int, password: Optional[str] = None, username: Optional[str] = None, decode_responses: bool = True) -> InstrumentedConnectionPool:
+        """
+        Get the shared pool of an endpoint, creating it on first use.
+
+        Args:
+            host (str): Redis server hostname or IP address.
+            port (int): Redis server port.
+            db (int): Redis database number.
+            password (str, optional): Redis server password.
+            username (str, optional): Redis ACL username.
+            decode_responses (bool, optional): Decode responses as strings. Defaults to True.
+
+        Returns:
+            InstrumentedConnectionPool: The shared pool.
+        """
+        key = (host, int(port), int(db), username, password, decode_responses)
+        pool = self._pools.get(key)
+        if pool is not None:
+            return pool
+
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = InstrumentedConnectionPool(
+                    max_connections=self.max_connections,
+                    timeout=self.timeout,
+                    host=host,
+                    port=int(port),
+                    db=int(db),
+                    username=username,
+                    password=password,
+                    decode_responses=decode_responses,
+                    socket_timeout=self.socket_timeout,
+                    socket_connect_timeout=self.socket_connect_timeout,
+                    health_check_interval=self.health_check_interval
+                )
+                self._pools[key] = pool
+            return pool
+
+    def get_client(self, host: str, port: int, db: int, password: Optional[str] = None, username: Optional[str] = None, decode_responses: bool = True) -> Redis:
+        """
+        Get a Redis client backed by the shared pool of an endpoint.
+
+        Returns:
+            Redis: Redis client instance.
+        """
+        return Redis(connection_pool=self.get_pool(host, port, db, password, username, decode_responses))
+
+    def disconnect_all(self) -> None:
+        """Close every pooled connection (e.g. on shutdown)."""
+        with self._lock:
+            for pool in self._pools.values():
+                pool.disconnect()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Return the counters of every pool, without credentials."""
+        with self._lock:
+            pools = list(self._pools.items())
+        return [
+            dict(endpoint=f"{host}:{port}/{db}", **pool.stats())
+            for (host, port, db, _, _, _), pool in pools
+        ]
+
+
+redis_pools = RedisPoolRegistry()
@@ -1,5 +1,5 @@
 from redis import Redis
-from typing import Any, Optional
+from typing import Any, Iterable, Optional, Tuple
 import random
 
 import os
@@ -8,6 +8,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from ..JwtUtils import JwtUtils
+from .RedisPoolUtils import redis_pools
 
 class RedisClientUtils:
     def __init__(self, host: str='127.0.0.1', port: int=6379, db: int=0, password: str=None):
@@ -28,16 +29,18 @@ class RedisClientUtils:
 
     def _connect(self) -> Redis:
         """
-        Connect to Redis server.
+        Get a Redis client backed by the shared connection pool of the server.
 
         Returns:
             Redis: Redis client instance.
         """
-        return Redis(
+        # Clients of the same endpoint share one pool (see RedisPoolUtils)
+        return redis_pools.get_client(
             host=self.host,
             port=self.port,
             db=self.db,
             password=self.password,
+            username=os.getenv('REDIS_USER'),
             decode_responses=True  # Decode responses as strings
         )
 
@@ -91,6 +94,123 @@ class RedisClientUtils:
         """
         return self.client.exists(key) == 1
 
+    # SET the key, register it in the owner's index set and extend the index TTL to cover it
+    _SET_INDEXED_SCRIPT = """
+        redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+        redis.call('SADD', KEYS[2], KEYS[1])
+        if redis.call('TTL', KEYS[2]) < tonumber(ARGV[2]) then
+            redis.call('EXPIRE', KEYS[2], ARGV[2])
+        end
+        return 1
+    """
+
+    # Prefix of the per-user index sets, e.g. "tokens:<user_uuid>"
+    index_prefix = "keys"
+
+    def _generate_index_key(self, user_uuid: str) -> str:
+        """
+        Generate Redis key of the set that indexes every key of a user.
+
+        Args:
+            user_uuid (str): User ID.
+
+        Returns:
+            str: Index key.
+        """
+        return f"{self.index_prefix}:{user_uuid}"
+
+    def set_indexed(self, user_uuid: str, key: str, value: Any, ex: int, pipe=None) -> bool:
+        """
+        Set a key with an expire time and register it in the user's index set in one round-trip.
+
+        Args:
+            user_uuid (str): User ID.
+            key (str): The key to set.
+            value (Any): The value to store.
+            ex (int): Expiry time in seconds.
+            pipe (Pipeline, optional): Queue the command on this pipeline instead of running it.
+
+        Returns:
+            bool: True if successful (always True when queued on a pipeline), False otherwise.
+        """
+        if not hasattr(self, '_set_indexed'):
+            self._set_indexed = self.client.register_script(self._SET_INDEXED_SCRIPT)
+        result = self._set_indexed(keys=[key, self._generate_index_key(user_uuid)], args=[str(value), int(ex)], client=pipe)
+        return True if pipe is not None else result == 1
+
+    def delete_indexed(self, user_uuid: str, key: str) -> int:
+        """
+        Delete a key and remove it from the user's index set.
+
+        Args:
+            user_uuid (str): User ID.
+            key (str): The key to delete.
+
+        Returns:
+            int: The number of keys that were removed.
+        """
+        pipe = self.client.pipeline(transaction=False)
+        pipe.delete(key)
+        pipe.srem(self._generate_index_key(user_uuid), key)
+        return pipe.execute()[0]
+
+    def get_indexed_keys(self, user_uuid: str, prefix: str = None) -> list:
+        """
+        Get the keys registered for a user. Expired keys may still be listed until the next bulk delete.
+
+        Args:
+            user_uuid (str): User ID.
+            prefix (str, optional): Only return keys starting with this prefix.
+
+        Returns:
+            list: Registered keys.
+        """
+        keys = self.client.smembers(self._generate_index_key(user_uuid))
+        return [key for key in keys if prefix is None or key.startswith(prefix)]
+
+    def delete_all_indexed(self, user_uuid: str, prefix: str = None) -> int:
+        """
+        Delete every key registered for a user with a single pipelined UNLINK.
+
+        Args:
+            user_uuid (str): User ID.
+            prefix (str, optional): Only delete keys starting with this prefix.
+
+        Returns:
+            int: The number of keys that were removed.
+        """
+        keys = self.get_indexed_keys(user_uuid, prefix)
+        if not keys:
+            return 0
+
+        pipe = self.client.pipeline(transaction=False)
+        pipe.unlink(*keys)
+        pipe.srem(self._generate_index_key(user_uuid), *keys)
+        return pipe.execute()[0]
+
+    def scan_unlink(self, pattern: str, batch_size: int = 500) -> int:
+        """
+        Delete every key matching a pattern with cursor based SCAN and batched UNLINK,
+        so Redis is never blocked the way KEYS + DEL would block it.
+
+        Args:
+            pattern (str): Glob-style key pattern.
+            batch_size (int, optional): Keys per SCAN page and per UNLINK. Defaults to 500.
+
+        Returns:
+            int: The number of keys that were removed.
+        """
+        removed = 0
+        batch = []
+        for key in self.client.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                removed += self.client.unlink(*batch)
+                batch = []
+        if batch:
+            removed += self.client.unlink(*batch)
+        return removed
+
 class AuthRedisClientUtils(RedisClientUtils):
     def __init__(self):
         """
@@ -102,6 +222,8 @@ class AuthRedisClientUtils(RedisClientUtils):
         self.db = int(os.getenv('REDIS_AUTH_SESSIONS_DB', os.getenv('REDIS_DB', 0)))
         super().__init__(host=self.host, port=self.port, db=self.db, password=self.password)
 
+    index_prefix = "tokens"
+
     @staticmethod
     def _generate_whitelist_key(user_uuid: str, jwt_token: str) -> str:
         """
@@ -141,7 +263,7 @@ class AuthRedisClientUtils(RedisClientUtils):
             bool: True if the operation was successful, False otherwise.
         """
         key = self._generate_whitelist_key(user_uuid, jwt_token)
-        return self.set(key, str(full_token), ex=expire_seconds)
+        return self.set_indexed(user_uuid, key, full_token, ex=expire_seconds)
 
     def is_token_whitelisted(self, user_uuid: str, jwt_token: str) -> Optional[str]:
         """
@@ -167,7 +289,7 @@ class AuthRedisClientUtils(RedisClientUtils):
             bool: True if the token was deleted, False otherwise.
         """
         key = self._generate_whitelist_key(user_uuid, jwt_token)
-        return self.delete(key)
+        return self.delete_indexed(user_uuid, key)
 
     def blacklist_token(self, user_uuid: str, jwt_token: str, full_token: dict | str, expire_seconds: int = 3600) -> bool:
         """
@@ -182,7 +304,7 @@ class AuthRedisClientUtils(RedisClientUtils):
             bool: True if the operation was successful, False otherwise.
         """
         key = self._generate_blacklist_key(user_uuid, jwt_token)
-        return self.set(key, str(full_token), ex=expire_seconds)
+        return self.set_indexed(user_uuid, key, full_token, ex=expire_seconds)
 
     def is_token_blacklisted(self, user_uuid: str, jwt_token: str, token: str) -> bool:
         """
@@ -209,19 +331,7 @@ class AuthRedisClientUtils(RedisClientUtils):
         Returns:
             bool: True if the operation was successful, False otherwise.
         """
-        keys = self.client.keys(f"whitelist:{user_uuid}:*")
-        if not keys:
-            return False
-        if len(keys) < 1:
-            return True 
-
-        results = []
-
-        for key in keys:
-            result = self.blacklist_token(user_uuid, key.split(":")[2], self.get(key), expire_seconds=self.get_ttl(key))
-            results.append(tuple(key.split(":")[2], result))
-            
-        return all(results) if len(results) > 0 else False
+        return self._revoke(keys=[self._generate_index_key(user_uuid)]) > 0
 
     def get_ttl(self, key: str) -> int:
         """
@@ -240,25 +350,142 @@ class AuthRedisClientUtils(RedisClientUtils):
         Move token from whitelist to blacklist with the remaining expire time (logout operation).
 
         Args:
-            token (str): Token to verify before moving.
+            user_uuid (str): User ID.
+            jwt_token (str): Token to move.
 
         Returns:
             bool: True if successful, False otherwise.
         """
-        user_uuid = JwtUtils.decode_auth_token(jwt_token)["user_uuid"]
+        keys = [self._generate_index_key(user_uuid), self._generate_whitelist_key(user_uuid, jwt_token)]
+        return self._revoke(keys=keys) > 0
+
+    # Move whitelisted tokens of a user to the blacklist with their remaining TTL.
+    # KEYS[1] is the user's index set, KEYS[2..] the whitelist keys; without them every
+    # whitelist key in the index is moved. ARGV[1] is the TTL used when a key has none.
+    _REVOKE_SCRIPT = """
+        local index = KEYS[1]
+        local keys = {}
+        if #KEYS > 1 then
+            for i = 2, #KEYS do keys[#keys + 1] = KEYS[i] end
+        else
+            for _, key in ipairs(redis.call('SMEMBERS', index)) do
+                if string.sub(key, 1, 10) == 'whitelist:' then keys[#keys + 1] = key end
+            end
+        end
+
+        local revoked, max_ttl = 0, 0
+        for _, key in ipairs(keys) do
+            local value = redis.call('GET', key)
+            if value then
+                local ttl = redis.call('TTL', key)
+                if ttl <= 0 then ttl = tonumber(ARGV[1]) end
+                local blacklist_key = 'blacklist:' .. string.sub(key, 11)
+                redis.call('SET', blacklist_key, value, 'EX', ttl)
+                redis.call('SADD', index, blacklist_key)
+                if ttl > max_ttl then max_ttl = ttl end
+                revoked = revoked + 1
+            end
+            redis.call('DEL', key)
+            redis.call('SREM', index, key)
+        end
+
+        if revoked > 0 and redis.call('TTL', index) < max_ttl then
+            redis.call('EXPIRE', index, max_ttl)
+        end
+        return revoked
+    """
+
+    def _revoke(self, keys: list, pipe=None, default_ttl: int = 3600) -> int:
+        """
+        Run the revoke script.
 
-        whitelist_key = self._generate_whitelist_key(user_uuid, jwt_token)
-        full_token = self.get(whitelist_key)
-        if full_token is None:
-            return False
+        Args:
+            keys (list): Index key of the user followed by the whitelist keys to move (all if omitted).
+            pipe (Pipeline, optional): Queue the script on this pipeline instead of running it.
+            default_ttl (int, optional): Blacklist TTL of tokens without an expire time. Defaults to 3600.
 
-        ttl_seconds = self.get_ttl(whitelist_key)
-        if ttl_seconds <= 0:
-            ttl_seconds = 3600  # default to 1 hour if no TTL found
+        Returns:
+            int: Number of tokens moved to the blacklist (0 when queued on a pipeline).
+        """
+        if not hasattr(self, '_revoke_script'):
+            self._revoke_script = self.client.register_script(self._REVOKE_SCRIPT)
+        result = self._revoke_script(keys=keys, args=[int(default_ttl)], client=pipe)
+        return 0 if pipe is not None else int(result)
 
-        self.blacklist_token(user_uuid, jwt_token, full_token, expire_seconds=ttl_seconds)
-        self.delete_whitelisted_token(user_uuid, jwt_token)
-        return True
+    def create_whitelisted_token(self, user_uuid: str, username: str, email: str, jwt_util: Optional[JwtUtils] = None) -> dict:
+        """
+        Create the access and refresh tokens of a user and whitelist the access token for its lifetime (login operation).
+
+        Args:
+            user_uuid (str): User ID.
+            username (str): Username.
+            email (str): Email address.
+            jwt_util (JwtUtils, optional): JwtUtils instance to sign with. A new one is created if omitted.
+
+        Returns:
+            dict: Token dict returned by `JwtUtils.create_token`.
+        """
+        jwt_util = jwt_util or JwtUtils()
+        token = jwt_util.create_token(user_uuid, username, email)
+        expire_seconds = int(jwt_util.access_token_expiration.total_seconds())
+        self.whitelist_token(user_uuid, token["access_token"], token, expire_seconds=expire_seconds)
+        return token
+
+    def revoke_all_tokens(self, user_uuids: Optional[Iterable[str]] = None, batch_size: int = 500) -> int:
+        """
+        Move every whitelisted token of the given users to the blacklist ("log out everyone").
+        Each user is handled atomically by the revoke script; the script calls are sent in
+        pipelined batches so revoking thousands of users takes a handful of round-trips.
+
+        Args:
+            user_uuids (Iterable[str], optional): Users to log out. Every user with a token index if omitted.
+            batch_size (int, optional): Users per pipeline. Defaults to 500.
+
+        Returns:
+            int: Number of tokens moved to the blacklist.
+        """
+        if user_uuids is None:
+            index_keys = self.client.scan_iter(match=f"{self.index_prefix}:*", count=batch_size)
+        else:
+            index_keys = (self._generate_index_key(user_uuid) for user_uuid in user_uuids)
+
+        revoked = 0
+        pipe = self.client.pipeline(transaction=False)
+        queued = 0
+        for index_key in index_keys:
+            self._revoke(keys=[index_key], pipe=pipe)
+            queued += 1
+            if queued >= batch_size:
+                revoked += sum(pipe.execute())
+                queued = 0
+        if queued:
+            revoked += sum(pipe.execute())
+        return revoked
+
+    def rotate_tokens(self, rotations: Iterable[Tuple[str, str, dict | str, int]]) -> int:
+        """
+        Replace many whitelisted tokens at once: each old token is moved to the blacklist and
+        its replacement is whitelisted inside one MULTI/EXEC transaction, so no request ever
+        sees both or neither of them valid.
+
+        Args:
+            rotations (Iterable[Tuple[str, str, dict | str, int]]): (user_uuid, old_jwt_token,
+                new_full_token, expire_seconds) tuples; new_full_token must hold the new "access_token".
+
+        Returns:
+            int: Number of old tokens that were still whitelisted and got revoked.
+        """
+        pipe = self.client.pipeline(transaction=True)
+        count = 0
+        for user_uuid, old_jwt_token, new_full_token, expire_seconds in rotations:
+            index_key = self._generate_index_key(user_uuid)
+            self._revoke(keys=[index_key, self._generate_whitelist_key(user_uuid, old_jwt_token)], pipe=pipe)
+            new_jwt_token = new_full_token["access_token"] if isinstance(new_full_token, dict) else new_full_token
+            self.set_indexed(user_uuid, self._generate_whitelist_key(user_uuid, new_jwt_token), new_full_token, ex=expire_seconds, pipe=pipe)
+            count += 1
+        if not count:
+            return 0
+        return sum(pipe.execute()[0::2])
 
 class VerificaitonRedisClientUtils(RedisClientUtils):
     def __init__(self):
@@ -271,8 +498,10 @@ class VerificaitonRedisClientUtils(RedisClientUtils):
         self.db = int(os.getenv('REDIS_AUTH_DB', os.getenv('REDIS_DB', 0)))+1
         super().__init__(host=self.host, port=self.port, db=self.db, password=self.password)
 
+    index_prefix = "verifications"
+
     @staticmethod
-    def _generate_email_verification_key(self, user_uuid: str) -> str:
+    def _generate_email_verification_key(user_uuid: str) -> str:
         """
         Generate Redis key for email verification.
 
@@ -285,7 +514,7 @@ class VerificaitonRedisClientUtils(RedisClientUtils):
         return f"verification_email:{user_uuid}"
     
     @staticmethod
-    def _generate_verification_code_key(self, user_uuid: str) -> str:
+    def _generate_verification_code_key(user_uuid: str) -> str:
         """
         Generate Redis key for email verification code.
 
@@ -298,7 +527,7 @@ class VerificaitonRedisClientUtils(RedisClientUtils):
         return f"verification_code:{user_uuid}"
     
     @staticmethod
-    def _generate_verification_code(self, digits: int = 6) -> str:
+    def _generate_verification_code(digits: int = 6) -> str:
         """
         Generate a random verification code without repeating any character 3 or more times.
 
@@ -330,7 +559,7 @@ class VerificaitonRedisClientUtils(RedisClientUtils):
         if self.exists(key):
             return False
         
-        return self.set(key, jwt_token, ex=expire_seconds)
+        return self.set_indexed(user_uuid, key, jwt_token, ex=expire_seconds)
     
     def set_verification_code(self, user_uuid: str, verification_code: str, expire_seconds: int = 180) -> bool:
         """
@@ -350,7 +579,7 @@ class VerificaitonRedisClientUtils(RedisClientUtils):
         if self.exists(key):
             return False
         
-        return self.set(key, verification_code, ex=expire_seconds)
+        return self.set_indexed(user_uuid, key, verification_code, ex=expire_seconds)
 
     def verify_email_verificaiton_token(self, user_uuid: str, jwt_token: str) -> bool:
         """
@@ -364,11 +593,11 @@ class VerificaitonRedisClientUtils(RedisClientUtils):
         Returns:
             bool: True if the verification code matches, False otherwise.
         """
-        key = self._generate_email_verification_key(user_uuid, jwt_token)
+        key = self._generate_email_verification_key(user_uuid)
         stored_code = self.get(key)
 
         if stored_code:
-            self.delete(key)
+            self.delete_indexed(user_uuid, key)
             return True
         return False
 
@@ -388,7 +617,7 @@ class VerificaitonRedisClientUtils(RedisClientUtils):
         stored_code = self.get(key)
 
         if stored_code == verification_code:
-            self.delete(key)
+            self.delete_indexed(user_uuid, key)
             return True
         return False
 
@@ -402,19 +631,7 @@ class VerificaitonRedisClientUtils(RedisClientUtils):
         Returns:
             bool: True if the operation was successful, False otherwise.
         """
-        keys = self.client.keys(f"verification_email:{user_uuid}:*")
-        if not keys:
-            return False
-        if len(keys) < 1:
-            return True 
-
-        results = []
-
-        for key in keys:
-            result = self.delete(key)
-            results.append(result)
-            
-        return all(results) if len(results) > 0 else False
+        return self.delete_all_indexed(user_uuid, prefix="verification_email:") > 0
     
     def delete_all_verification_codes_by_user_uuid(self, user_uuid: str) -> bool:
         """
@@ -426,19 +643,7 @@ class VerificaitonRedisClientUtils(RedisClientUtils):
         Returns:
             bool: True if the operation was successful, False otherwise.
         """
-        keys = self.client.keys(f"verification_code:{user_uuid}:*")
-        if not keys:
-            return False
-        if len(keys) < 1:
-            return True 
-
-        results = []
-
-        for key in keys:
-            result = self.delete(key)
-            results.append(result)
-            
-        return all(results) if len(results) > 0 else False
+        return self.delete_all_indexed(user_uuid, prefix="verification_code:") > 0
     
     def delete_all_email_verification_tokens(self) -> bool:
         """
@@ -447,19 +652,7 @@ class VerificaitonRedisClientUtils(RedisClientUtils):
         Returns:
             bool: True if the operation was successful, False otherwise.
         """
-        keys = self.client.keys("verification_email:*")
-        if not keys:
-            return False
-        if len(keys) < 1:
-            return True 
-
-        results = []
-
-        for key in keys:
-            result = self.delete(key)
-            results.append(result)
-            
-        return all(results) if len(results) > 0 else False
+        return self.scan_unlink("verification_email:*") > 0
     
     def delete_all_verification_codes(self) -> bool:
         """
@@ -468,16 +661,4 @@ class VerificaitonRedisClientUtils(RedisClientUtils):
         Returns:
             bool: True if the operation was successful, False otherwise.
         """
-        keys = self.client.keys("verification_code:*")
-        if not keys:
-            return False
-        if len(keys) < 1:
-            return True 
-
-        results = []
-
-        for key in keys:
-            result = self.delete(key)
-            results.append(result)
-            
-        return all(results) if len(results) > 0 else False
\ No newline at end of file
+        return self.scan_unlink("verification_code:*") > 0
\ No newline at end of file
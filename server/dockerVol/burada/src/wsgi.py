@@ -0,0 +1,9 @@
+"""Production entrypoint: gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is built once by the factory. With `preload_app` that happens in the gunicorn master
+and the workers are forked from it. Building it does not touch the database, run
+`flask --app app burada init-db` before the first start.
+"""
+from app import create_app
+
+app = application = create_app()